@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 课程管理器选词性能基准
+
+用合成词表（默认 10 万词）构造进度文件，测量：
+- get_next_batch 选词（不标记分配）
+- 带补漏词池（prefer_pool）的选词
+- 按难度分级比例（mix）的选词
+- 选词 + 标记为已分配（仅内存操作，不含写文件）
+- mark_as_learned（仅内存操作，不含写文件）
+
+用法：
+  cd tools
+  python3 benchmark_curriculum.py [--words 100000] [--batch 60] [--rounds 200]
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List
+
+from curriculum_memory import InMemoryCurriculumManager
+
+
+def build_progress_file(path: str, word_count: int):
+    """写入一个包含 word_count 个待学习单词的进度文件"""
+    words = [f"Word{i:06d}" for i in range(word_count)]
+    progress = {
+        "total_words": word_count,
+        "learned_words": [],
+        "pending_words": words,
+        "assigned_words": [],
+        "current_book_chapter": 1,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(progress, f, ensure_ascii=False)
+
+
+def build_band_file(path: str, word_count: int):
+    """写入合成难度分级表：单词 i 属于分级 5 + i % 4"""
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(word_count):
+            f.write(f"word{i:06d} {5 + i % 4}\n")
+
+
+def measure(fn: Callable[[], object], rounds: int) -> Dict[str, float]:
+    """运行 rounds 次，返回耗时统计（毫秒）"""
+    samples: List[float] = []
+    with redirect_stdout(io.StringIO()):
+        for _ in range(rounds):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean": statistics.mean(samples),
+        "p50": samples[len(samples) // 2],
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "max": samples[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="课程管理器选词性能基准")
+    parser.add_argument("--words", type=int, default=100000, help="合成词表大小（默认 100000）")
+    parser.add_argument("--batch", type=int, default=60, help="每批新词数量（默认 60）")
+    parser.add_argument("--rounds", type=int, default=200, help="每项测量的重复次数（默认 200）")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"⏱️  课程管理器基准：{args.words} 词，批次 {args.batch}，每项 {args.rounds} 轮")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        progress_file = os.path.join(tmp_dir, "progress_tracker_bench.json")
+        build_progress_file(progress_file, args.words)
+        band_file = os.path.join(tmp_dir, "word_bands.txt")
+        build_band_file(band_file, args.words)
+
+        start = time.perf_counter()
+        manager = InMemoryCurriculumManager(progress_file, band_file=band_file)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        # 补漏词池：分散在整个词表中的 600 个单词（小写，模拟 missing_ielts_words.txt）
+        step = max(1, args.words // 600)
+        prefer_pool = [f"word{i:06d}" for i in range(0, args.words, step)][:600]
+
+        def assign_and_learn():
+            batch = manager.get_next_batch(args.batch)
+            manager.mark_as_learned(batch)
+
+        results = {
+            "get_next_batch": measure(
+                lambda: manager.get_next_batch(args.batch, mark_as_assigned=False), args.rounds
+            ),
+            "get_next_batch(prefer_pool)": measure(
+                lambda: manager.get_next_batch(args.batch, mark_as_assigned=False, prefer_pool=prefer_pool),
+                args.rounds,
+            ),
+            "get_next_batch(mix)": measure(
+                lambda: manager.get_next_batch(
+                    args.batch, mark_as_assigned=False, mix={"6": 0.3, "7": 0.5, "8": 0.2}
+                ),
+                args.rounds,
+            ),
+            "assign + mark_as_learned": measure(assign_and_learn, args.rounds),
+        }
+
+    print(f"\n📂 加载进度文件并建立索引：{load_ms:.1f} ms")
+    print(f"\n{'操作':<32}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}  (ms)")
+    for name, r in results.items():
+        print(f"{name:<32}{r['mean']:>10.3f}{r['p50']:>10.3f}{r['p95']:>10.3f}{r['max']:>10.3f}")
+
+    slow = [name for name, r in results.items() if r["p95"] >= 1.0]
+    print()
+    if slow:
+        print(f"⚠️  以下操作 p95 超过 1ms：{', '.join(slow)}")
+    else:
+        print("✅ 所有选词操作 p95 均低于 1ms")
+
+
+if __name__ == "__main__":
+    main()
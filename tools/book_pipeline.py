@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 多书流水线（无交互）
+
+一条命令按配置文件为多个分类生成并入库 N 本书，代替 step1 → 手动复制粘贴 → step2 的交互流程：
+1. 选词（step1）：从分类的进度文件领取新词批次（带租约）和复习词
+2. 生成：用 step1 的 System Prompt 调用接口生成完整短篇；配置中没有书名时再请求一个标题
+3. 校验：缺词时按段落修补（见 novel_generator.py），检查 {word|meaning} 标记、核心词汇覆盖和字数
+4. 入库（step2）：在 library.ts 中新建书籍，保存章节，更新 novelService.ts、曝光索引和学习进度
+
+各阶段之间用有界队列连接，一本书生成完立即进入校验和入库，不等其他书：
+- 生成和校验各有独立的并发数（workers.generate / workers.validate），所有请求共用一个限流器（rpm / tpm）
+- 选词只比生成领先一个队列的长度，不会提前占用大量单词的租约
+- 入库会修改共享的 library.ts / novelService.ts，在事件循环中逐本执行
+失败的书放弃批次，单词回到待学习队列最前面；字数不符合要求时默认只警告（strict_length 为 true 时算失败）。
+
+配置文件（JSON）：
+{
+  "author": "佚名",
+  "batch_size": 60, "review_size": 20, "lease_hours": 24,
+  "workers": {"generate": 4, "validate": 2},
+  "rpm": 60, "tpm": 150000,
+  "strict_length": false,
+  "books": [
+    {"category": "reborn", "count": 3, "genre": "重生复仇", "theme": "重生后在订婚宴上揭穿渣男"},
+    {"category": "suspense", "count": 2, "genre": "悬疑推理", "theme": "暴雨夜的密室", "titles": ["雨夜来客", "第十三层"]}
+  ]
+}
+books 中每项可单独指定 author / titles；其余字段省略时使用 step1 的默认值和 LLM_CONCURRENCY / LLM_RPM / LLM_TPM。
+
+用法：
+  cd tools
+  python3 book_pipeline.py --config pipeline.json
+  python3 book_pipeline.py --config pipeline.json --cache
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from curriculum_manager import CurriculumManager, get_progress_file_for_category
+from llm_cache import enable_cache
+from llm_client import DEFAULT_CONCURRENCY, DEFAULT_RPM, DEFAULT_TPM, RateLimiter, create_async_client
+from llm_endpoints import active_pool
+from llm_metrics import metrics_tags
+from novel_generator import (
+    CHAPTER_PARAMS,
+    TITLE_PARAMS,
+    build_title_messages,
+    chapter_check,
+    find_missing_words,
+    new_chapter_id,
+    repair_missing_words_async,
+    request_text_async,
+    title_check,
+)
+from step1_get_prompt import BATCH_SIZE, REVIEW_SIZE, SYSTEM_PROMPT, build_story_prompt
+from step2_save_chapter import (
+    BOOK_CATEGORIES,
+    add_book_to_library,
+    check_length,
+    new_book_id,
+    publish_chapter,
+    validate_content_format,
+)
+
+DEFAULT_VALIDATE_WORKERS = 2
+CATEGORIES = {cat["id"]: cat for cat in BOOK_CATEGORIES}
+
+
+def load_pipeline_config(path: str) -> Dict:
+    """读取并检查流水线配置，配置有误时抛出 ValueError"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"流水线配置文件 {path} 不存在")
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    books = config.get("books")
+    if not isinstance(books, list) or not books:
+        raise ValueError("配置中缺少 books 列表")
+    for i, entry in enumerate(books, start=1):
+        if entry.get("category") not in CATEGORIES:
+            raise ValueError(f"books 第 {i} 项的 category 无效：{entry.get('category')}（可选：{', '.join(CATEGORIES)}）")
+        if not isinstance(entry.get("count", 1), int) or entry.get("count", 1) < 1:
+            raise ValueError(f"books 第 {i} 项的 count 必须是正整数")
+    return config
+
+
+def expand_books(config: Dict) -> List[Dict]:
+    """books 中的每项按 count 展开为单本书的任务"""
+    jobs = []
+    for entry in config["books"]:
+        titles = entry.get("titles") or []
+        for i in range(entry.get("count", 1)):
+            jobs.append({
+                "index": len(jobs) + 1,
+                "category": entry["category"],
+                "story_context": {k: entry[k] for k in ("genre", "theme") if entry.get(k)},
+                "title": titles[i] if i < len(titles) else None,
+                "author": entry.get("author") or config.get("author") or "佚名",
+            })
+    return jobs
+
+
+def clean_title(title: str) -> str:
+    """去掉模型给标题加的书名号 / 引号（书名会写入 library.ts 的字符串）"""
+    return title.strip().strip("《》\"“”'").replace('"', "").strip()
+
+
+class BookPipeline:
+    """选词 → 生成 → 校验 → 入库 四个阶段的流水线"""
+
+    def __init__(self, config: Dict, base_url: Optional[str] = None):
+        self.config = config
+        self.base_url = base_url
+        workers = config.get("workers") or {}
+        self.generate_workers = workers.get("generate", DEFAULT_CONCURRENCY)
+        self.validate_workers = workers.get("validate", DEFAULT_VALIDATE_WORKERS)
+        self.batch_size = config.get("batch_size", BATCH_SIZE)
+        self.review_size = config.get("review_size", REVIEW_SIZE)
+        lease_hours = config.get("lease_hours")
+        self.lease_seconds = lease_hours * 3600 if lease_hours is not None else None
+        self.strict_length = bool(config.get("strict_length", False))
+        self.managers: Dict[str, CurriculumManager] = {}
+        self.exhausted = set()
+        self.stats = {"published": 0, "failed": 0, "skipped": 0, "missing_words": 0, "length_warnings": 0}
+        self.books: List[Dict] = []
+
+    def _manager(self, category: str) -> CurriculumManager:
+        if category not in self.managers:
+            self.managers[category] = CurriculumManager(get_progress_file_for_category(category))
+        return self.managers[category]
+
+    # ==================== 各阶段 ====================
+
+    def select(self, job: Dict) -> bool:
+        """选词（step1）：领取新词批次和复习词；该分类单词用完时返回 False"""
+        if job["category"] in self.exhausted:
+            self.stats["skipped"] += 1
+            return False
+        manager = self._manager(job["category"])
+        words = manager.get_next_batch(self.batch_size, lease_seconds=self.lease_seconds)
+        if not words:
+            print(f"⚠️  分类 {job['category']} 没有可用的新单词，跳过该分类剩余的书")
+            self.exhausted.add(job["category"])
+            self.stats["skipped"] += 1
+            return False
+        job["batch"] = {"batch_id": manager.last_batch_id, "progress_file": manager.progress_file, "words": words}
+        job["review"] = (
+            manager.get_review_batch(self.review_size, batch_id=manager.last_batch_id) if len(manager.scheduler) else []
+        )
+        job["chapter_id"] = new_chapter_id()
+        print(f"📖 [{job['index']}] {job['category']}：新词 {len(words)} 个，复习词 {len(job['review'])} 个")
+        return True
+
+    async def generate(self, job: Dict) -> Optional[Dict]:
+        """生成正文（以及未配置的书名）"""
+        words = job["batch"]["words"]
+        user_prompt = build_story_prompt(words, job["review"], job["story_context"])
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ]
+        with metrics_tags(chapter=job["chapter_id"], book=job["category"]):
+            try:
+                job["content"] = (await request_text_async(
+                    self.client, self.limiter, messages, CHAPTER_PARAMS, words, kind="chapter",
+                    validate=chapter_check(False)
+                )).strip()
+                if not job["title"]:
+                    title = await request_text_async(
+                        self.client, self.limiter, build_title_messages(user_prompt), TITLE_PARAMS, kind="title",
+                        validate=title_check
+                    )
+                    job["title"] = clean_title(title)
+            except Exception as e:
+                return self.fail(job, f"生成失败：{e}")
+        return job
+
+    async def validate(self, job: Dict) -> Optional[Dict]:
+        """校验：缺词修补 → 标记格式 → 核心词汇覆盖 → 字数"""
+        words = job["batch"]["words"]
+        with metrics_tags(chapter=job["chapter_id"], book=job["category"]):
+            try:
+                job["content"] = await repair_missing_words_async(self.client, self.limiter, job["content"], words)
+            except Exception as e:
+                print(f"⚠️  [{job['index']}] 缺词修补失败（{e}），使用原文")
+        is_valid, _ = validate_content_format(job["content"])
+        if not is_valid or not job["title"]:
+            return self.fail(job, "内容中没有 {word|meaning} 标记" if not is_valid else "书名为空")
+        missing = find_missing_words(job["content"], words)
+        if missing:
+            self.stats["missing_words"] += len(missing)
+            print(f"⚠️  [{job['index']}] 以下词汇未在内容中出现：{missing}")
+        word_count, length_warning = check_length(job["content"])
+        if length_warning:
+            if self.strict_length:
+                return self.fail(job, f"{length_warning}（{word_count} 字符）")
+            self.stats["length_warnings"] += 1
+            print(f"⚠️  [{job['index']}] {length_warning}（{word_count} 字符）")
+        return job
+
+    def publish(self, job: Dict):
+        """入库（step2）：保存章节、更新学习进度，成功后再把新书加入 library.ts"""
+        category = CATEGORIES[job["category"]]
+        book_id = new_book_id()
+        filepath, _ = publish_chapter(
+            job["content"], category["id"], book_id, job["title"], job["batch"]["words"], job["batch"],
+            self._manager(job["category"]),
+        )
+        # 批次已提交：之后的失败不能再回退单词
+        job["committed"] = True
+        add_book_to_library(book_id, job["title"], job["author"], category["id"], category["color"])
+        self.stats["published"] += 1
+        self.books.append({"book_id": book_id, "title": job["title"], "category": category["id"], "file": filepath})
+        print(f"🎉 [{job['index']}] 已入库《{job['title']}》（{book_id}，{len(job['content'])} 字符）")
+
+    def fail(self, job: Dict, reason: str) -> None:
+        """放弃这本书：单词回到待学习队列最前面（批次已提交时只记录失败）"""
+        self.stats["failed"] += 1
+        print(f"❌ [{job['index']}] {reason}")
+        if job.get("committed"):
+            print(f"   [{job['index']}] 单词已标记为已学习，不回退批次；请检查 library.ts / novelService.ts")
+        else:
+            self._manager(job["category"]).abort_batch(job["batch"]["batch_id"])
+        return None
+
+    # ==================== 调度 ====================
+
+    async def _stage(
+        self,
+        workers: int,
+        inbox: asyncio.Queue,
+        handle: Callable,
+        outbox: asyncio.Queue,
+        downstream_workers: int,
+    ):
+        """
+        启动 workers 个任务处理 inbox（None 表示结束），结果放入 outbox；全部结束后通知下游
+
+        handle 抛出的异常只让这本书失败（放弃批次），阶段继续处理其余的书
+        """
+
+        async def worker():
+            while True:
+                job = await inbox.get()
+                if job is None:
+                    return
+                try:
+                    result = await handle(job)
+                except Exception as e:
+                    result = self.fail(job, f"{handle.__name__} 失败：{e}")
+                if result is not None:
+                    await outbox.put(result)
+
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        for _ in range(downstream_workers):
+            await outbox.put(None)
+
+    async def _select_all(self, jobs: List[Dict], outbox: asyncio.Queue, downstream_workers: int):
+        for job in jobs:
+            if self.select(job):
+                await outbox.put(job)
+        for _ in range(downstream_workers):
+            await outbox.put(None)
+
+    async def _publish_all(self, inbox: asyncio.Queue):
+        while True:
+            job = await inbox.get()
+            if job is None:
+                return
+            try:
+                self.publish(job)
+            except Exception as e:
+                self.fail(job, f"入库失败：{e}")
+
+    async def run(self, jobs: List[Dict]) -> Dict:
+        self.client = create_async_client(self.base_url)
+        self.limiter = RateLimiter(
+            self.generate_workers + self.validate_workers,
+            self.config.get("rpm", DEFAULT_RPM),
+            self.config.get("tpm", DEFAULT_TPM),
+        )
+        to_generate = asyncio.Queue(maxsize=self.generate_workers)
+        to_validate = asyncio.Queue(maxsize=self.validate_workers)
+        to_publish = asyncio.Queue()
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(
+                self._select_all(jobs, to_generate, self.generate_workers),
+                self._stage(self.generate_workers, to_generate, self.generate, to_validate, self.validate_workers),
+                self._stage(self.validate_workers, to_validate, self.validate, to_publish, 1),
+                self._publish_all(to_publish),
+            )
+        finally:
+            await self.client.close()
+            if active_pool():
+                await active_pool().aclose()
+        self.stats["elapsed"] = time.perf_counter() - started
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多书流水线：选词 → 生成 → 校验 → 入库（无交互）")
+    parser.add_argument("--config", type=str, required=True, help="流水线配置文件（JSON）")
+    parser.add_argument("--cache", action="store_true", help="启用 LLM 响应缓存：相同请求直接重放（见 llm_cache.py）")
+    args = parser.parse_args()
+    if args.cache:
+        enable_cache()
+
+    try:
+        config = load_pipeline_config(args.config)
+    except (OSError, ValueError) as e:
+        print(f"❌ 错误：{e}")
+        sys.exit(1)
+    jobs = expand_books(config)
+    pipeline = BookPipeline(config)
+    print(
+        f"🏭 流水线：{len(jobs)} 本书（生成并发 {pipeline.generate_workers}，校验并发 {pipeline.validate_workers}，"
+        f"每本新词 {pipeline.batch_size} 个 + 复习词 {pipeline.review_size} 个）"
+    )
+    stats = asyncio.run(pipeline.run(jobs))
+
+    print("\n" + "=" * 60)
+    print(f"✅ 入库 {stats['published']} 本，失败 {stats['failed']} 本，跳过 {stats['skipped']} 本，用时 {stats['elapsed']:.1f}s")
+    if stats["published"]:
+        print(f"   吞吐量：{stats['published'] / stats['elapsed'] * 3600:.0f} 本/小时")
+    if stats["missing_words"]:
+        print(f"⚠️  共 {stats['missing_words']} 个核心词汇未在内容中出现")
+    if stats["length_warnings"]:
+        print(f"⚠️  {stats['length_warnings']} 本字数不在建议范围内")
+    for book in pipeline.books:
+        print(f"   📚 [{book['category']}] 《{book['title']}》 {book['book_id']}")
+    if active_pool():
+        active_pool().print_metrics()
+    print("=" * 60)
+    if stats["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 并发批量生成章节（asyncio）
+
+一次生成多章：
+1. 依次为每章领取一个课程批次（get_next_batch 创建租约）和复习词
+2. 所有章节用同一个 AsyncOpenAI 客户端（共用连接池）并发请求，
+   由限流器控制并发数和每分钟请求数 / token 数（见 llm_client.RateLimiter）
+3. 每章完成后立即保存并提交自己的批次（commit_batch + increment_chapter）；
+   生成失败的章节放弃批次（abort_batch），单词回到待学习队列最前面
+
+--stub 在进程内启动本地桩服务（llm_stub_server.py），并在临时目录中用合成词表运行，
+不访问网络、不修改真实进度和书库，用来测量每小时可生成的章节数。
+
+用法：
+  cd tools
+  python3 concurrent_generator.py --chapters 10 --concurrency 4 --rpm 60 --tpm 150000
+  python3 concurrent_generator.py --stub --chapters 50 --concurrency 16 --stub-latency 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from curriculum_manager import CurriculumManager
+from llm_cache import enable_cache
+from llm_endpoints import active_pool
+from llm_client import DEFAULT_CONCURRENCY, DEFAULT_RPM, DEFAULT_TPM, RateLimiter, create_async_client
+from novel_generator import (
+    CANDIDATES,
+    PROGRESS_FILE,
+    find_missing_words,
+    generate_chapter_async,
+    load_story_config,
+    save_chapter,
+)
+
+STUB_STORY_CONTEXT = {
+    "genre": "重生霸总",
+    "prev_summary": "林晚晚重生回到十八岁，决定改写命运。",
+    "chapter_outline": "林晚晚在晚宴上揭穿对手的阴谋。",
+}
+
+
+def claim_jobs(manager: CurriculumManager, count: int, batch_size: int, review_size: int, lease_seconds: Optional[float]) -> List[Dict]:
+    """为每章领取一个课程批次（带租约）和复习词；待学习单词用完时提前结束"""
+    jobs = []
+    for _ in range(count):
+        words = manager.get_next_batch(batch_size, lease_seconds=lease_seconds)
+        if not words:
+            break
+        review = manager.get_review_batch(review_size, batch_id=manager.last_batch_id) if len(manager.scheduler) else []
+        jobs.append({"batch_id": manager.last_batch_id, "words": words, "review": review})
+    return jobs
+
+
+async def generate_chapters_concurrently(
+    manager: CurriculumManager,
+    jobs: List[Dict],
+    story_context: Dict,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rpm: float = DEFAULT_RPM,
+    tpm: float = DEFAULT_TPM,
+    base_url: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    candidates: int = CANDIDATES,
+) -> Dict:
+    """
+    并发生成 jobs 中的所有章节，返回统计信息
+
+    每个 job 对应 claim_jobs 领取的一个批次；成功则保存章节并提交批次，失败则放弃批次
+    """
+    client = create_async_client(base_url)
+    limiter = RateLimiter(concurrency, rpm, tpm)
+    stats = {"chapters": 0, "failed": 0, "missing_words": 0, "latencies": []}
+
+    async def run(index: int, job: Dict):
+        started = time.perf_counter()
+        try:
+            chapter = await generate_chapter_async(
+                client, limiter, job["words"], job["review"] or None, story_context, candidates=candidates
+            )
+        except Exception as e:
+            stats["failed"] += 1
+            print(f"❌ [{index}] 生成失败：{e}")
+            manager.abort_batch(job["batch_id"])
+            return
+        elapsed = time.perf_counter() - started
+        stats["latencies"].append(elapsed)
+        stats["missing_words"] += len(find_missing_words(chapter["content"], job["words"]))
+        filepath = None
+        try:
+            filepath = save_chapter(chapter, output_dir)
+            manager.commit_batch(job["batch_id"])
+        except Exception as e:
+            # 不让异常穿过 gather：否则其他章节被取消，它们的租约一直占着
+            stats["failed"] += 1
+            print(f"❌ [{index}] 保存失败：{e}")
+            if filepath and os.path.exists(filepath):
+                os.remove(filepath)
+            manager.abort_batch(job["batch_id"])
+            return
+        try:
+            manager.increment_chapter()
+        except Exception as e:
+            print(f"⚠️  [{index}] 章节计数更新失败（批次已提交）：{e}")
+        stats["chapters"] += 1
+        print(f"📖 [{index}] 《{chapter['title']}》 {len(chapter['content'])} 字，用时 {elapsed:.1f}s")
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(run(i, job) for i, job in enumerate(jobs, start=1)))
+    finally:
+        await client.close()
+        if active_pool():
+            await active_pool().aclose()
+    stats["elapsed"] = time.perf_counter() - started
+    stats["rate_limit_wait"] = limiter.waited
+    return stats
+
+
+def build_stub_workspace(workdir: str, word_count: int) -> str:
+    """--stub：在临时目录写入合成词表的进度文件，返回进度文件路径"""
+    progress_file = os.path.join(workdir, "progress_tracker_stub.json")
+    words = [f"stubword{i:05d}" for i in range(word_count)]
+    with open(progress_file, "w", encoding="utf-8") as f:
+        json.dump({"pending_words": words, "assigned_words": [], "learned_words": [], "current_book_chapter": 1}, f)
+    return progress_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发批量生成章节")
+    parser.add_argument("--chapters", type=int, default=4, help="生成章节数（默认 4）")
+    parser.add_argument("--batch-size", type=int, default=20, help="每章新单词数（默认 20）")
+    parser.add_argument("--review-size", type=int, default=5, help="每章复习单词数（默认 5）")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="并发请求数上限（默认 LLM_CONCURRENCY）")
+    parser.add_argument("--rpm", type=float, default=DEFAULT_RPM, help="每分钟请求数上限，0 表示不限（默认 LLM_RPM）")
+    parser.add_argument("--tpm", type=float, default=DEFAULT_TPM, help="每分钟 token 数上限，0 表示不限（默认 LLM_TPM）")
+    parser.add_argument("--lease-hours", type=float, default=None, help="批次租约时长（小时，默认 24）")
+    parser.add_argument("--progress-file", type=str, default=PROGRESS_FILE, help="进度文件（默认 tools/progress_tracker.json）")
+    parser.add_argument("--output-dir", type=str, default=None, help="章节输出目录（默认 src/data/generated）")
+    parser.add_argument("--candidates", type=int, default=CANDIDATES, help="每章并发请求的候选数，第一个通过检查的胜出（默认 NOVEL_CANDIDATES=1）")
+    parser.add_argument("--cache", action="store_true", help="启用 LLM 响应缓存：相同请求直接重放（见 llm_cache.py）")
+    parser.add_argument("--stub", action="store_true", help="使用进程内桩服务和临时目录（离线测量吞吐量）")
+    parser.add_argument("--stub-latency", type=float, default=1.0, help="桩服务每个请求的固定延迟（秒，默认 1）")
+    parser.add_argument("--stub-tps", type=float, default=400, help="桩服务模拟输出速度（token/s，默认 400）")
+    args = parser.parse_args()
+
+    if args.cache:
+        enable_cache()
+    base_url = None
+    progress_file = args.progress_file
+    output_dir = args.output_dir
+    workdir = None
+    if args.stub:
+        from llm_stub_server import start_stub_server
+
+        server, base_url = start_stub_server(latency=args.stub_latency, tokens_per_second=args.stub_tps)
+        workdir = tempfile.TemporaryDirectory()
+        progress_file = build_stub_workspace(workdir.name, args.chapters * args.batch_size)
+        output_dir = os.path.join(workdir.name, "generated")
+        story_context = STUB_STORY_CONTEXT
+        print(f"🧪 桩服务：{base_url}（延迟 {args.stub_latency}s + {args.stub_tps:g} token/s），临时目录 {workdir.name}")
+    else:
+        story_context = load_story_config()
+
+    manager = CurriculumManager(progress_file)
+    lease_seconds = args.lease_hours * 3600 if args.lease_hours is not None else None
+    jobs = claim_jobs(manager, args.chapters, args.batch_size, args.review_size, lease_seconds)
+    if not jobs:
+        print("❌ 没有可用的新单词，请检查进度追踪文件")
+        sys.exit(1)
+
+    print(f"\n✨ 并发生成 {len(jobs)} 章（并发 {args.concurrency}，RPM {args.rpm or '不限'}，TPM {args.tpm or '不限'}）...")
+    try:
+        stats = asyncio.run(
+            generate_chapters_concurrently(
+                manager, jobs, story_context, args.concurrency, args.rpm, args.tpm, base_url, output_dir, args.candidates
+            )
+        )
+    finally:
+        if workdir is not None:
+            server.shutdown()
+            workdir.cleanup()
+
+    latencies = sorted(stats["latencies"])
+    print("\n" + "=" * 50)
+    print(f"✅ 完成 {stats['chapters']} 章，失败 {stats['failed']} 章，用时 {stats['elapsed']:.1f}s")
+    if latencies:
+        print(f"   单章耗时 p50 {latencies[len(latencies) // 2]:.1f}s，最大 {latencies[-1]:.1f}s")
+        print(f"   吞吐量：{stats['chapters'] / stats['elapsed'] * 3600:.0f} 章/小时")
+    if stats["rate_limit_wait"]:
+        print(f"   限流等待累计 {stats['rate_limit_wait']:.1f}s")
+    if stats["missing_words"]:
+        print(f"⚠️  共 {stats['missing_words']} 个核心词汇未在内容中出现")
+    if active_pool():
+        active_pool().print_metrics()
+    manager.print_statistics()
+
+
+if __name__ == "__main__":
+    main()
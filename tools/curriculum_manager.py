@@ -4,10 +4,22 @@ IELTS Novel Flow - 课程管理器
 负责智能选词、进度追踪和学习管理
 """
 
+import copy
+import functools
+import heapq
 import json
 import os
-import random
-from typing import List, Dict, Optional, Set
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from exposure_index import EXPOSURE_TARGET, load_exposure_index
+from progress_store import REVIEW_FIELD, STATE_FIELDS, Op, create_store
+from progress_versions import VersionLog, delta_size, empty_delta
+from review_scheduler import ReviewScheduler
+from word_rank import allocate_mix, load_band_table, load_rank_table
 
 # 获取脚本所在目录的绝对路径
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -15,6 +27,9 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROGRESS_FILE = os.path.join(BASE_DIR, "progress_tracker.json")
 IELTS_SOURCE_FILE = os.path.join(BASE_DIR, "ielts_source.json")
 
+# 分配租约默认有效期（秒）：超过期限仍未入库的批次，其单词会被回收到待学习队列最前面
+DEFAULT_LEASE_SECONDS = float(os.getenv("CURRICULUM_LEASE_SECONDS", str(24 * 3600)))
+
 
 def get_progress_file_for_category(category_id: str) -> str:
     """
@@ -33,33 +48,291 @@ def get_progress_file_for_category(category_id: str) -> str:
     return os.path.join(BASE_DIR, filename)
 
 
+def normalize_word(word: str) -> str:
+    """单词规范化：去空白 + 小写（所有索引都以此为 key）"""
+    return word.strip().lower()
+
+
+class WordIndex:
+    """
+    按插入顺序保存单词的索引
+
+    - key 为规范化后的小写单词，value 为原始拼写
+    - 成员判断 / 添加 / 删除均为 O(1)，遍历保持插入顺序
+    - 同时记录插入序号，便于把任意子集按原顺序排列
+    - 提供 group_of（key -> 分组，如难度分级）时，为每个分组维护按序号排序的最小堆，
+      按分组取前 k 个单词为 O(k log n)，删除的单词在堆中惰性跳过
+    """
+
+    def __init__(self, words: Iterable[str] = (), group_of: Optional[Callable[[str], Optional[str]]] = None):
+        self._words: Dict[str, str] = {}
+        self._seq: Dict[str, int] = {}
+        self._next_seq = 0
+        self._head_seq = 0
+        self._group_of = group_of
+        self._groups: Dict[str, List[Tuple[int, str]]] = {}
+        self._group_sizes: Dict[str, int] = {}
+        for w in words:
+            self.add(w)
+
+    def _index_group(self, key: str):
+        group = self._group_of(key) if self._group_of else None
+        if group is None:
+            return
+        heap = self._groups.setdefault(group, [])
+        heapq.heappush(heap, (self._seq[key], key))
+        self._group_sizes[group] = self._group_sizes.get(group, 0) + 1
+        # 过期条目过多时重建该分组的堆
+        if len(heap) > 2 * self._group_sizes[group] + 64:
+            heap[:] = [(seq, k) for seq, k in heap if self._seq.get(k) == seq]
+            heapq.heapify(heap)
+
+    def add(self, word: str) -> bool:
+        """添加单词（已存在则忽略），返回是否新增"""
+        key = normalize_word(word)
+        if not key or key in self._words:
+            return False
+        self._words[key] = word.strip()
+        self._seq[key] = self._next_seq
+        self._next_seq += 1
+        self._index_group(key)
+        return True
+
+    def prepend(self, words: List[str]) -> List[str]:
+        """
+        把一批单词放到最前面（保持批次内顺序），返回实际插入的单词
+
+        需要重建字典，O(n)；只在回收过期租约时使用
+        """
+        front: Dict[str, str] = {}
+        for w in words:
+            key = normalize_word(w)
+            if key and key not in self._words and key not in front:
+                front[key] = w.strip()
+        if not front:
+            return []
+        self._head_seq -= len(front)
+        for i, key in enumerate(front):
+            self._seq[key] = self._head_seq + i
+            self._index_group(key)
+        self._words = {**front, **self._words}
+        return list(front.values())
+
+    def discard(self, word: str) -> Optional[str]:
+        """删除单词，返回原始拼写（不存在则返回 None）"""
+        key = normalize_word(word)
+        if self._seq.pop(key, None) is not None and self._group_of:
+            group = self._group_of(key)
+            if group is not None:
+                self._group_sizes[group] -= 1
+        return self._words.pop(key, None)
+
+    def get(self, word: str) -> Optional[str]:
+        """按任意大小写查找原始拼写"""
+        return self._words.get(normalize_word(word))
+
+    def first_in_order(self, keys: Iterable[str], limit: int) -> List[str]:
+        """
+        在给定的规范化 key 中取出存在于索引里的前 limit 个（按插入顺序）
+
+        只遍历 keys，复杂度 O(len(keys) · log limit)，与索引大小无关
+        """
+        hits = [(self._seq[k], k) for k in keys if k in self._words]
+        return [self._words[k] for _, k in heapq.nsmallest(limit, hits)]
+
+    def first_in_group(self, group: str, limit: int, skip: Set[str] = frozenset()) -> List[str]:
+        """
+        取出某个分组中按插入顺序的前 limit 个单词（跳过 skip 中的 key），不修改索引
+
+        弹出堆顶直到凑够 limit 个有效条目，再把有效条目放回，复杂度 O((limit + 过期条目) · log n)
+        """
+        heap = self._groups.get(group)
+        if not heap or limit <= 0:
+            return []
+        taken: List[Tuple[int, str]] = []
+        result: List[str] = []
+        while heap and len(result) < limit:
+            seq, key = heapq.heappop(heap)
+            if self._seq.get(key) != seq:
+                continue  # 已删除或已重新插入
+            taken.append((seq, key))
+            if key not in skip:
+                result.append(self._words[key])
+        for entry in taken:
+            heapq.heappush(heap, entry)
+        return result
+
+    def group_size(self, group: str) -> int:
+        return self._group_sizes.get(group, 0)
+
+    def seq_of(self, word: str) -> int:
+        return self._seq[normalize_word(word)]
+
+    def __contains__(self, word: object) -> bool:
+        return isinstance(word, str) and normalize_word(word) in self._words
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._words.values())
+
+    def keys(self) -> Iterable[str]:
+        return self._words.keys()
+
+    def to_list(self) -> List[str]:
+        return list(self._words.values())
+
+
+def synchronized(method):
+    """装饰器：在进度存储的跨进程锁内执行修改操作（见 CurriculumManager._transaction）"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._transaction():
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
 class CurriculumManager:
     """课程管理器类"""
 
-    def __init__(self, progress_file: str = PROGRESS_FILE):
+    def __init__(
+        self,
+        progress_file: str = PROGRESS_FILE,
+        backend: Optional[str] = None,
+        review_policy: Optional[str] = None,
+        rank_file: Optional[str] = None,
+        band_file: Optional[str] = None,
+        exposure_file: Optional[str] = None,
+    ):
         """
         初始化课程管理器
         
         Args:
             progress_file: 进度追踪文件路径
+            backend: 进度存储后端（"json" / "journal" / "sqlite" / "shared"），默认读取环境变量 CURRICULUM_BACKEND
+            review_policy: 复习策略（"sm2" / "leitner"），默认读取环境变量 CURRICULUM_REVIEW_POLICY
+            rank_file: 词频排名文件，默认 tools/word_ranks.txt（环境变量 CURRICULUM_RANK_FILE），不存在则保持原顺序
+            band_file: 难度分级文件，默认 tools/word_bands.txt（环境变量 CURRICULUM_BAND_FILE），用于按分级比例选词
+            exposure_file: 已上架小说曝光索引，默认 tools/exposure_index.json（环境变量 CURRICULUM_EXPOSURE_FILE），
+                存在时复习优先选择曝光次数少的已到期单词
         """
         self.progress_file = progress_file
+        self.review_policy = review_policy
+        self.ranks = load_rank_table(rank_file)
+        self.bands = load_band_table(band_file)
+        self.exposure_file = exposure_file
+        self._recording: Optional[List[Op]] = None
+        self.last_version_id: Optional[int] = None
+        self.store = create_store(progress_file, backend)
+        with self.store.lock:
+            self._reload()
+
+    def _reload(self):
+        """从存储加载进度并重建索引，记录加载时的数据版本"""
         self.progress = self._load_progress()
+        self._build_indexes()
+        self._build_leases()
+        self._build_scheduler(self.review_policy)
+        self._apply_rank_order()
+        self._store_version = self.store.version()
+
+    @contextmanager
+    def _transaction(self):
+        """
+        跨进程事务：加锁 -> 若其他进程已修改则重新加载 -> 执行修改并提交 -> 记录新版本
+
+        多个进程并发调用 get_next_batch 时，选词和标记分配在同一把锁内完成，每个单词只会被分配一次
+        """
+        with self.store.lock:
+            if self.store.version() != self._store_version:
+                self._reload()
+            yield
+            self._store_version = self.store.version()
+
+    def _build_scheduler(self, review_policy: Optional[str]):
+        """
+        构建复习调度器
+
+        旧进度文件中没有复习状态的已学习单词，视为在当前章节到期
+        """
+        # 只调度已学习的单词（回滚后回到待学习的单词可能还留有复习状态）
+        states = {w: s for w, s in (self.progress.get(REVIEW_FIELD) or {}).items() if w in self.learned}
+        self.scheduler = ReviewScheduler(states, review_policy)
+        unscheduled = [normalize_word(w) for w in self.learned if normalize_word(w) not in self.scheduler]
+        # 初始间隔为 1 章：以上一章作为学习时间，即在当前章节到期
+        self.scheduler.add(unscheduled, self.get_current_chapter() - 1)
+
+    def _apply_rank_order(self):
+        """
+        排名表变化（或首次使用）时，把待学习队列整体按排名重排一次并记录排名表签名
+
+        之后队列一直保持排名顺序（新增单词按排名插入），选词只需从队头取
+        """
+        if self.ranks is None or self.progress.get("rank_order") == self.ranks.signature:
+            return
+        ordered = self.ranks.sort(self.pending.to_list())
+        self.pending = self._pending_index(ordered)
+        self.progress["rank_order"] = self.ranks.signature
+        self._commit([("move", "pending", ordered, "front"), ("set", "rank_order", self.ranks.signature)])
+        print(f"📶 已按词频排名重排待学习队列（{len(ordered)} 个单词）")
+
+    def _build_indexes(self):
+        """
+        根据 progress 中的三个列表构建索引
+
+        同一个单词只会出现在一种状态里，优先级：已学习 > 已分配 > 待学习
+        """
+        self.learned = WordIndex(self.progress.get("learned_words", []))
+        self.assigned = WordIndex(
+            w for w in self.progress.get("assigned_words", []) if w not in self.learned
+        )
+        self.pending = self._pending_index(
+            w for w in self.progress.get("pending_words", [])
+            if w not in self.learned and w not in self.assigned
+        )
+
+    def _pending_index(self, words: Iterable[str]) -> WordIndex:
+        """待学习索引（有难度分级表时按分级建立分组队列）"""
+        return WordIndex(words, self.bands.get if self.bands else None)
+
+    def _build_leases(self):
+        """
+        加载分配租约：batch_id -> {"words": [...], "deadline": 到期时间戳, "assigned_at": 分配时间戳,
+        "review": 本批次的复习词（可选，批次完成时才记录为已复习，见 get_review_batch）}
+
+        另建按 deadline 排序的最小堆，检查是否有过期租约只需看堆顶
+        """
+        self.leases: Dict[str, Dict] = dict(self.progress.get("leases") or {})
+        self._lease_heap = [(lease["deadline"], batch_id) for batch_id, lease in self.leases.items()]
+        heapq.heapify(self._lease_heap)
+        self.last_batch_id: Optional[str] = None
+
+    def _sync_progress(self) -> Dict:
+        """把索引写回 progress 字典（保持 JSON 文件格式不变）"""
+        self.progress["pending_words"] = self.pending.to_list()
+        self.progress["assigned_words"] = self.assigned.to_list()
+        self.progress["learned_words"] = self.learned.to_list()
+        self.progress["total_words"] = len(self.pending) + len(self.assigned) + len(self.learned)
+        self.progress["review_state"] = self.scheduler.to_dict()
+        self.progress["leases"] = self.leases
+        return self.progress
 
     def _load_progress(self) -> Dict:
         """加载进度追踪文件"""
-        if not os.path.exists(self.progress_file):
+        if not self.store.exists():
             # 如果文件不存在，从词源文件初始化
             self._initialize_from_source()
         
         try:
-            with open(self.progress_file, "r", encoding="utf-8") as f:
-                progress = json.load(f)
-                # 兼容旧进度文件：补齐 assigned_words 字段
-                if isinstance(progress, dict) and "assigned_words" not in progress:
-                    progress["assigned_words"] = []
-                    self._save_progress(progress)
-                return progress
+            progress = self.store.load()
+            # 兼容旧进度文件：补齐 assigned_words 字段
+            if isinstance(progress, dict) and "assigned_words" not in progress:
+                progress["assigned_words"] = []
+                self._save_progress(progress)
+            return progress
         except (json.JSONDecodeError, FileNotFoundError) as e:
             print(f"⚠️  警告：无法加载进度文件 {self.progress_file}: {e}")
             self._initialize_from_source()
@@ -75,8 +348,10 @@ class CurriculumManager:
         with open(IELTS_SOURCE_FILE, "r", encoding="utf-8") as f:
             source_words = json.load(f)
         
-        # 去重
-        unique_words = list(set(source_words))
+        # 去重（保持词源顺序），有排名表时按排名排列
+        unique_words = list(dict.fromkeys(w.strip() for w in source_words if isinstance(w, str) and w.strip()))
+        if self.ranks is not None:
+            unique_words = self.ranks.sort(unique_words)
         
         progress = {
             "total_words": len(unique_words),
@@ -85,105 +360,485 @@ class CurriculumManager:
             "assigned_words": [],  # 已分配但未完成的单词（用于 step1 到 step2 之间的状态）
             "current_book_chapter": 1,
         }
+        if self.ranks is not None:
+            progress["rank_order"] = self.ranks.signature
         
         self._save_progress(progress)
         print(f"✅ 已从 {IELTS_SOURCE_FILE} 初始化进度追踪，共 {len(unique_words)} 个单词")
 
     def _save_progress(self, progress: Optional[Dict] = None):
-        """保存进度追踪文件"""
+        """整体保存进度（初始化 / 格式迁移时使用）"""
         if progress is None:
-            progress = self.progress
+            progress = self._sync_progress()
         
-        with open(self.progress_file, "w", encoding="utf-8") as f:
-            json.dump(progress, f, ensure_ascii=False, indent=2)
+        self.store.save(progress)
+
+    def _commit(self, ops: List[Op]):
+        """提交一组状态变更（支持按行更新的后端只写入变更部分）"""
+        self.store.commit(ops, self._sync_progress)
+        if self._recording is not None:
+            self._recording.extend(ops)
+
+    # ==================== 进度版本 ====================
+
+    def _state_of(self, word: str) -> Optional[str]:
+        for state, index in (("learned", self.learned), ("assigned", self.assigned), ("pending", self.pending)):
+            if word in index:
+                return state
+        return None
+
+    @contextmanager
+    def snapshot(self, label: str):
+        """
+        把块内的全部修改记录为一个进度版本（只保存差异，见 progress_versions.py），版本号见 self.last_version_id
+
+        开始时只做浅拷贝（单词状态 / 复习状态的引用），结束时只比较块内操作涉及的单词和字段
+        """
+        if self._recording is not None:
+            yield  # 嵌套时并入外层版本
+            return
+        with self._transaction():
+            before_words: Dict[str, str] = {}
+            for state, index in (("pending", self.pending), ("assigned", self.assigned), ("learned", self.learned)):
+                before_words.update(dict.fromkeys(index.keys(), state))
+            before_reviews = dict(self.scheduler.states)
+            before_leases = copy.deepcopy(self.leases)
+            before_fields = {
+                k: copy.deepcopy(v) for k, v in self.progress.items()
+                if k not in STATE_FIELDS.values() and k not in ("total_words", REVIEW_FIELD, "leases")
+            }
+            self._recording = []
+            try:
+                yield
+            finally:
+                ops, self._recording = self._recording, None
+                delta = empty_delta()
+                for op in ops:
+                    if op[0] == "move":
+                        for w in op[2]:
+                            key = normalize_word(w)
+                            before, after = before_words.get(key), self._state_of(key)
+                            if before != after:
+                                delta["words"][key] = [before, after]
+                    elif op[0] == "set" and op[1] == "leases":
+                        for batch_id in set(before_leases) | set(self.leases):
+                            before, after = before_leases.get(batch_id), self.leases.get(batch_id)
+                            if before != after:
+                                delta["leases"][batch_id] = [before, copy.deepcopy(after)]
+                    elif op[0] == "set" and before_fields.get(op[1]) != self.progress.get(op[1]):
+                        delta["fields"][op[1]] = [before_fields.get(op[1]), copy.deepcopy(self.progress.get(op[1]))]
+                    elif op[0] == "review":
+                        for w in op[1]:
+                            before, after = before_reviews.get(w), self.scheduler.states.get(w)
+                            if before != after:
+                                delta["reviews"][w] = [before, after]
+                if delta_size(delta):
+                    self.last_version_id = VersionLog(self.progress_file).append(delta, label)
+                    print(f"🗂️  已记录进度版本 v{self.last_version_id}（{label}）")
+
+    def _apply_version_delta(self, delta: Dict, undo: bool) -> Tuple[List[Op], List[str]]:
+        """
+        把一个版本差异正向 / 反向应用到内存索引，返回 (需要提交的操作, 冲突单词)
+
+        单词当前状态与差异记录的不一致（之后又被修改过）时跳过，不覆盖后来的修改
+        """
+        src, dst = (1, 0) if undo else (0, 1)
+        conflicts: List[str] = []
+        moves: Dict[str, List[str]] = {}
+        for word, states in delta["words"].items():
+            if self._state_of(word) != states[src] or states[dst] is None:
+                conflicts.append(word)
+                continue
+            for index in (self.pending, self.assigned, self.learned):
+                index.discard(word)
+            moves.setdefault(states[dst], []).append(word)
 
+        ops: List[Op] = []
+        for state, words in moves.items():
+            if state == "pending":
+                ops.append(("move", "pending", self.pending.prepend(words), "front"))
+            else:
+                index = self.assigned if state == "assigned" else self.learned
+                for w in words:
+                    index.add(w)
+                ops.append(("move", state, words))
+            if state != "learned":
+                for w in words:
+                    self.scheduler.discard(w)
+
+        reviews: Dict[str, List] = {}
+        for word, states in delta["reviews"].items():
+            if states[dst] is None:
+                self.scheduler.discard(word)
+            elif word in self.learned:
+                self.scheduler.set_state(word, states[dst])
+                reviews[word] = states[dst]
+        if reviews:
+            ops.append(("review", reviews))
+
+        for key, values in delta["fields"].items():
+            self.progress[key] = copy.deepcopy(values[dst])
+            ops.append(("set", key, values[dst]))
+
+        if delta.get("leases"):
+            for batch_id, values in delta["leases"].items():
+                if values[dst] is None:
+                    self.leases.pop(batch_id, None)
+                else:
+                    self.leases[batch_id] = copy.deepcopy(values[dst])
+            self._lease_heap = [(lease["deadline"], batch_id) for batch_id, lease in self.leases.items()]
+            heapq.heapify(self._lease_heap)
+            ops.append(("set", "leases", dict(self.leases)))
+        return ops, conflicts
+
+    @synchronized
+    def restore_version(self, version_id: int) -> List[str]:
+        """
+        切换到指定进度版本：沿版本树撤销到公共祖先，再重做到目标版本
+
+        Returns:
+            因之后又被修改而跳过的单词
+        """
+        log = VersionLog(self.progress_file)
+        undo, redo = log.path_between(log.head, version_id)
+        ops: List[Op] = []
+        conflicts: List[str] = []
+        for vid in undo:
+            o, c = self._apply_version_delta(log.versions[vid], undo=True)
+            ops += o
+            conflicts += c
+        for vid in redo:
+            o, c = self._apply_version_delta(log.versions[vid], undo=False)
+            ops += o
+            conflicts += c
+        if ops:
+            self._commit(ops)
+        log.set_head(version_id)
+        print(f"⏪ 已切换到进度版本 v{version_id}（撤销 {len(undo)} 个版本，重做 {len(redo)} 个版本）")
+        if conflicts:
+            print(f"⚠️  {len(conflicts)} 个单词之后又被修改过，保持当前状态：{conflicts[:10]}")
+        return conflicts
+
+    @synchronized
     def get_next_batch(
         self,
         batch_size: int = 20,
         mark_as_assigned: bool = True,
         prefer_pool: Optional[List[str]] = None,
+        lease_seconds: Optional[float] = None,
+        mix: Optional[Dict[str, float]] = None,
     ) -> List[str]:
         """
         获取下一批新单词（从待学习列表中按顺序取出）
         - 如果提供 prefer_pool，则会优先从 pool 中抽取（补漏），不够再从 pending 补齐
+        - 如果提供 mix（难度分级 -> 比例，如 {"6": 0.3, "7": 0.5, "8": 0.2}），补漏之后剩余名额按比例
+          从各分级队列中抽取；某个分级不够时由其他分级补足，最后再从 pending 顺序补齐
+        - 标记为已分配时会创建一个租约（批次 ID 见 self.last_batch_id），
+          到期仍未 commit_batch 的单词在下次分配时回收到待学习队列最前面
         
         Args:
             batch_size: 批次大小，默认 20 个单词
             mark_as_assigned: 是否立即标记为"已分配"（从 pending_words 移除），默认 True
             prefer_pool: 优先词池（如 missing_ielts_words.txt）
+            lease_seconds: 租约有效期（秒），默认 CURRICULUM_LEASE_SECONDS（24 小时）
+            mix: 难度分级比例（需要难度分级文件）
         
         Returns:
             新单词列表
         """
-        pending = self.progress.get("pending_words", [])
+        ops = self._reclaim_expired_leases()
 
         # 规范化 pool
         pool_set: Set[str] = set()
         if prefer_pool:
             for w in prefer_pool:
                 if isinstance(w, str):
-                    ww = w.strip().lower()
+                    ww = normalize_word(w)
                     if ww:
                         pool_set.add(ww)
 
-        # 1) 优先从 pool 抽（保持 pending 的顺序）
-        batch: List[str] = []
-        if pool_set:
-            for w in pending:
-                if w.lower() in pool_set:
-                    batch.append(w)
-                    if len(batch) >= batch_size:
-                        break
-
-        # 2) 不够则从 pending 补齐（仍保持顺序）
-        if len(batch) < batch_size:
-            batch_lc = set([b.lower() for b in batch])
-            for w in pending:
-                if w.lower() in batch_lc:
-                    continue
-                batch.append(w)
-                if len(batch) >= batch_size:
-                    break
+        batch = self._select_batch(batch_size, pool_set, mix)
 
         if len(batch) < batch_size:
             print(f"⚠️  提示：待学习单词不足 {batch_size} 个，仅返回 {len(batch)} 个")
         
         # 如果标记为已分配，立即从 pending_words 中移除，避免重复分配
         if mark_as_assigned and batch:
-            # 从待学习列表中移除
-            new_pending = [w for w in pending if w.lower() not in [b.lower() for b in batch]]
-            assigned = self.progress.get("assigned_words", [])
-            # 添加到已分配列表（避免重复）
-            new_assigned = list(set([w.lower() for w in assigned] + [b.lower() for b in batch]))
-            
-            self.progress["pending_words"] = new_pending
-            self.progress["assigned_words"] = [w for w in assigned if w.lower() in new_assigned] + [b for b in batch if b.lower() not in [a.lower() for a in assigned]]
-            self._save_progress()
-            
-            print(f"💡 已标记 {len(batch)} 个单词为'已分配'，避免重复使用")
+            ops += self._assign(batch, lease_seconds)
+
+        if ops:
+            self._commit(ops)
         
         return batch
 
-    def get_review_batch(self, batch_size: int = 5) -> List[str]:
+    def _assign(self, batch: List[str], lease_seconds: Optional[float], review: Optional[List[str]] = None) -> List[Op]:
+        """把一批待学习单词标记为已分配并创建租约（review 为批次完成时才记录的复习词），返回需要提交的操作"""
+        for w in batch:
+            self.pending.discard(w)
+            self.assigned.add(w)
+        batch_id = f"batch-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        ttl = DEFAULT_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        now = time.time()
+        self.leases[batch_id] = {"words": batch, "deadline": now + ttl, "assigned_at": now}
+        if review:
+            self.leases[batch_id]["review"] = review
+        heapq.heappush(self._lease_heap, (self.leases[batch_id]["deadline"], batch_id))
+        self.last_batch_id = batch_id
+        print(f"💡 已标记 {len(batch)} 个单词为'已分配'，避免重复使用（批次 {batch_id}）")
+        return [("move", "assigned", batch), ("set", "leases", dict(self.leases))]
+
+    @synchronized
+    def get_planned_batch(self, plan, lease_seconds: Optional[float] = None) -> Tuple[List[str], List[str]]:
+        """
+        按预先计算的课程规划（见 curriculum_plan.py）取出下一批，游标保存在进度的 plan_cursor 字段
+
+        - 规划中已不在待学习队列的新词（如已被补漏模式取走）直接跳过
+        - 游标之前的批次中又回到待学习队列的单词（批次被放弃或过期回收）排到本批最前面，
+          本批超出 batch_size 的部分顺延到下一批；规划用完后继续按批取出这些单词（没有复习词）
+        - 复习词只保留仍在复习调度中的单词，随批次一起提交时才记录为已复习（没有新词时立即记录）
+
+        Returns:
+            (新单词列表, 复习单词列表)；规划已用完时返回两个空列表
+        """
+        ops = self._reclaim_expired_leases()
+        cursor = self.progress.get("plan_cursor") or 0
+        carried = plan.stranded(self.pending, cursor)
+        if cursor >= plan.num_batches and not carried:
+            print(f"⚠️  提示：课程规划共 {plan.num_batches} 批，已全部取完")
+            if ops:
+                self._commit(ops)
+            return [], []
+
+        new_words, review_words = plan.batch(cursor) if cursor < plan.num_batches else ([], [])
+        carried_keys = {normalize_word(w) for w in carried}
+        batch = carried + [self.pending.get(w) for w in new_words if w in self.pending and normalize_word(w) not in carried_keys]
+        batch = batch[:plan.batch_size]
+        review = [normalize_word(w) for w in review_words if normalize_word(w) in self.scheduler]
+        self.last_batch_id = None
+        if batch:
+            ops += self._assign(batch, lease_seconds, review)
+        elif review:
+            ops.append(("review", self.scheduler.record_review(review, self.get_current_chapter())))
+        if cursor < plan.num_batches:
+            self.progress["plan_cursor"] = cursor + 1
+            ops.append(("set", "plan_cursor", cursor + 1))
+        self._commit(ops)
+
+        label = f"第 {cursor + 1}/{plan.num_batches} 批" if cursor < plan.num_batches else "已用完，补学回收的单词"
+        print(f"🗺️  课程规划{label}：新词 {len(batch)} 个（其中 {min(len(carried), len(batch))} 个来自之前的批次），复习词 {len(review)} 个")
+        return batch, review
+
+    @synchronized
+    def reset_plan_cursor(self):
+        """重新规划后从第 1 批开始"""
+        self.progress["plan_cursor"] = 0
+        self._commit([("set", "plan_cursor", 0)])
+
+    @synchronized
+    def add_words(self, words: Iterable[str]) -> List[str]:
+        """
+        把词源中新增的单词加入待学习队列（已处于任一状态的单词忽略）：有排名表时按排名插入，否则追加到末尾
+
+        Returns:
+            实际新增的单词
         """
-        获取复习单词（从已学习列表中随机取出）
+        added = [
+            w.strip() for w in words
+            if isinstance(w, str) and w not in self.learned and w not in self.assigned and self.pending.add(w)
+        ]
+        if not added:
+            return added
+        if self.ranks is not None:
+            # pending 中已包含新增单词，合并前先取出
+            added_keys = set(normalize_word(w) for w in added)
+            existing = [w for w in self.pending if normalize_word(w) not in added_keys]
+            ordered = self.ranks.merge(existing, added)
+            self.pending = self._pending_index(ordered)
+            self._commit([("move", "pending", ordered, "front")])
+            print(f"➕ 已按排名插入 {len(added)} 个新单词到待学习队列")
+        else:
+            self._commit([("move", "pending", added)])
+            print(f"➕ 已追加 {len(added)} 个新单词到待学习队列末尾")
+        return added
+
+    def _reclaim_expired_leases(self) -> List[Op]:
+        """回收所有已过期的租约，返回需要提交的操作（没有过期租约时 O(1)）"""
+        now = time.time()
+        expired = 0
+        reclaimed: List[str] = []
+        while self._lease_heap and self._lease_heap[0][0] <= now:
+            deadline, batch_id = heapq.heappop(self._lease_heap)
+            lease = self.leases.get(batch_id)
+            if lease is None or lease["deadline"] != deadline:
+                continue
+            del self.leases[batch_id]
+            expired += 1
+            for w in lease["words"]:
+                # 已学习的单词不回收
+                if self.assigned.discard(w) is not None:
+                    reclaimed.append(w)
+        if not expired:
+            return []
+        reclaimed = self.pending.prepend(reclaimed)
+        print(f"♻️  已回收 {expired} 个过期批次，{len(reclaimed)} 个单词回到待学习队列最前面")
+        return [("move", "pending", reclaimed, "front"), ("set", "leases", dict(self.leases))]
+
+    @synchronized
+    def commit_batch(self, batch_id: str) -> List[str]:
+        """
+        确认批次已入库（step2）：把租约中的单词标记为已学习并结束租约
+
+        Returns:
+            该批次的单词列表（批次不存在或已过期回收时返回空列表）
+        """
+        lease = self.leases.get(batch_id)
+        if lease is None:
+            print(f"⚠️  提示：批次 {batch_id} 不存在（可能已提交或已过期回收）")
+            return []
+        self.mark_as_learned(lease["words"])
+        return lease["words"]
+
+    @synchronized
+    def abort_batch(self, batch_id: str) -> List[str]:
+        """
+        放弃批次：仍处于已分配状态的单词回到待学习队列最前面，批次的复习词不记录为已复习
+
+        Returns:
+            回到待学习队列的单词
+        """
+        lease = self.leases.pop(batch_id, None)
+        if lease is None:
+            print(f"⚠️  提示：批次 {batch_id} 不存在（可能已提交或已过期回收）")
+            return []
+        words = [w for w in lease["words"] if self.assigned.discard(w) is not None]
+        words = self.pending.prepend(words)
+        self._commit([("move", "pending", words, "front"), ("set", "leases", dict(self.leases))])
+        print(f"↩️  已放弃批次 {batch_id}，{len(words)} 个单词回到待学习队列最前面")
+        return words
+
+    @synchronized
+    def lease_words(
+        self, words: List[str], lease_seconds: Optional[float] = None, review: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        为指定单词重新创建租约（如章节已经生成，原租约却已过期回收）：只领取仍在待学习队列中的单词，
+        review 为该章的复习词（批次完成时记录为已复习）
+
+        Returns:
+            重新领取的单词，批次 ID 见 self.last_batch_id（没有可领取的单词时返回空列表）
+        """
+        ops = self._reclaim_expired_leases()
+        batch = [self.pending.get(w) for w in words if w in self.pending]
+        self.last_batch_id = None
+        if batch:
+            ops += self._assign(batch, lease_seconds, [w for w in review or () if w in self.scheduler])
+        if ops:
+            self._commit(ops)
+        return batch
+
+    def _select_batch(
+        self, batch_size: int, pool_set: Set[str], mix: Optional[Dict[str, float]] = None
+    ) -> List[str]:
+        """
+        从待学习索引中选出一批单词（不修改状态）
+
+        - 补漏词池：遍历 pool 与 pending 中较小的一方，命中后按 pending 顺序排列
+        - 分级比例：从各分级的有序队列中取前 k 个，O(batch · log n)，与 pending 大小无关
+        - 顺序补齐：按 pending 顺序遍历，跳过的单词最多 len(batch) 个，整体 O(batch)
+        """
+        batch: List[str] = []
+        if pool_set and batch_size > 0:
+            if len(pool_set) < len(self.pending):
+                batch = self.pending.first_in_order(pool_set, batch_size)
+            else:
+                for w in self.pending:
+                    if normalize_word(w) in pool_set:
+                        batch.append(w)
+                        if len(batch) >= batch_size:
+                            break
+
+        if mix and len(batch) < batch_size:
+            batch += self._select_mix(batch_size - len(batch), mix, set(normalize_word(b) for b in batch))
+
+        if len(batch) < batch_size:
+            batch_lc = set(normalize_word(b) for b in batch)
+            for w in self.pending:
+                if normalize_word(w) in batch_lc:
+                    continue
+                batch.append(w)
+                if len(batch) >= batch_size:
+                    break
+
+        return batch
+
+    def _select_mix(self, count: int, mix: Dict[str, float], skip: Set[str]) -> List[str]:
+        """按分级比例从各分级队列中抽取 count 个单词，结果按 pending 顺序排列"""
+        if not self.bands:
+            print("⚠️  提示：没有难度分级文件（word_bands.txt），忽略分级比例")
+            return []
+        available = {band: self.pending.group_size(band) for band in mix}
+        for key in skip:
+            band = self.bands.get(key)
+            if band in available and key in self.pending:
+                available[band] -= 1
+        quotas = allocate_mix(mix, count, available)
+        picked: List[str] = []
+        for band, quota in quotas.items():
+            picked += self.pending.first_in_group(band, quota, skip)
+        picked.sort(key=self.pending.seq_of)
+        return picked
+
+    @synchronized
+    def get_review_batch(
+        self, batch_size: int = 5, mark_as_reviewed: bool = True, batch_id: Optional[str] = None
+    ) -> List[str]:
+        """
+        获取复习单词（按间隔重复调度，优先取最早到期的单词）
+
+        有曝光索引时，已到期的单词按在已上架小说中的曝光次数从少到多选择
+        （达到 CURRICULUM_EXPOSURE_TARGET 次的单词视为同等优先），不足再按到期顺序补齐。
+        其他未完成批次中等待记录的复习词不会重复选出
         
         Args:
             batch_size: 批次大小，默认 5 个单词
+            mark_as_reviewed: 是否记录为在当前章节复习（更新下次到期章节），默认 True
+            batch_id: 本章的新词批次（get_next_batch 创建的租约）。提供时复习词存入该租约，
+                批次提交（单词全部标记为已学习）时才记录为已复习；批次被放弃或过期回收时不算复习过
         
         Returns:
             复习单词列表
         """
-        learned = self.progress.get("learned_words", [])
-        
-        if len(learned) < batch_size:
+        if len(self.scheduler) < batch_size:
             # 如果已学习单词不足，返回全部
-            print(f"⚠️  提示：已学习单词不足 {batch_size} 个，返回全部 {len(learned)} 个")
-            return learned
+            print(f"⚠️  提示：已学习单词不足 {batch_size} 个，返回全部 {len(self.scheduler)} 个")
+
+        # 曝光索引随 step2 入库更新，每次按文件版本重新获取（未变化时复用缓存）
+        exposure = load_exposure_index(self.exposure_file)
+        held = {w for lease in self.leases.values() for w in lease.get("review", ())}
+        if exposure is not None:
+            batch = self.scheduler.next_batch(
+                batch_size,
+                self.get_current_chapter(),
+                lambda w: min(exposure.count(w), EXPOSURE_TARGET),
+                held,
+            )
+        else:
+            batch = self.scheduler.next_batch(batch_size, skip=held)
+
+        if mark_as_reviewed and batch:
+            lease = self.leases.get(batch_id) if batch_id else None
+            if lease is not None:
+                lease["review"] = batch
+                self._commit([("set", "leases", dict(self.leases))])
+            else:
+                if batch_id:
+                    print(f"⚠️  提示：批次 {batch_id} 不存在，复习词直接记录为已复习")
+                changed = self.scheduler.record_review(batch, self.get_current_chapter())
+                self._commit([("review", changed)])
         
-        # 随机选择
-        return random.sample(learned, batch_size)
+        return batch
 
+    @synchronized
     def mark_as_learned(self, word_list: List[str]):
         """
         标记单词为已学习（从已分配列表中移除，添加到已学习列表）
@@ -194,38 +849,49 @@ class CurriculumManager:
         if not word_list:
             return
         
-        # 转换为小写并去重
-        word_list = list(set([w.lower().strip() for w in word_list if w]))
-        
-        pending = self.progress.get("pending_words", [])
-        learned = self.progress.get("learned_words", [])
-        assigned = self.progress.get("assigned_words", [])
+        # 转换为小写并去重（保持传入顺序）
+        word_list = list(dict.fromkeys(normalize_word(w) for w in word_list if w))
         
-        # 从待学习列表中移除（如果还在的话）
-        new_pending = [w for w in pending if w.lower() not in [wl.lower() for wl in word_list]]
+        for w in word_list:
+            # 从待学习 / 已分配中移除（这些单词已经完成了）
+            self.pending.discard(w)
+            self.assigned.discard(w)
+            # 添加到已学习列表（索引自动去重）
+            self.learned.add(w)
         
-        # 从已分配列表中移除（这些单词已经完成了）
-        new_assigned = [w for w in assigned if w.lower() not in [wl.lower() for wl in word_list]]
+        # 进入复习调度（从下一章开始按策略复习）
+        scheduled = self.scheduler.add(word_list, self.get_current_chapter())
+        ops: List[Op] = [("move", "learned", word_list), ("review", scheduled)]
         
-        # 添加到已学习列表（避免重复）
-        new_learned = list(set(learned + word_list))
-        
-        # 更新进度
-        self.progress["pending_words"] = new_pending
-        self.progress["assigned_words"] = new_assigned
-        self.progress["learned_words"] = new_learned
-        self.progress["total_words"] = len(new_learned) + len(new_pending) + len(new_assigned)
+        # 已学会的单词从租约中移除，租约清空后结束（批次完成，此时才记录批次的复习词）
+        if self.leases:
+            learned_set = set(word_list)
+            leases_changed = False
+            for batch_id, lease in list(self.leases.items()):
+                remaining = [w for w in lease["words"] if normalize_word(w) not in learned_set]
+                if len(remaining) == len(lease["words"]):
+                    continue
+                leases_changed = True
+                if remaining:
+                    self.leases[batch_id] = {**lease, "words": remaining}
+                else:
+                    del self.leases[batch_id]
+                    if lease.get("review"):
+                        ops.append(("review", self.scheduler.record_review(lease["review"], self.get_current_chapter())))
+            if leases_changed:
+                ops.append(("set", "leases", dict(self.leases)))
         
         # 保存
-        self._save_progress()
+        self._commit(ops)
         
         print(f"✅ 已标记 {len(word_list)} 个单词为已学习")
-        print(f"   待学习：{len(new_pending)} 个，已分配：{len(new_assigned)} 个，已学习：{len(new_learned)} 个")
+        print(f"   待学习：{len(self.pending)} 个，已分配：{len(self.assigned)} 个，已学习：{len(self.learned)} 个")
 
+    @synchronized
     def increment_chapter(self):
         """增加章节计数"""
         self.progress["current_book_chapter"] = self.progress.get("current_book_chapter", 0) + 1
-        self._save_progress()
+        self._commit([("set", "current_book_chapter", self.progress["current_book_chapter"])])
 
     def get_current_chapter(self) -> int:
         """获取当前章节号"""
@@ -233,10 +899,10 @@ class CurriculumManager:
 
     def get_statistics(self) -> Dict:
         """获取学习统计信息"""
-        total = self.progress.get("total_words", 0)
-        learned = len(self.progress.get("learned_words", []))
-        pending = len(self.progress.get("pending_words", []))
-        assigned = len(self.progress.get("assigned_words", []))
+        learned = len(self.learned)
+        pending = len(self.pending)
+        assigned = len(self.assigned)
+        total = learned + pending + assigned
         progress_percent = (learned / total * 100) if total > 0 else 0
         
         return {
@@ -246,6 +912,8 @@ class CurriculumManager:
             "assigned_words": assigned,
             "progress_percent": round(progress_percent, 2),
             "current_chapter": self.progress.get("current_book_chapter", 1),
+            "review_due": self.scheduler.due_count(self.get_current_chapter()),
+            "active_batches": len(self.leases),
         }
 
     def print_statistics(self):
@@ -258,17 +926,21 @@ class CurriculumManager:
         print(f"已学习：{stats['learned_words']} 个")
         print(f"待学习：{stats['pending_words']} 个")
         if stats.get('assigned_words', 0) > 0:
-            print(f"已分配（进行中）：{stats['assigned_words']} 个")
+            print(f"已分配（进行中）：{stats['assigned_words']} 个，未完成批次：{stats['active_batches']} 个")
         print(f"学习进度：{stats['progress_percent']}%")
+        if stats.get('review_due', 0) > 0:
+            print(f"待复习（已到期）：{stats['review_due']} 个")
         print(f"当前章节：第 {stats['current_chapter']} 章")
         print("=" * 50 + "\n")
 
 
 # ==================== 便捷函数 ====================
 
-def get_curriculum_manager(progress_file: str = PROGRESS_FILE) -> CurriculumManager:
+def get_curriculum_manager(
+    progress_file: str = PROGRESS_FILE, backend: Optional[str] = None
+) -> CurriculumManager:
     """获取课程管理器实例"""
-    return CurriculumManager(progress_file)
+    return CurriculumManager(progress_file, backend)
 
 
 if __name__ == "__main__":
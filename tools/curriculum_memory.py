@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 只在内存中修改状态的课程管理器
+
+benchmark_curriculum.py（单独测量索引操作）和 simulate_learners.py（课程回放）共用：
+选词逻辑与 CurriculumManager 完全一致，只是跳过写文件。
+"""
+
+from curriculum_manager import CurriculumManager
+
+
+class InMemoryCurriculumManager(CurriculumManager):
+    """只在内存中修改状态的管理器（跳过写文件）"""
+
+    def _commit(self, ops):
+        pass
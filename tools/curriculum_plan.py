@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 课程规划器（预先计算整套课程）
+
+一次性模拟整个分类的学习过程：按待学习顺序每批取 batch_size 个新词，
+用与 CurriculumManager 相同的复习策略挑选已到期的复习词，每批推进一章。
+
+规划文件（curriculum_plan_<分类>.json）很紧凑：
+- words：规划词表，前 seed_count 个是规划时已学习 / 已分配的单词，之后按批次顺序排列，
+  第 k 批新词就是 words[seed_count + k·batch_size : seed_count + (k+1)·batch_size]，无需另存
+- review_offsets / review_ids：第 k 批复习词在 review_ids 中的区间（base64 压缩的整数数组，存单词下标）
+- checkpoint：最后一个未满批次开始前的模拟复习状态；词源增加时从这里继续规划，前面的批次保持不变
+
+step1 使用 --plan 时按游标直接取出第 k 批，不再每次临时选词。
+
+用法：
+  cd tools
+  python3 curriculum_plan.py build [--category reborn] [--batch 60] [--review 20]
+  python3 curriculum_plan.py update [--category reborn]   # 词源增加后增量规划
+  python3 curriculum_plan.py show 3 [--category reborn]   # 查看第 3 批
+  python3 curriculum_plan.py verify [--category reborn]   # 检查覆盖 / 去重 / 复习间隔
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from curriculum_manager import (
+    IELTS_SOURCE_FILE,
+    CurriculumManager,
+    get_progress_file_for_category,
+    normalize_word,
+)
+from progress_store import write_json_atomic
+from review_scheduler import ReviewScheduler, create_policy
+from word_table import decode_ids, encode_ids
+
+DEFAULT_BATCH_SIZE = 60  # 新词（4000词/50篇 ≈ 80词/篇 = 60新词 + 20复习词）
+DEFAULT_REVIEW_SIZE = 20  # 复习词
+
+
+def get_plan_file(progress_file: str) -> str:
+    """进度文件对应的规划文件：progress_tracker_reborn.json -> curriculum_plan_reborn.json"""
+    stem = os.path.splitext(os.path.basename(progress_file))[0]
+    if stem.startswith("progress_tracker"):
+        name = "curriculum_plan" + stem[len("progress_tracker"):]
+    else:
+        name = f"curriculum_plan_{stem}"
+    return os.path.join(os.path.dirname(progress_file), f"{name}.json")
+
+
+class CurriculumPlan:
+    """预先计算的整套课程：每一批的新词 + 复习词"""
+
+    def __init__(
+        self,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        review_size: int = DEFAULT_REVIEW_SIZE,
+        policy: Optional[str] = None,
+        start_chapter: int = 1,
+    ):
+        self.batch_size = batch_size
+        self.review_size = review_size
+        self.policy = create_policy(policy).name
+        self.start_chapter = start_chapter
+        self.words: List[str] = []
+        self.seed_count = 0
+        self.review_offsets: List[int] = [0]
+        self.review_ids: List[int] = []
+        self.checkpoint: Dict = {"batch": 0, "review_state": {}}
+        self._positions: Optional[Dict[str, int]] = None
+
+    @property
+    def num_batches(self) -> int:
+        return -(-(len(self.words) - self.seed_count) // self.batch_size)
+
+    def batch(self, k: int) -> Tuple[List[str], List[str]]:
+        """第 k 批（从 0 开始）的 (新词, 复习词)"""
+        if not 0 <= k < self.num_batches:
+            raise IndexError(f"批次 {k} 超出规划范围（共 {self.num_batches} 批）")
+        start = self.seed_count + k * self.batch_size
+        new_words = self.words[start:start + self.batch_size]
+        review = self.review_ids[self.review_offsets[k]:self.review_offsets[k + 1]]
+        return new_words, [self.words[i] for i in review]
+
+    def batch_start(self, k: int) -> int:
+        """第 k 批新词在 words 中的起始下标"""
+        return self.seed_count + k * self.batch_size
+
+    def position(self, word: str) -> Optional[int]:
+        """单词在规划词表中的下标（不在规划中时返回 None）"""
+        if self._positions is None:
+            self._positions = {normalize_word(w): i for i, w in enumerate(self.words)}
+        return self._positions.get(normalize_word(word))
+
+    def stranded(self, pending: Iterable[str], cursor: int) -> List[str]:
+        """
+        仍在待学习队列中、但所在批次已在游标之前的单词（批次被放弃或租约过期回收后回到待学习队列），
+        按待学习顺序返回；step1 --plan 会把它们排到下一批最前面
+        """
+        start = self.batch_start(min(cursor, self.num_batches))
+        return [w for w in pending if (self.position(w) if self.position(w) is not None else start) < start]
+
+    # ---------- 模拟 ----------
+
+    def _simulate(self, scheduler: ReviewScheduler, first_batch: int):
+        """从 first_batch 开始逐批模拟，追加复习词并记录检查点"""
+        ids = {normalize_word(w): i for i, w in enumerate(self.words)}
+        full_batches = (len(self.words) - self.seed_count) // self.batch_size
+        for k in range(first_batch, self.num_batches + 1):
+            if k == full_batches:
+                self.checkpoint = {
+                    "batch": k,
+                    "review_state": {str(ids[w]): state for w, state in scheduler.to_dict().items() if w in ids},
+                }
+            if k == self.num_batches:
+                break
+            chapter = self.start_chapter + k
+            # 只复习已到期的单词（next_batch 按 due 排序，到期的是前缀）
+            review = [w for w in scheduler.next_batch(self.review_size) if scheduler.states[w][2] <= chapter]
+            scheduler.record_review(review, chapter)
+            self.review_ids.extend(ids[w] for w in review)
+            self.review_offsets.append(len(self.review_ids))
+            new_words, _ = self.batch(k)
+            scheduler.add([normalize_word(w) for w in new_words], chapter)
+
+    def extend(self, new_words: List[str]) -> int:
+        """
+        词源增加后增量规划：从检查点恢复模拟状态，只重算最后一个未满批次及之后的批次
+
+        Returns:
+            实际追加的单词数
+        """
+        known = {normalize_word(w) for w in self.words}
+        added = []
+        for w in new_words:
+            key = normalize_word(w)
+            if key and key not in known:
+                known.add(key)
+                added.append(w.strip())
+        if not added:
+            return 0
+
+        k = self.checkpoint["batch"]
+        scheduler = ReviewScheduler(
+            {normalize_word(self.words[int(i)]): state for i, state in self.checkpoint["review_state"].items()},
+            self.policy,
+        )
+        del self.review_offsets[k + 1:]
+        del self.review_ids[self.review_offsets[k]:]
+        self.words.extend(added)
+        self._positions = None
+        self._simulate(scheduler, k)
+        return len(added)
+
+    # ---------- 读写 ----------
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": 1,
+            "batch_size": self.batch_size,
+            "review_size": self.review_size,
+            "policy": self.policy,
+            "start_chapter": self.start_chapter,
+            "seed_count": self.seed_count,
+            "words": self.words,
+            "review_offsets": encode_ids(self.review_offsets),
+            "review_ids": encode_ids(self.review_ids),
+            "checkpoint": self.checkpoint,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CurriculumPlan":
+        plan = cls(data["batch_size"], data["review_size"], data["policy"], data["start_chapter"])
+        plan.seed_count = data["seed_count"]
+        plan.words = data["words"]
+        plan.review_offsets = decode_ids(data["review_offsets"])
+        plan.review_ids = decode_ids(data["review_ids"])
+        plan.checkpoint = data["checkpoint"]
+        return plan
+
+    def save(self, path: str):
+        write_json_atomic(path, self.to_dict(), indent=None)
+
+    @classmethod
+    def load(cls, path: str) -> "CurriculumPlan":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def sync_source(manager: CurriculumManager) -> List[str]:
+    """把词源文件中进度里还没有的单词追加到待学习队列"""
+    if not os.path.exists(IELTS_SOURCE_FILE):
+        return []
+    with open(IELTS_SOURCE_FILE, "r", encoding="utf-8") as f:
+        return manager.add_words(json.load(f))
+
+
+def build_plan(
+    manager: CurriculumManager,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    review_size: int = DEFAULT_REVIEW_SIZE,
+) -> CurriculumPlan:
+    """
+    根据当前进度规划整套课程
+
+    已学习单词沿用当前复习状态；已分配单词视为在上一章学会（step2 入库后即进入复习）
+    """
+    plan = CurriculumPlan(batch_size, review_size, manager.scheduler.policy.name, manager.get_current_chapter())
+    scheduler = ReviewScheduler({w: list(s) for w, s in manager.scheduler.to_dict().items()}, plan.policy)
+    scheduler.add([normalize_word(w) for w in manager.assigned], plan.start_chapter - 1)
+    plan.words = manager.learned.to_list() + manager.assigned.to_list()
+    plan.seed_count = len(plan.words)
+    plan.words += manager.pending.to_list()
+    plan._simulate(scheduler, 0)
+    return plan
+
+
+def update_plan(plan: CurriculumPlan, manager: CurriculumManager) -> int:
+    """把待学习队列中规划里还没有的单词增量追加到规划末尾，返回追加的单词数"""
+    return plan.extend(manager.pending.to_list())
+
+
+def load_or_build_plan(
+    manager: CurriculumManager,
+    plan_file: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    review_size: int = DEFAULT_REVIEW_SIZE,
+) -> CurriculumPlan:
+    """加载规划文件（词源有新增时增量更新）；不存在或批次配置不同则重新规划"""
+    plan_file = plan_file or get_plan_file(manager.progress_file)
+    sync_source(manager)
+    if os.path.exists(plan_file):
+        plan = CurriculumPlan.load(plan_file)
+        if plan.batch_size == batch_size and plan.review_size == review_size:
+            added = update_plan(plan, manager)
+            if added:
+                plan.save(plan_file)
+                print(f"🗺️  词源新增 {added} 个单词，已增量更新课程规划（共 {plan.num_batches} 批）")
+            return plan
+        print("⚠️  规划文件的批次配置与本次不同，重新规划")
+    plan = build_plan(manager, batch_size, review_size)
+    plan.save(plan_file)
+    manager.reset_plan_cursor()
+    print(f"🗺️  已生成课程规划：{plan.num_batches} 批，保存到 {plan_file}")
+    return plan
+
+
+def verify_plan(plan: CurriculumPlan, manager: Optional[CurriculumManager] = None) -> List[str]:
+    """
+    检查规划，返回发现的问题列表（为空表示通过）
+
+    - 新词不重复，且（给定 manager 时）覆盖进度中的全部单词，待学习单词都在游标所在批次及之后
+      （游标之前的待学习单词来自被放弃 / 过期回收的批次，要等下一次 step1 --plan 补进下一批）
+    - 复习词必须已学过、同一批内不重复，并按复习策略重放时均已到期
+    """
+    problems: List[str] = []
+    keys = [normalize_word(w) for w in plan.words]
+    if len(set(keys)) != len(keys):
+        problems.append(f"规划词表中有 {len(keys) - len(set(keys))} 个重复单词")
+    if manager is not None:
+        everything = {normalize_word(w) for index in (manager.learned, manager.assigned, manager.pending) for w in index}
+        missing = everything - set(keys)
+        if missing:
+            problems.append(f"有 {len(missing)} 个单词不在规划中，例如：{sorted(missing)[:5]}")
+        cursor = manager.progress.get("plan_cursor") or 0
+        stranded = plan.stranded(manager.pending, cursor)
+        if stranded:
+            problems.append(
+                f"有 {len(stranded)} 个待学习单词位于游标（第 {cursor} 批）之前的批次，例如：{stranded[:5]}"
+                f"（下一次 step1 --plan 会把它们排到下一批最前面）"
+            )
+
+    policy = create_policy(plan.policy)
+    # 规划前已学习的单词到期时间取决于实际进度，只检查规划内学习的单词
+    states: Dict[int, Optional[List]] = {i: None for i in range(plan.seed_count)}
+    for k in range(plan.num_batches):
+        chapter = plan.start_chapter + k
+        review = plan.review_ids[plan.review_offsets[k]:plan.review_offsets[k + 1]]
+        if len(set(review)) != len(review):
+            problems.append(f"第 {k} 批复习词重复")
+        for i in review:
+            if i not in states:
+                problems.append(f"第 {k} 批复习了尚未学习的单词 {plan.words[i]}")
+            elif states[i] is not None and states[i][2] > chapter:
+                problems.append(f"第 {k} 批复习 {plan.words[i]} 过早（应在第 {states[i][2]} 章之后）")
+            if states.get(i) is not None:
+                states[i] = policy.review(states[i], chapter)
+        start = plan.seed_count + k * plan.batch_size
+        for i in range(start, min(start + plan.batch_size, len(plan.words))):
+            states[i] = policy.initial(chapter)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="课程规划器：预先计算整套课程的每一批新词与复习词")
+    parser.add_argument("command", choices=["build", "update", "show", "verify"])
+    parser.add_argument("batch_index", nargs="?", type=int, default=None, help="show：批次序号（从 0 开始，默认当前游标）")
+    parser.add_argument("--category", type=str, default=None, help="分类 ID（默认全局进度文件）")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH_SIZE, help="每批新词数（默认 60）")
+    parser.add_argument("--review", type=int, default=DEFAULT_REVIEW_SIZE, help="每批复习词数（默认 20）")
+    args = parser.parse_args()
+
+    manager = CurriculumManager(get_progress_file_for_category(args.category))
+    plan_file = get_plan_file(manager.progress_file)
+
+    if args.command == "build":
+        sync_source(manager)
+        plan = build_plan(manager, args.batch, args.review)
+        plan.save(plan_file)
+        manager.reset_plan_cursor()
+        print(f"✅ 已生成课程规划：{len(plan.words) - plan.seed_count} 个新词，{plan.num_batches} 批")
+        print(f"   保存到：{plan_file}（{os.path.getsize(plan_file)} 字节）")
+        return
+
+    if not os.path.exists(plan_file):
+        print(f"❌ 规划文件 {plan_file} 不存在，请先运行 build")
+        sys.exit(1)
+    plan = CurriculumPlan.load(plan_file)
+
+    if args.command == "update":
+        sync_source(manager)
+        added = update_plan(plan, manager)
+        plan.save(plan_file)
+        print(f"✅ 增量规划完成：新增 {added} 个单词，共 {plan.num_batches} 批")
+    elif args.command == "show":
+        k = (manager.progress.get("plan_cursor") or 0) if args.batch_index is None else args.batch_index
+        new_words, review_words = plan.batch(k)
+        print(f"第 {k} 批（第 {plan.start_chapter + k} 章，共 {plan.num_batches} 批）")
+        print(f"新词（{len(new_words)}）：{new_words}")
+        print(f"复习词（{len(review_words)}）：{review_words}")
+    elif args.command == "verify":
+        problems = verify_plan(plan, manager)
+        if problems:
+            for p in problems[:20]:
+                print(f"❌ {p}")
+            sys.exit(1)
+        print(f"✅ 规划检查通过：{plan.num_batches} 批，覆盖 {len(plan.words)} 个单词，无重复，复习均已到期")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 已上架小说单词曝光索引
+
+记录每个单词在已上架小说（src/data/generated/book-*.json）中以 {word|meaning} 形式出现的次数：
+- books：book_id -> {单词: 次数}（同一本书重新入库时先减去旧计数，不会重复累加）
+- totals：单词 -> 全库总次数
+
+step2 入库时调用 record_book 增量更新，不需要重新扫描整个书库；
+CurriculumManager.get_review_batch 在已到期的复习词中优先选择曝光次数少的单词。
+
+用法：
+  cd tools
+  python3 exposure_index.py sync              # 首次使用：补录索引中还没有的书（已有的书不重复扫描）
+  python3 exposure_index.py stats             # 曝光分布
+  python3 exposure_index.py show abandon      # 查看单词曝光次数
+"""
+
+import argparse
+import functools
+import json
+import os
+from collections import Counter
+from typing import Dict, Optional
+
+from check_library_vocab_coverage import GENERATED_DIR, WORD_MARK_PATTERN, list_generated_books, load_book_content
+from progress_store import FileLock, write_json_atomic
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXPOSURE_INDEX_FILE = os.getenv("CURRICULUM_EXPOSURE_FILE", os.path.join(BASE_DIR, "exposure_index.json"))
+# 曝光次数达到该值的单词视为“已充分曝光”，复习优先级相同（再按到期章节排序）
+EXPOSURE_TARGET = int(os.getenv("CURRICULUM_EXPOSURE_TARGET", "3"))
+
+
+def count_marks(content: str) -> Dict[str, int]:
+    """统计内容中每个 {word|meaning} 单词出现的次数（单词小写）"""
+    counts: Counter = Counter()
+    for m in WORD_MARK_PATTERN.finditer(content):
+        w = m.group(1).strip().lower()
+        if w:
+            counts[w] += 1
+    return dict(counts)
+
+
+class ExposureIndex:
+    """单词曝光索引"""
+
+    def __init__(self, path: str = EXPOSURE_INDEX_FILE):
+        self.path = path
+        self.books: Dict[str, Dict[str, int]] = {}
+        self.totals: Dict[str, int] = {}
+
+    @classmethod
+    def load(cls, path: str = EXPOSURE_INDEX_FILE) -> "ExposureIndex":
+        index = cls(path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            index.books = data.get("books", {})
+            index.totals = data.get("totals", {})
+        return index
+
+    def save(self):
+        write_json_atomic(self.path, {"version": 1, "books": self.books, "totals": self.totals}, indent=None)
+
+    def count(self, word: str) -> int:
+        return self.totals.get(word.strip().lower(), 0)
+
+    def record_book(self, book_id: str, content: str) -> Dict[str, int]:
+        """记录（或替换）一本书的单词计数，返回该书的计数"""
+        for w, n in self.books.pop(book_id, {}).items():
+            left = self.totals.get(w, 0) - n
+            if left > 0:
+                self.totals[w] = left
+            else:
+                self.totals.pop(w, None)
+        counts = count_marks(content)
+        self.books[book_id] = counts
+        for w, n in counts.items():
+            self.totals[w] = self.totals.get(w, 0) + n
+        return counts
+
+
+@functools.lru_cache(maxsize=4)
+def _load_cached(path: str, mtime: float, size: int) -> ExposureIndex:
+    return ExposureIndex.load(path)
+
+
+def load_exposure_index(path: Optional[str] = None) -> Optional[ExposureIndex]:
+    """加载曝光索引（文件不存在返回 None）；文件未变化时复用同一份"""
+    path = path or EXPOSURE_INDEX_FILE
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return _load_cached(os.path.abspath(path), stat.st_mtime, stat.st_size)
+
+
+def _backfill(index: ExposureIndex, generated_dir: str) -> int:
+    """补录索引中还没有的书（已有的书不重复扫描），返回补录的书数"""
+    if not os.path.isdir(generated_dir):
+        return 0
+    added = 0
+    for book_file in list_generated_books(generated_dir):
+        book_id = os.path.splitext(os.path.basename(book_file))[0]
+        if book_id in index.books:
+            continue
+        try:
+            index.record_book(book_id, load_book_content(book_file))
+            added += 1
+        except Exception as e:
+            print(f"⚠️  跳过文件（解析失败）：{os.path.basename(book_file)} -> {e}")
+    return added
+
+
+def record_published_book(
+    book_id: str, content: str, path: str = EXPOSURE_INDEX_FILE, generated_dir: str = GENERATED_DIR
+) -> Dict[str, int]:
+    """
+    step2 入库后调用：在锁内读取 -> 更新这本书 -> 写回
+
+    索引还不存在时先补录书库中已有的书（只会发生一次）
+    """
+    with FileLock(f"{path}.lock"):
+        index = ExposureIndex.load(path)
+        if not os.path.exists(path):
+            _backfill(index, generated_dir)
+        counts = index.record_book(book_id, content)
+        index.save()
+    return counts
+
+
+def sync_library(path: str = EXPOSURE_INDEX_FILE, generated_dir: str = GENERATED_DIR) -> int:
+    """补录索引中还没有的书，返回补录的书数"""
+    with FileLock(f"{path}.lock"):
+        index = ExposureIndex.load(path)
+        added = _backfill(index, generated_dir)
+        if added or not os.path.exists(path):
+            index.save()
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="已上架小说单词曝光索引")
+    parser.add_argument("command", choices=["sync", "stats", "show"])
+    parser.add_argument("words", nargs="*", help="show：要查询的单词")
+    args = parser.parse_args()
+
+    if args.command == "sync":
+        added = sync_library()
+        index = ExposureIndex.load()
+        print(f"✅ 已补录 {added} 本书，索引共 {len(index.books)} 本书、{len(index.totals)} 个单词")
+        return
+
+    index = load_exposure_index()
+    if index is None:
+        print(f"❌ 曝光索引 {EXPOSURE_INDEX_FILE} 不存在，请先运行 sync")
+        return
+
+    if args.command == "stats":
+        distribution = Counter(min(n, EXPOSURE_TARGET) for n in index.totals.values())
+        print(f"📚 {len(index.books)} 本书，{len(index.totals)} 个单词，共 {sum(index.totals.values())} 次曝光")
+        for n in range(1, EXPOSURE_TARGET + 1):
+            label = f"≥{n}" if n == EXPOSURE_TARGET else f"{n}"
+            print(f"   曝光 {label:<3} 次：{distribution.get(n, 0)} 个单词")
+    elif args.command == "show":
+        for w in args.words:
+            print(f"{w:<20} {index.count(w)} 次")
+
+
+if __name__ == "__main__":
+    main()
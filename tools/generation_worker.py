@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 常驻生成进程 + 本地任务队列（SQLite）
+
+每个任务生成一章：分类（对应该分类的进度文件）、批次大小 / 复习词数、故事上下文（入队时从故事配置读取）。
+worker 常驻运行，连续处理队列中的任务：
+- HTTP 连接池（llm_client.get_client）和每个分类的课程管理器（内存中的进度索引）在任务之间复用
+- 任务领取带租约（WORKER_JOB_LEASE，默认 30 分钟），处理期间定时续约；worker 崩溃后租约到期，任务自动被重新领取
+- 每完成一步（领取课程批次 -> 保存章节 -> 提交批次）都把进度写回任务，重试时从中断处继续：
+  已领取的批次不会重复领取，已保存的章节不会重新生成，已提交的批次不会再推进章节；
+  章节保存后批次租约过期的，重新领取这些单词再提交
+- 失败的任务重新排队，超过 WORKER_MAX_ATTEMPTS（默认 3）次后标记为失败并放弃课程批次（单词回到待学习队列）
+- 可以同时运行多个 worker（领取任务和选词都是跨进程安全的）
+
+队列文件：tools/generation_queue.db（WORKER_QUEUE_FILE）
+
+用法：
+  cd tools
+  python3 generation_worker.py enqueue --category reborn --count 20 --batch-size 20 --review-size 5
+  python3 generation_worker.py run                      # 常驻运行，队列空时等待新任务（Ctrl+C 退出）
+  python3 generation_worker.py run --exit-when-idle     # 队列处理完就退出
+  python3 generation_worker.py status
+  python3 generation_worker.py retry-failed
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from curriculum_manager import CurriculumManager, get_progress_file_for_category
+from llm_cache import enable_cache
+from llm_client import get_client
+from llm_metrics import metrics_tags
+from novel_generator import STORY_CONFIG_FILE, generate_chapter, load_story_config, save_chapter
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUEUE_FILE = os.getenv("WORKER_QUEUE_FILE", os.path.join(BASE_DIR, "generation_queue.db"))
+JOB_LEASE_SECONDS = float(os.getenv("WORKER_JOB_LEASE", "1800"))
+MAX_ATTEMPTS = int(os.getenv("WORKER_MAX_ATTEMPTS", "3"))
+POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "5"))
+
+
+class JobQueue:
+    """SQLite 任务队列：领取（带租约）/ 保存进度 / 确认完成 / 失败重试"""
+
+    def __init__(self, path: str = QUEUE_FILE):
+        self.path = path
+        self._lock = threading.Lock()  # 续约线程和主线程共用连接
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT '{}',
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_until REAL,
+                error TEXT,
+                result TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)")
+
+    def enqueue(self, category: str, payload: Dict) -> int:
+        now = time.time()
+        with self._lock:
+            cur = self.conn.execute(
+                "INSERT INTO jobs (category, payload, created, updated) VALUES (?, ?, ?, ?)",
+                (category, json.dumps(payload, ensure_ascii=False), now, now),
+            )
+        return cur.lastrowid
+
+    def claim(self, worker: str, lease_seconds: float = JOB_LEASE_SECONDS) -> Optional[Dict]:
+        """
+        领取最早的待处理任务（包括租约已过期的进行中任务，即崩溃的 worker 留下的任务）
+
+        重新领取时尝试次数已用完的任务直接标记为失败
+        """
+        with self._lock:
+            while True:
+                now = time.time()
+                self.conn.execute("BEGIN IMMEDIATE")
+                try:
+                    row = self.conn.execute(
+                        """SELECT * FROM jobs
+                           WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)
+                           ORDER BY id LIMIT 1""",
+                        (now,),
+                    ).fetchone()
+                    if row is None:
+                        self.conn.execute("COMMIT")
+                        return None
+                    if row["attempts"] >= MAX_ATTEMPTS:
+                        self.conn.execute(
+                            "UPDATE jobs SET status = 'failed', error = COALESCE(error, '租约过期次数过多'), updated = ? WHERE id = ?",
+                            (now, row["id"]),
+                        )
+                        self.conn.execute("COMMIT")
+                        continue
+                    self.conn.execute(
+                        """UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?,
+                           lease_until = ?, updated = ? WHERE id = ?""",
+                        (worker, now + lease_seconds, now, row["id"]),
+                    )
+                    self.conn.execute("COMMIT")
+                except BaseException:
+                    self.conn.execute("ROLLBACK")
+                    raise
+                job = dict(row)
+                job["payload"] = json.loads(job["payload"])
+                job["state"] = json.loads(job["state"])
+                job["attempts"] += 1
+                return job
+
+    def _update(self, job_id: int, sql: str, params: tuple):
+        with self._lock:
+            self.conn.execute(f"UPDATE jobs SET {sql}, updated = ? WHERE id = ?", params + (time.time(), job_id))
+
+    def extend(self, job_id: int, lease_seconds: float = JOB_LEASE_SECONDS):
+        self._update(job_id, "lease_until = ?", (time.time() + lease_seconds,))
+
+    def save_state(self, job_id: int, state: Dict):
+        """保存任务进度（每完成一步调用一次，重试时从这里继续）"""
+        self._update(job_id, "state = ?", (json.dumps(state, ensure_ascii=False),))
+
+    def load_state(self, job_id: int) -> Dict:
+        with self._lock:
+            row = self.conn.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def ack(self, job_id: int, result: Dict):
+        self._update(
+            job_id, "status = 'done', lease_until = NULL, error = NULL, result = ?", (json.dumps(result, ensure_ascii=False),)
+        )
+
+    def fail(self, job_id: int, error: str, attempts: int) -> bool:
+        """记录失败；还有尝试次数时重新排队（返回 True），否则标记为失败"""
+        retry = attempts < MAX_ATTEMPTS
+        self._update(job_id, "status = ?, lease_until = NULL, error = ?", ("queued" if retry else "failed", error[:500]))
+        return retry
+
+    def release(self, job_id: int):
+        """worker 正常退出时把正在处理的任务放回队列（不计入尝试次数）"""
+        self._update(job_id, "status = 'queued', lease_until = NULL, attempts = MAX(attempts - 1, 0)", ())
+
+    def retry_failed(self) -> int:
+        with self._lock:
+            cur = self.conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, updated = ? WHERE status = 'failed'", (time.time(),)
+            )
+        return cur.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        return {row[0]: row[1] for row in self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")}
+
+    def recent_failures(self, limit: int = 5) -> List[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT id, category, attempts, error FROM jobs WHERE status = 'failed' ORDER BY updated DESC LIMIT ?", (limit,)
+        ).fetchall()
+
+
+class Heartbeat:
+    """处理任务期间定时续约（租约时长的 1/3），避免长任务被其他 worker 当作崩溃任务领走"""
+
+    def __init__(self, queue: JobQueue, job_id: int, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.queue = queue
+        self.job_id = job_id
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            self.queue.extend(self.job_id, self.lease_seconds)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class GenerationWorker:
+    """常驻生成进程：复用 HTTP 连接池和各分类的课程管理器，逐个处理队列中的任务"""
+
+    def __init__(self, queue: JobQueue, output_dir: Optional[str] = None):
+        self.queue = queue
+        self.output_dir = output_dir
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.managers: Dict[str, CurriculumManager] = {}
+        self.processed = 0
+        self.failed = 0
+        get_client()  # 预先建立客户端，之后所有任务共用连接池
+
+    def manager(self, category: str) -> CurriculumManager:
+        """每个分类一个课程管理器，常驻内存（其他进程修改进度时会自动重新加载）"""
+        if category not in self.managers:
+            self.managers[category] = CurriculumManager(get_progress_file_for_category(category))
+        return self.managers[category]
+
+    def process(self, job: Dict):
+        """
+        处理一个任务：领取课程批次 -> 生成并保存章节 -> 提交批次 -> 确认任务
+
+        每一步完成后保存任务进度；重试（包括崩溃后被重新领取）时跳过已完成的步骤
+        """
+        payload, state = job["payload"], job["state"]
+        manager = self.manager(job["category"])
+
+        # 1. 领取课程批次（沿用上次领取、仍然有效的批次；章节已保存时不再重新领取）
+        if not state.get("chapter_file"):
+            if not state.get("batch_id") or state["batch_id"] not in manager.leases:
+                words = manager.get_next_batch(payload.get("batch_size", 20), lease_seconds=payload.get("lease_seconds"))
+                if not words:
+                    raise RuntimeError("没有可用的新单词")
+                review_size = payload.get("review_size", 5)
+                review = (
+                    manager.get_review_batch(review_size, batch_id=manager.last_batch_id)
+                    if review_size and len(manager.scheduler) else []
+                )
+                state = {"batch_id": manager.last_batch_id, "words": words, "review": review}
+                self.queue.save_state(job["id"], state)
+        elif not state.get("committed") and state["batch_id"] not in manager.leases:
+            state = self._recover_batch(job, manager, state)
+
+        # 2. 生成并保存章节（已保存过的不再重新生成）
+        if not state.get("chapter_file"):
+            chapter = generate_chapter(state["words"], state["review"] or None, payload.get("story_context"))
+            state["chapter_file"] = save_chapter(chapter, self.output_dir)
+            state["chapter_id"] = chapter["id"]
+            self.queue.save_state(job["id"], state)
+
+        # 3. 提交批次并推进章节（记录 committed，之后的重试直接确认任务）
+        if not state.get("committed"):
+            if not manager.commit_batch(state["batch_id"]):
+                # 生成期间租约过期被回收：不能确认任务，重试时重新领取这些单词后再提交
+                raise RuntimeError(f"批次 {state['batch_id']} 已不存在，章节 {state['chapter_file']} 尚未记入进度")
+            manager.increment_chapter()
+            state["committed"] = True
+            self.queue.save_state(job["id"], state)
+        self.queue.ack(job["id"], {"chapter_id": state["chapter_id"], "chapter_file": state["chapter_file"]})
+
+    def _recover_batch(self, job: Dict, manager: CurriculumManager, state: Dict) -> Dict:
+        """
+        章节已保存但课程批次的租约不在了：
+        - 单词都已学习：上次在提交批次之后、保存进度之前崩溃，视为已提交
+        - 否则租约已过期回收：重新领取仍在待学习队列中的单词（已被其他批次领取的单词由那一批提交）
+        """
+        if all(w in manager.learned for w in state["words"]):
+            print(f"💡 批次 {state['batch_id']} 的单词均已学习，视为已提交")
+            state["committed"] = True
+        else:
+            words = manager.lease_words(state["words"], job["payload"].get("lease_seconds"), state["review"])
+            if not words:
+                raise RuntimeError(f"批次 {state['batch_id']} 已过期，其单词均已被其他批次领取，章节 {state['chapter_file']} 无法记入进度")
+            print(f"♻️  批次 {state['batch_id']} 已过期，重新领取其中 {len(words)} 个单词（批次 {manager.last_batch_id}）")
+            state["batch_id"] = manager.last_batch_id
+        self.queue.save_state(job["id"], state)
+        return state
+
+    def _give_up(self, job: Dict):
+        """任务最终失败：放弃课程批次，单词回到待学习队列"""
+        batch_id = job["state"].get("batch_id")
+        if batch_id:
+            self.manager(job["category"]).abort_batch(batch_id)
+
+    def run(self, exit_when_idle: bool = False, max_jobs: Optional[int] = None):
+        print(f"🛠️  worker {self.name} 已启动，队列：{self.queue.path}")
+        while max_jobs is None or self.processed + self.failed < max_jobs:
+            job = self.queue.claim(self.name)
+            if job is None:
+                if exit_when_idle:
+                    break
+                time.sleep(POLL_SECONDS)
+                continue
+
+            print(f"\n📥 任务 #{job['id']}（分类 {job['category'] or '默认'}，第 {job['attempts']} 次尝试）")
+            started = time.perf_counter()
+            try:
+                with Heartbeat(self.queue, job["id"]), metrics_tags(job=job["id"]):
+                    self.process(job)
+            except KeyboardInterrupt:
+                self.queue.release(job["id"])
+                print(f"\n⏸️  已把任务 #{job['id']} 放回队列")
+                raise
+            except Exception as e:
+                self.failed += 1
+                # 重新读取已保存的进度（process 中途失败时 job["state"] 可能不是最新）
+                job["state"] = self.queue.load_state(job["id"])
+                if self.queue.fail(job["id"], f"{type(e).__name__}: {e}", job["attempts"]):
+                    print(f"❌ 任务 #{job['id']} 失败：{e}，稍后重试")
+                else:
+                    print(f"❌ 任务 #{job['id']} 失败：{e}，已达最大尝试次数，放弃")
+                    self._give_up(job)
+                continue
+            self.processed += 1
+            print(f"✅ 任务 #{job['id']} 完成，用时 {time.perf_counter() - started:.1f}s（本次已完成 {self.processed} 个）")
+
+        print(f"\n🏁 worker 退出：完成 {self.processed} 个任务，失败 {self.failed} 次")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻生成进程 + 本地任务队列")
+    parser.add_argument("--queue", type=str, default=QUEUE_FILE, help="队列文件（默认 tools/generation_queue.db）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_enqueue = sub.add_parser("enqueue", help="添加章节任务")
+    p_enqueue.add_argument("--category", type=str, default="", help="分类ID（如 reborn），默认使用全局进度文件")
+    p_enqueue.add_argument("--count", type=int, default=1, help="任务数（每个任务一章，默认 1）")
+    p_enqueue.add_argument("--batch-size", type=int, default=20, help="每章新单词数（默认 20）")
+    p_enqueue.add_argument("--review-size", type=int, default=5, help="每章复习单词数（默认 5）")
+    p_enqueue.add_argument("--lease-hours", type=float, default=None, help="课程批次租约时长（小时，默认 24）")
+    p_enqueue.add_argument("--story-config", type=str, default=STORY_CONFIG_FILE, help="故事配置文件（入队时读取）")
+
+    p_run = sub.add_parser("run", help="常驻运行，连续处理任务")
+    p_run.add_argument("--exit-when-idle", action="store_true", help="队列中没有任务时退出")
+    p_run.add_argument("--max-jobs", type=int, default=None, help="最多处理的任务数")
+    p_run.add_argument("--output-dir", type=str, default=None, help="章节输出目录（默认 src/data/generated）")
+    p_run.add_argument("--cache", action="store_true", help="启用 LLM 响应缓存（见 llm_cache.py）")
+
+    sub.add_parser("status", help="查看队列状态")
+    sub.add_parser("retry-failed", help="把失败的任务重新排队")
+    args = parser.parse_args()
+
+    queue = JobQueue(args.queue)
+    if args.command == "enqueue":
+        payload = {
+            "batch_size": args.batch_size,
+            "review_size": args.review_size,
+            "lease_seconds": args.lease_hours * 3600 if args.lease_hours is not None else None,
+            "story_context": load_story_config(args.story_config),
+        }
+        ids = [queue.enqueue(args.category, payload) for _ in range(args.count)]
+        print(f"✅ 已添加 {len(ids)} 个任务（#{ids[0]} - #{ids[-1]}）")
+    elif args.command == "run":
+        if args.cache:
+            enable_cache()
+        worker = GenerationWorker(queue, args.output_dir)
+        try:
+            worker.run(args.exit_when_idle, args.max_jobs)
+        except KeyboardInterrupt:
+            sys.exit(130)
+    elif args.command == "status":
+        counts = queue.counts()
+        print(
+            f"📋 待处理 {counts.get('queued', 0)}，进行中 {counts.get('running', 0)}，"
+            f"已完成 {counts.get('done', 0)}，失败 {counts.get('failed', 0)}"
+        )
+        for row in queue.recent_failures():
+            print(f"   ❌ #{row['id']}（{row['category'] or '默认'}，{row['attempts']} 次）：{row['error']}")
+    elif args.command == "retry-failed":
+        print(f"✅ 已重新排队 {queue.retry_failed()} 个失败任务")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 批处理接口文件（Batch API JSONL）
+
+批量生成时把请求写成 JSONL 文件提交给服务商的批处理接口（OpenAI Batch API 格式，
+DeepSeek 等兼容服务同样适用）：价格更低，也没有每分钟请求数限制。结果文件下载后再导入。
+
+请求文件每行：
+  {"custom_id": "...", "method": "POST", "url": "/v1/chat/completions", "body": {"model": ..., "messages": [...], ...}}
+结果文件每行：
+  {"custom_id": "...", "response": {"status_code": 200, "body": {<chat completion>}}, "error": null}
+
+custom_id 中带有导入所需的全部信息，不需要额外的清单文件：
+- 章节：chapter:<分类>:<课程批次ID>（单词从课程批次的租约中取回）
+- 单词详情：vocab:<单词>
+
+生成 / 导入命令见 novel_generator.py 和 vocab_enricher.py 的 --batch-out / --ingest；
+llm_stub_server.py --batch-in 可以离线为请求文件生成结果文件，用来测试导入流程。
+"""
+
+import json
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+BATCH_URL = "/v1/chat/completions"
+
+
+def batch_request(custom_id: str, model: str, messages: List[Dict], params: Dict) -> Dict:
+    """一行批处理请求"""
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_URL,
+        "body": {"model": model, "messages": messages, **params},
+    }
+
+
+def write_batch_file(path: str, requests: Iterable[Dict]) -> int:
+    """写入请求文件，返回请求数"""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for request in requests:
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def read_batch_requests(path: str) -> Iterator[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_batch_results(path: str) -> Iterator[Tuple[str, Optional[str], Optional[Dict], Optional[str]]]:
+    """
+    逐行读取结果文件
+
+    Yields:
+        (custom_id, 模型输出的文本, usage, 错误信息)；请求失败时文本为 None、错误信息非空
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield f"line-{line_no}", None, None, f"第 {line_no} 行不是合法 JSON：{e}"
+                continue
+            custom_id = item.get("custom_id") or f"line-{line_no}"
+            if item.get("error"):
+                error = item["error"]
+                yield custom_id, None, None, error.get("message", str(error)) if isinstance(error, dict) else str(error)
+                continue
+            response = item.get("response") or {}
+            body = response.get("body") or {}
+            if response.get("status_code") != 200:
+                message = (body.get("error") or {}).get("message") if isinstance(body, dict) else None
+                yield custom_id, None, None, f"HTTP {response.get('status_code')}：{message or body}"
+                continue
+            try:
+                text = body["choices"][0]["message"]["content"] or ""
+            except (KeyError, IndexError, TypeError):
+                yield custom_id, None, None, "响应中没有 choices[0].message.content"
+                continue
+            yield custom_id, text, body.get("usage"), None
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - LLM 响应缓存（按内容寻址，SQLite）
+
+缓存键 = sha256(model, base_url, messages, 请求参数（temperature / max_tokens / response_format ...）)，
+值为模型输出的文本。崩溃或下游步骤失败后重跑时，相同的请求直接重放缓存，不再调用接口；
+离线测试下游流程时结果也是确定的。
+
+- 存储：tools/llm_cache.db（LLM_CACHE_FILE），所有进程共用
+- 淘汰：总大小超过 LLM_CACHE_MAX_MB（默认 200MB）时按最近使用时间淘汰（LRU）
+- 启用：命令行 --cache（novel_generator / concurrent_generator / vocab_enricher），或环境变量 LLM_CACHE=1
+
+用法：
+  cd tools
+  python3 llm_cache.py stats
+  python3 llm_cache.py clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_FILE = os.getenv("LLM_CACHE_FILE", os.path.join(BASE_DIR, "llm_cache.db"))
+CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "200"))
+
+
+def cache_key(model: str, base_url: str, messages: List[Dict], params: Dict) -> str:
+    """请求的内容哈希（stream 不影响输出内容，不参与计算）"""
+    payload = {
+        "model": model,
+        "base_url": str(base_url).rstrip("/"),
+        "messages": messages,
+        "params": {k: v for k, v in params.items() if k != "stream"},
+    }
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLite 响应缓存（线程安全），超过容量时按 LRU 淘汰"""
+
+    def __init__(self, path: str = CACHE_FILE, max_mb: float = CACHE_MAX_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT text FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def put(self, key: str, text: str):
+        size = len(text.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                """INSERT INTO responses (key, text, size, created, last_used) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (key) DO UPDATE SET text = excluded.text, size = excluded.size, last_used = excluded.last_used""",
+                (key, text, size, now, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        victims = []
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            victims.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+
+    def stats(self) -> Dict:
+        count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"entries": count, "bytes": total, "max_bytes": self.max_bytes}
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.execute("VACUUM")
+
+
+_active: Optional[LLMCache] = None
+
+
+def enable_cache(path: Optional[str] = None) -> LLMCache:
+    """启用进程内的响应缓存（--cache）"""
+    global _active
+    if _active is None or (path and os.path.abspath(path) != os.path.abspath(_active.path)):
+        _active = LLMCache(path or CACHE_FILE)
+    return _active
+
+
+def active_cache() -> Optional[LLMCache]:
+    """当前启用的缓存（未启用返回 None；环境变量 LLM_CACHE=1 时自动启用）"""
+    if _active is None and os.getenv("LLM_CACHE", "0") == "1":
+        enable_cache()
+    return _active
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM 响应缓存")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("--file", type=str, default=CACHE_FILE, help="缓存文件（默认 tools/llm_cache.db）")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"⚠️  缓存文件 {args.file} 不存在")
+        return
+    cache = LLMCache(args.file)
+    if args.command == "stats":
+        stats = cache.stats()
+        print(f"💾 {args.file}：{stats['entries']} 条，{stats['bytes'] / 1024 / 1024:.1f}MB / {stats['max_bytes'] / 1024 / 1024:.0f}MB")
+    elif args.command == "clear":
+        cache.clear()
+        print(f"✅ 已清空缓存 {args.file}")
+
+
+if __name__ == "__main__":
+    main()
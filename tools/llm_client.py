@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - LLM 客户端公共部分
+
+- API 配置（OPENAI_API_KEY / OPENAI_BASE_URL / OPENAI_MODEL，novel_generator 与 vocab_enricher 共用）
+- get_client / create_async_client：同一进程内复用一个带连接池的客户端，不再每次调用新建
+- RateLimiter：并发数上限 + 每分钟请求数（RPM）/ 每分钟 token 数（TPM）令牌桶，供 asyncio 并发生成使用
+
+环境变量：
+  LLM_CONCURRENCY   并发请求数上限（默认 4）
+  LLM_RPM           每分钟请求数上限（默认 0 = 不限）
+  LLM_TPM           每分钟 token 数上限（默认 0 = 不限）
+  LLM_TIMEOUT       单次请求超时秒数（默认 600）
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass  # dotenv 是可选的
+
+from openai import AsyncOpenAI, OpenAI
+
+# ==================== API 配置 ====================
+API_KEY = os.getenv("OPENAI_API_KEY", "your-api-key-here")
+BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")  # DeepSeek: "https://api.deepseek.com/v1"
+MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")  # DeepSeek: "deepseek-chat"
+
+DEFAULT_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+DEFAULT_RPM = float(os.getenv("LLM_RPM", "0"))
+DEFAULT_TPM = float(os.getenv("LLM_TPM", "0"))
+REQUEST_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "600"))
+
+_clients: Dict[tuple, OpenAI] = {}
+
+
+def get_client(base_url: Optional[str] = None, api_key: Optional[str] = None) -> OpenAI:
+    """同步客户端（同一 base_url + api_key 在进程内只创建一次，复用 HTTP 连接池）"""
+    key = (base_url or BASE_URL, api_key or API_KEY)
+    if key not in _clients:
+        _clients[key] = OpenAI(base_url=key[0], api_key=key[1], timeout=REQUEST_TIMEOUT)
+    return _clients[key]
+
+
+def create_async_client(base_url: Optional[str] = None, api_key: Optional[str] = None) -> AsyncOpenAI:
+    """
+    异步客户端：一次并发运行创建一个，所有任务共用（连接池绑定到当前事件循环，用完调用 close()）
+    """
+    return AsyncOpenAI(base_url=base_url or BASE_URL, api_key=api_key or API_KEY, timeout=REQUEST_TIMEOUT)
+
+
+def estimate_tokens(messages: List[Dict], max_tokens: int) -> int:
+    """请求的 token 数上限估计：提示词按 1 字符 ≈ 1 token 保守估计，加上 max_tokens"""
+    return sum(len(m.get("content") or "") for m in messages) + max_tokens
+
+
+class TokenBucket:
+    """令牌桶：每分钟补充 rate_per_minute 个令牌，最多积攒一分钟的量"""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """距离可以取出 amount 个令牌还需等待的秒数（超过桶容量的请求按装满计算，避免永远等待）"""
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+    def give_back(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """
+    asyncio 限流器：并发数 + RPM + TPM
+
+    用法：
+        async with limiter.limit(estimate_tokens(messages, max_tokens)) as ticket:
+            resp = await client.chat.completions.create(...)
+            ticket["actual"] = resp.usage.total_tokens    # 可选：按实际用量退还多预扣的 token
+    """
+
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rpm: float = DEFAULT_RPM,
+        tpm: float = DEFAULT_TPM,
+    ):
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.waited = 0.0  # 因 RPM / TPM 限制累计等待的秒数
+
+    async def _wait_for_budget(self, estimated_tokens: int):
+        while True:
+            delay = max(
+                self.requests.delay(1) if self.requests else 0.0,
+                self.tokens.delay(estimated_tokens) if self.tokens else 0.0,
+            )
+            if delay <= 0:
+                break
+            self.waited += delay
+            await asyncio.sleep(delay)
+        if self.requests:
+            self.requests.take(1)
+        if self.tokens:
+            self.tokens.take(estimated_tokens)
+
+    @asynccontextmanager
+    async def limit(self, estimated_tokens: int):
+        started = time.monotonic()
+        async with self.semaphore:
+            await self._wait_for_budget(estimated_tokens)
+            # queued：排队等待并发名额和 RPM / TPM 额度的秒数
+            ticket = {"estimated": estimated_tokens, "actual": None, "queued": round(time.monotonic() - started, 3)}
+            try:
+                yield ticket
+            finally:
+                if self.tokens and ticket["actual"] is not None and ticket["actual"] < estimated_tokens:
+                    self.tokens.give_back(estimated_tokens - ticket["actual"])
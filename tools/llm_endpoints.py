@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 多端点 LLM 池（对冲请求 + 熔断）
+
+同时配置 OpenAI 和 DeepSeek 等多个端点时：
+- 每个端点记录最近请求的耗时；请求超过主端点的 p95 耗时仍未返回时，向下一个端点发送一个对冲请求，
+  谁先返回用谁，另一个立即取消（关闭连接）
+- 熔断：端点连续失败（错误 / 超时）LLM_BREAKER_THRESHOLD 次后暂停使用 LLM_BREAKER_COOLDOWN 秒，
+  之后放行请求试探，成功即恢复
+- 端点失败时自动转移到下一个端点；请求本身有问题（400）时直接报错，不转移
+- 统计每个端点的请求数、失败数、p50 / p95 耗时，以及对冲触发次数和对冲获胜次数
+
+配置文件 tools/llm_endpoints.json（LLM_ENDPOINTS_FILE），按优先级排列，至少两个端点时启用：
+  [
+    {"name": "openai", "base_url": "https://api.openai.com/v1", "model": "gpt-4o", "api_key_env": "OPENAI_API_KEY"},
+    {"name": "deepseek", "base_url": "https://api.deepseek.com/v1", "model": "deepseek-chat", "api_key_env": "DEEPSEEK_API_KEY"}
+  ]
+可选字段：hedge_after（耗时样本不足时的对冲等待秒数，默认 LLM_HEDGE_AFTER = 60）、timeout（请求超时秒数）
+
+流式请求不经过端点池（流式请求有自己的提前中断重试）。
+
+用法：
+  cd tools
+  python3 llm_endpoints.py show       # 查看配置
+  python3 llm_endpoints.py probe      # 向每个端点发一个小请求，检查连通性和耗时
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from openai import AsyncOpenAI, BadRequestError
+
+from llm_client import API_KEY, REQUEST_TIMEOUT
+from llm_metrics import current_call, percentile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENDPOINTS_FILE = os.getenv("LLM_ENDPOINTS_FILE", os.path.join(BASE_DIR, "llm_endpoints.json"))
+HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "60"))
+BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "3"))
+BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "60"))
+MIN_LATENCY_SAMPLES = 5  # 样本少于该数量时用 hedge_after 作为对冲等待时间
+
+
+class CircuitBreaker:
+    """连续失败 threshold 次后打开，cooldown 秒后放行试探请求"""
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class Endpoint:
+    """一个 OpenAI 兼容端点及其耗时 / 熔断状态"""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        model: str,
+        api_key: str,
+        hedge_after: float = HEDGE_AFTER,
+        timeout: float = REQUEST_TIMEOUT,
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.model = model
+        self.api_key = api_key
+        self.hedge_after = hedge_after
+        self.timeout = timeout
+        self.breaker = CircuitBreaker()
+        self.latencies: deque = deque(maxlen=100)
+        self.stats = {"requests": 0, "errors": 0, "cancelled": 0}
+
+    def hedge_delay(self) -> float:
+        """对冲等待时间：最近耗时的 p95（样本不足时用 hedge_after）"""
+        if len(self.latencies) < MIN_LATENCY_SAMPLES:
+            return self.hedge_after
+        return percentile(self.latencies, 0.95)
+
+
+class EndpointPool:
+    """多端点池：按配置顺序选择未熔断的端点，超过 p95 时对冲，失败时转移"""
+
+    def __init__(self, endpoints: List[Endpoint]):
+        self.endpoints = endpoints
+        self.stats = {"requests": 0, "hedges": 0, "hedge_wins": 0, "failovers": 0}
+        # 事件循环 -> {端点名: 客户端}；按循环对象（弱引用）而不是 id() 区分，循环被回收后其 id 可能被新循环复用
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncOpenAI]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._loop: Optional[asyncio.AbstractEventLoop] = None  # create() 使用的后台事件循环
+        self._loop_lock = threading.Lock()
+
+    def _client(self, endpoint: Endpoint) -> AsyncOpenAI:
+        """
+        每个端点每个事件循环一个客户端（连接池绑定到事件循环）
+
+        关闭 SDK 自带的重试：错误要立即计入熔断，由池转移到下一个端点
+        """
+        clients = self._clients.setdefault(asyncio.get_running_loop(), {})
+        if endpoint.name not in clients:
+            clients[endpoint.name] = AsyncOpenAI(
+                base_url=endpoint.base_url, api_key=endpoint.api_key, timeout=endpoint.timeout, max_retries=0
+            )
+        return clients[endpoint.name]
+
+    def cache_scope(self) -> Tuple[str, str]:
+        """响应缓存键使用的 (model, base_url)：响应可能来自池中任一端点，按整个池的配置计算"""
+        return ",".join(e.model for e in self.endpoints), ",".join(e.base_url for e in self.endpoints)
+
+    async def aclose(self):
+        """关闭当前事件循环中创建的客户端"""
+        for client in self._clients.pop(asyncio.get_running_loop(), {}).values():
+            await client.close()
+
+    def _candidates(self) -> List[Endpoint]:
+        healthy = [e for e in self.endpoints if not e.breaker.is_open]
+        return healthy or list(self.endpoints)  # 全部熔断时仍然按顺序尝试
+
+    async def _call(self, endpoint: Endpoint, messages: List[Dict], params: Dict):
+        endpoint.stats["requests"] += 1
+        started = time.monotonic()
+        try:
+            response = await self._client(endpoint).chat.completions.create(
+                model=endpoint.model, messages=messages, **params
+            )
+        except asyncio.CancelledError:
+            endpoint.stats["cancelled"] += 1
+            raise
+        except BadRequestError:
+            raise
+        except Exception:
+            endpoint.stats["errors"] += 1
+            endpoint.breaker.record_failure()
+            raise
+        endpoint.latencies.append(time.monotonic() - started)
+        endpoint.breaker.record_success()
+        return response
+
+    async def acreate(self, messages: List[Dict], params: Dict, call: Optional[Dict] = None):
+        """
+        发送一次（可能对冲的）请求，返回最先成功的响应
+
+        call: 正在记录的调用统计（默认取 llm_metrics.current_call()），填写实际使用的端点和额外请求数
+        """
+        call = call if call is not None else current_call()
+        self.stats["requests"] += 1
+        order = self._candidates()
+        pending: Dict[asyncio.Task, Tuple[Endpoint, str]] = {}
+        errors: List[str] = []
+        next_index = 0
+        hedged = False
+
+        started = 0.0
+        waiting_on: Optional[Endpoint] = None  # 对冲等待时间按这个端点（最近一次主请求 / 转移请求）计算
+
+        def launch(kind: str):
+            nonlocal next_index, started, waiting_on
+            endpoint = order[next_index]
+            next_index += 1
+            pending[asyncio.ensure_future(self._call(endpoint, messages, params))] = (endpoint, kind)
+            if kind != "hedge":
+                # 转移请求重新计时，不会一发出就被对冲
+                started = time.monotonic()
+                waiting_on = endpoint
+
+        launch("primary")
+        try:
+            while pending:
+                timeout = None
+                if not hedged and next_index < len(order):
+                    timeout = max(0.0, waiting_on.hedge_delay() - (time.monotonic() - started))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # 主端点超过 p95 仍未返回：向下一个端点发送对冲请求
+                    hedged = True
+                    self.stats["hedges"] += 1
+                    launch("hedge")
+                    continue
+                for task in done:
+                    endpoint, kind = pending.pop(task)
+                    try:
+                        response = task.result()
+                    except BadRequestError:
+                        raise
+                    except Exception as e:
+                        errors.append(f"{endpoint.name}: {e}")
+                        if not pending and next_index < len(order):
+                            self.stats["failovers"] += 1
+                            launch("failover")
+                        continue
+                    if kind == "hedge":
+                        self.stats["hedge_wins"] += 1
+                    if call is not None:
+                        call.update(endpoint=endpoint.name, model=endpoint.model, retries=next_index - 1, hedged=hedged)
+                    return response
+            raise RuntimeError(f"所有端点均请求失败：{'；'.join(errors)}")
+        finally:
+            for task in pending:
+                task.cancel()
+            # 等取消完成（连接关闭、统计更新）再返回，避免留下未回收的任务
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def create(self, messages: List[Dict], params: Dict):
+        """同步版本：在池自己的后台事件循环中运行（连接在多次调用间复用）"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        # 后台线程中拿不到调用方的 contextvars，显式传入正在记录的调用统计
+        return asyncio.run_coroutine_threadsafe(self.acreate(messages, params, current_call()), self._loop).result()
+
+    def print_metrics(self):
+        s = self.stats
+        print(
+            f"🌐 端点池：请求 {s['requests']}，对冲 {s['hedges']} 次（对冲获胜 {s['hedge_wins']} 次），失败转移 {s['failovers']} 次"
+        )
+        for e in self.endpoints:
+            p50 = percentile(e.latencies, 0.5)
+            p95 = percentile(e.latencies, 0.95)
+            latency = f"p50 {p50:.1f}s / p95 {p95:.1f}s" if p50 is not None else "暂无耗时样本"
+            state = "🔴 熔断中" if e.breaker.is_open else "🟢"
+            print(
+                f"   {state} {e.name:<12} 请求 {e.stats['requests']}，失败 {e.stats['errors']}，取消 {e.stats['cancelled']}，{latency}"
+            )
+
+
+def load_endpoints(path: Optional[str] = None) -> List[Endpoint]:
+    path = path or ENDPOINTS_FILE
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    endpoints = []
+    for i, entry in enumerate(entries):
+        api_key = os.getenv(entry["api_key_env"], "") if entry.get("api_key_env") else entry.get("api_key", API_KEY)
+        endpoints.append(
+            Endpoint(
+                entry.get("name", f"endpoint-{i + 1}"),
+                entry["base_url"],
+                entry["model"],
+                api_key,
+                float(entry.get("hedge_after", HEDGE_AFTER)),
+                float(entry.get("timeout", REQUEST_TIMEOUT)),
+            )
+        )
+    return endpoints
+
+
+_pool: Optional[EndpointPool] = None
+_pool_loaded = False
+
+
+def active_pool() -> Optional[EndpointPool]:
+    """配置了至少两个端点时返回进程内共用的端点池，否则返回 None（使用单个端点）"""
+    global _pool, _pool_loaded
+    if not _pool_loaded:
+        endpoints = load_endpoints()
+        _pool = EndpointPool(endpoints) if len(endpoints) >= 2 else None
+        _pool_loaded = True
+    return _pool
+
+
+def set_pool(pool: Optional[EndpointPool]):
+    """指定进程内使用的端点池（测试或代码中直接配置时使用）"""
+    global _pool, _pool_loaded
+    _pool, _pool_loaded = pool, True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多端点 LLM 池")
+    parser.add_argument("command", choices=["show", "probe"])
+    args = parser.parse_args()
+
+    endpoints = load_endpoints()
+    if not endpoints:
+        print(f"⚠️  没有端点配置文件 {ENDPOINTS_FILE}，使用单个端点（OPENAI_BASE_URL）")
+        return
+
+    if args.command == "show":
+        for e in endpoints:
+            print(f"{e.name:<12} {e.base_url:<40} {e.model:<20} 对冲等待 {e.hedge_after:g}s，{'有' if e.api_key else '无'} API Key")
+    elif args.command == "probe":
+
+        async def probe(endpoint: Endpoint):
+            client = AsyncOpenAI(base_url=endpoint.base_url, api_key=endpoint.api_key, timeout=30)
+            started = time.monotonic()
+            try:
+                await client.chat.completions.create(
+                    model=endpoint.model, messages=[{"role": "user", "content": "ping"}], max_tokens=1
+                )
+                return f"✅ {endpoint.name:<12} {time.monotonic() - started:.2f}s"
+            except Exception as e:
+                return f"❌ {endpoint.name:<12} {e}"
+            finally:
+                await client.close()
+
+        async def probe_all():
+            return await asyncio.gather(*(probe(e) for e in endpoints))
+
+        for line in asyncio.run(probe_all()):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
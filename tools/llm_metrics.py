@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - LLM 调用统计（JSONL）
+
+每次调用模型（novel_generator 的标题 / 正文 / 结构化 / 修补请求，vocab_enricher 的单词请求）记录一行：
+  ts, kind, model, endpoint, prompt_tokens, completion_tokens, wall_time, queued（并发生成时在限流器排队的秒数）,
+  ttft（流式首 token 耗时）, retries, outcome（ok / error / cancelled / cache_hit）, chapter, book
+记录追加到 tools/llm_metrics.jsonl（LLM_METRICS_FILE），设置 LLM_METRICS=0 关闭。
+
+report 命令汇总：
+- 按请求类型 / 端点的 p50 / p95 耗时和 token 数，各类请求占总耗时的比例（时间花在哪里）
+- 每章 token 数、耗时（同一章的标题、正文、修补请求合计）
+- 每本书的章节数、token 数和费用（书名取故事配置的 book 字段，没有时用 genre）
+- 多候选生成（novel_generator 的 NOVEL_CANDIDATES）：每章一条 kind=candidates 的记录（k、按到达顺序检查的候选是否通过、
+  是否有候选通过），汇总接受率、单个候选的通过率，以及按该通过率估计的不同 k 下至少一个候选通过的概率，用来调整 k
+
+费用按 MODEL_PRICES（美元 / 百万 token）在生成报告时计算，价格变动后改这里即可；
+未列出的模型使用 LLM_PRICE_INPUT / LLM_PRICE_OUTPUT。批处理接口的调用（见 llm_batch.py，
+endpoint 记为 batch）按 LLM_BATCH_DISCOUNT 折算费用，没有耗时，不计入耗时分位数。
+
+用法：
+  cd tools
+  python3 llm_metrics.py report
+  python3 llm_metrics.py report --days 7
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+METRICS_FILE = os.getenv("LLM_METRICS_FILE", os.path.join(BASE_DIR, "llm_metrics.jsonl"))
+METRICS_ENABLED = os.getenv("LLM_METRICS", "1") != "0"
+
+# 价格（美元 / 百万 token：输入, 输出），按实际账单修改
+MODEL_PRICES = {
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "deepseek-chat": (0.27, 1.1),
+}
+DEFAULT_PRICE = (float(os.getenv("LLM_PRICE_INPUT", "2.5")), float(os.getenv("LLM_PRICE_OUTPUT", "10")))
+BATCH_DISCOUNT = float(os.getenv("LLM_BATCH_DISCOUNT", "0.5"))  # 批处理接口价格为实时接口的比例
+
+_tags: ContextVar[Dict] = ContextVar("llm_metrics_tags", default={})
+_current_call: ContextVar[Optional[Dict]] = ContextVar("llm_metrics_call", default=None)
+_write_lock = threading.Lock()
+
+
+def percentile(samples, q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@contextmanager
+def metrics_tags(**tags):
+    """为这段代码内的所有调用记录附加标签（如 chapter / book），asyncio 任务之间互不影响"""
+    token = _tags.set({**_tags.get(), **{k: v for k, v in tags.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def current_call() -> Optional[Dict]:
+    """正在记录的调用（端点池用它填写实际使用的端点和重试次数）"""
+    return _current_call.get()
+
+
+@contextmanager
+def track_call(kind: str, model: str, endpoint: str) -> Iterator[Dict]:
+    """
+    记录一次调用：调用方在返回的字典中填写 prompt_tokens / completion_tokens / ttft / retries / outcome，
+    退出时补上耗时并写入统计文件；抛出异常时记为 error（被取消时记为 cancelled）
+    """
+    call = {
+        "kind": kind,
+        "model": model,
+        "endpoint": endpoint,
+        "prompt_tokens": None,
+        "completion_tokens": None,
+        "ttft": None,
+        "retries": 0,
+        "outcome": "ok",
+        **_tags.get(),
+    }
+    token = _current_call.set(call)
+    started = time.monotonic()
+    try:
+        yield call
+    except BaseException as e:
+        call["outcome"] = "cancelled" if type(e).__name__ == "CancelledError" else "error"
+        call["error"] = str(e)[:200]
+        raise
+    finally:
+        _current_call.reset(token)
+        call["wall_time"] = round(time.monotonic() - started, 3)
+        record(call)
+
+
+def record(call: Dict):
+    if not METRICS_ENABLED:
+        return
+    line = json.dumps({"ts": datetime.now().isoformat(timespec="seconds"), **call}, ensure_ascii=False)
+    with _write_lock:
+        with open(METRICS_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def record_batch_call(kind: str, model: str, usage: Optional[Dict], error: Optional[str] = None):
+    """记录一次批处理接口的调用（导入结果时调用，usage 为结果文件中的字典）"""
+    call = {
+        "kind": kind,
+        "model": model,
+        "endpoint": "batch",
+        "prompt_tokens": (usage or {}).get("prompt_tokens"),
+        "completion_tokens": (usage or {}).get("completion_tokens"),
+        "wall_time": None,
+        "outcome": "error" if error else "ok",
+        **_tags.get(),
+    }
+    if error:
+        call["error"] = error[:200]
+    record(call)
+
+
+CANDIDATES_KIND = "candidates"
+
+
+def record_candidates(k: int, scores: List[Dict], accepted: bool, wall_time: float):
+    """记录一次多候选选择：scores 为按到达顺序检查过的候选（未到达就被取消的候选不在其中）"""
+    record({
+        "kind": CANDIDATES_KIND,
+        "k": k,
+        "accepted": accepted,
+        "passed": [bool(score.get("passed")) for score in scores],
+        "coverage": [score.get("coverage") for score in scores],
+        "wall_time": round(wall_time, 3),
+        **_tags.get(),
+    })
+
+
+def fill_usage(call: Dict, usage):
+    """从响应的 usage 填写 token 数"""
+    if usage is not None:
+        call["prompt_tokens"] = usage.prompt_tokens
+        call["completion_tokens"] = usage.completion_tokens
+
+
+def load_records(path: str = METRICS_FILE, days: Optional[float] = None) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    since = (datetime.now() - timedelta(days=days)).isoformat(timespec="seconds") if days else None
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 进程被杀时可能留下半行
+            if since is None or rec.get("ts", "") >= since:
+                records.append(rec)
+    return records
+
+
+def call_cost(rec: Dict) -> float:
+    price_in, price_out = MODEL_PRICES.get(rec.get("model"), DEFAULT_PRICE)
+    cost = ((rec.get("prompt_tokens") or 0) * price_in + (rec.get("completion_tokens") or 0) * price_out) / 1e6
+    return cost * BATCH_DISCOUNT if rec.get("endpoint") == "batch" else cost
+
+
+def api_time(rec: Dict) -> float:
+    """接口耗时：总耗时减去在限流器中排队的时间"""
+    return max(0.0, (rec.get("wall_time") or 0) - (rec.get("queued") or 0))
+
+
+def _tokens(rec: Dict) -> int:
+    return (rec.get("prompt_tokens") or 0) + (rec.get("completion_tokens") or 0)
+
+
+def _timed(recs: List[Dict]) -> List[float]:
+    """有耗时的调用（批处理接口的调用没有耗时）的接口耗时"""
+    return [api_time(r) for r in recs if r.get("wall_time") is not None]
+
+
+def _latency(values: List[float]) -> str:
+    if not values:
+        return "-"
+    return f"{percentile(values, 0.5):.1f}s / {percentile(values, 0.95):.1f}s"
+
+
+def print_report(records: List[Dict]):
+    races = [r for r in records if r.get("kind") == CANDIDATES_KIND]
+    records = [r for r in records if r.get("kind") != CANDIDATES_KIND]
+    calls = [r for r in records if r.get("outcome") != "cache_hit"]
+    ok = [r for r in calls if r.get("outcome") == "ok"]
+    errors = sum(1 for r in calls if r.get("outcome") == "error")
+    cache_hits = len(records) - len(calls)
+    total_time = sum(api_time(r) for r in ok)
+    queued = sum(r.get("queued") or 0 for r in ok)
+    total_cost = sum(call_cost(r) for r in ok)
+    print(f"📊 调用 {len(calls)} 次（失败 {errors}，命中缓存 {cache_hits}），接口耗时合计 {total_time:.0f}s，费用约 ${total_cost:.2f}")
+    if queued:
+        print(f"   限流排队合计 {queued:.0f}s（不计入下面的耗时）")
+
+    def grouped(key: str) -> Dict[str, List[Dict]]:
+        groups: Dict[str, List[Dict]] = defaultdict(list)
+        for r in calls:
+            groups[r.get(key) or "-"].append(r)
+        return groups
+
+    print("\n按请求类型（耗时 p50 / p95，占总耗时比例）：")
+    for kind, recs in sorted(grouped("kind").items()):
+        done = [r for r in recs if r.get("outcome") == "ok"]
+        spent = sum(api_time(r) for r in done)
+        ttft = [r["ttft"] for r in done if r.get("ttft") is not None]
+        share = spent / total_time * 100 if total_time else 0
+        avg_out = sum(r.get("completion_tokens") or 0 for r in done) / len(done) if done else 0
+        line = f"  {kind:<12} {len(recs):>5} 次  {_latency(_timed(done)):<16} {share:5.1f}%  平均输出 {avg_out:.0f} token"
+        if ttft:
+            line += f"  首 token p50 {percentile(ttft, 0.5):.1f}s"
+        print(line)
+
+    print("\n按端点：")
+    for endpoint, recs in sorted(grouped("endpoint").items()):
+        done = [r for r in recs if r.get("outcome") == "ok"]
+        failed = sum(1 for r in recs if r.get("outcome") == "error")
+        retries = sum(r.get("retries") or 0 for r in recs)
+        print(f"  {endpoint:<32} {len(recs):>5} 次  {_latency(_timed(done)):<16} 失败 {failed}  重试 {retries}")
+
+    chapters: Dict[str, List[Dict]] = defaultdict(list)
+    for r in ok:
+        if r.get("chapter"):
+            chapters[r["chapter"]].append(r)
+    if chapters:
+        tokens = [sum(_tokens(r) for r in recs) for recs in chapters.values()]
+        times = [sum(api_time(r) for r in recs) for recs in chapters.values()]
+        costs = [sum(call_cost(r) for r in recs) for recs in chapters.values()]
+        print(f"\n每章（{len(chapters)} 章）：")
+        print(f"  token p50 {percentile(tokens, 0.5):.0f} / p95 {percentile(tokens, 0.95):.0f}")
+        print(f"  请求耗时合计 p50 {percentile(times, 0.5):.1f}s / p95 {percentile(times, 0.95):.1f}s")
+        print(f"  费用平均 ${sum(costs) / len(costs):.4f}")
+
+    books: Dict[str, List[Dict]] = defaultdict(list)
+    for r in ok:
+        if r.get("book"):
+            books[r["book"]].append(r)
+    if books:
+        print("\n每本书：")
+        for book, recs in sorted(books.items()):
+            count = len({r["chapter"] for r in recs if r.get("chapter")})
+            print(f"  {book:<16} {count:>4} 章  {sum(_tokens(r) for r in recs):>9} token  ${sum(call_cost(r) for r in recs):.2f}")
+
+    if races:
+        print_candidates_report(races, calls)
+
+
+def print_candidates_report(races: List[Dict], calls: List[Dict]):
+    """多候选生成：接受率、单个候选通过率和按通过率估计的最佳 k"""
+    print(f"\n多候选生成（{len(races)} 章）：")
+    by_k: Dict[int, List[Dict]] = defaultdict(list)
+    for r in races:
+        by_k[r.get("k") or 0].append(r)
+    for k, recs in sorted(by_k.items()):
+        accepted = sum(1 for r in recs if r.get("accepted"))
+        checked = sum(len(r.get("passed") or []) for r in recs)
+        times = [r["wall_time"] for r in recs if r.get("wall_time") is not None]
+        print(f"  k={k:<3} {len(recs):>5} 章  接受率 {accepted / len(recs):5.0%}  平均检查 {checked / len(recs):.1f} 个候选  耗时 {_latency(times)}")
+    checked = [p for r in races for p in (r.get("passed") or [])]
+    if checked:
+        rate = sum(checked) / len(checked)
+        estimates = "，".join(f"k={k} {1 - (1 - rate) ** k:.0%}" for k in range(1, 7))
+        print(f"  单个候选通过率 {rate:.0%}（{len(checked)} 个）；至少一个通过的估计概率：{estimates}")
+    cancelled = sum(1 for r in calls if r.get("outcome") == "cancelled")
+    if cancelled:
+        print(f"  被取消的请求 {cancelled} 个（已生成部分的 token 未计入费用）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM 调用统计")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("--file", type=str, default=METRICS_FILE, help="统计文件（默认 tools/llm_metrics.jsonl）")
+    parser.add_argument("--days", type=float, default=None, help="只统计最近 N 天")
+    args = parser.parse_args()
+
+    records = load_records(args.file, args.days)
+    if not records:
+        print(f"⚠️  {args.file} 中没有调用记录")
+        return
+    print_report(records)
+
+
+if __name__ == "__main__":
+    main()
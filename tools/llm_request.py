@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 发送一次 LLM 请求（响应缓存 + 端点池 + 调用统计）
+
+novel_generator 和 vocab_enricher 共用：
+- 启用响应缓存（--cache / LLM_CACHE=1，见 llm_cache.py）时相同请求直接重放；validate 决定哪些响应可以缓存
+- 配置了多个端点（llm_endpoints.json）时经端点池发送（对冲 / 失败转移），缓存键按整个池的配置计算
+- 每次调用记录一条统计（见 llm_metrics.py）；经端点池发送时 model / endpoint 为实际返回响应的端点
+
+流式请求由调用方提供 stream_text（novel_generator 的覆盖率提前中断），不经过端点池。
+"""
+
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from llm_cache import active_cache, cache_key
+from llm_client import MODEL, RateLimiter, estimate_tokens
+from llm_endpoints import active_pool
+from llm_metrics import fill_usage, track_call
+
+
+def call_scope(client, stream: bool = False) -> Tuple[str, str]:
+    """
+    请求的 (model, base_url)：经端点池发送的请求可能由池中任一端点返回，按整个池的配置计算；
+    流式请求不经过端点池，按当前客户端计算
+    """
+    pool = None if stream else active_pool()
+    return pool.cache_scope() if pool else (MODEL, str(client.base_url))
+
+
+def response_cache_key(client, messages: List[Dict], params: Dict, stream: bool = False) -> str:
+    """响应缓存键（model / base_url 见 call_scope）"""
+    model, base_url = call_scope(client, stream)
+    return cache_key(model, base_url, messages, params)
+
+
+def cache_if_valid(cache, key: str, text: str, validate: Optional[Callable[[str], object]]):
+    """只缓存通过校验的响应（validate 返回 False 或抛出 ValueError 时不缓存），重跑时不会重放不合格的输出"""
+    if validate is not None:
+        try:
+            if validate(text) is False:
+                return
+        except ValueError:
+            return
+    cache.put(key, text)
+
+
+def cached_text(client, messages: List[Dict], params: Dict, kind: str, stream: bool = False) -> Tuple[Optional[str], Optional[str]]:
+    """
+    查询响应缓存，返回 (缓存键, 缓存的文本)；未启用缓存时都为 None，命中时记录一条 cache_hit 统计
+    """
+    cache = active_cache()
+    if not cache:
+        return None, None
+    key = response_cache_key(client, messages, params, stream)
+    cached = cache.get(key)
+    if cached is not None:
+        print("💾 命中响应缓存")
+        with track_call(kind, *call_scope(client, stream)) as call:
+            call["outcome"] = "cache_hit"
+    return key, cached
+
+
+def create_response(client, messages: List[Dict], params: Dict, call: Dict):
+    """发送一次同步请求并填写 token 数（配置了多个端点时经端点池发送，端点池填写实际端点）"""
+    pool = active_pool()
+    if pool:
+        response = pool.create(messages, params)
+    else:
+        response = client.chat.completions.create(model=MODEL, messages=messages, **params)
+    fill_usage(call, response.usage)
+    return response
+
+
+async def create_response_async(client, limiter: RateLimiter, messages: List[Dict], params: Dict, call: Dict):
+    """在限流器内发送一次异步请求，按实际用量退还多预扣的 token（配置了多个端点时经端点池对冲发送）"""
+    pool = active_pool()
+    async with limiter.limit(estimate_tokens(messages, params["max_tokens"])) as ticket:
+        call["queued"] = ticket["queued"]
+        if pool:
+            response = await pool.acreate(messages, params)
+        else:
+            response = await client.chat.completions.create(model=MODEL, messages=messages, **params)
+        if response.usage is not None:
+            ticket["actual"] = response.usage.total_tokens
+    fill_usage(call, response.usage)
+    return response
+
+
+def request_text(
+    client,
+    messages: List[Dict],
+    params: Dict,
+    kind: str,
+    validate: Optional[Callable[[str], object]] = None,
+    stream_text: Optional[Callable[[Dict], str]] = None,
+) -> str:
+    """
+    发送一次请求，返回模型输出的文本（命中缓存时直接返回）
+
+    stream_text(call)：流式接收的实现（可选），返回完整文本并自行填写 token 数
+    """
+    stream = stream_text is not None
+    key, cached = cached_text(client, messages, params, kind, stream)
+    if cached is not None:
+        return cached
+
+    with track_call(kind, *call_scope(client, stream)) as call:
+        if stream:
+            text = stream_text(call)
+        else:
+            text = create_response(client, messages, params, call).choices[0].message.content or ""
+
+    if key is not None:
+        cache_if_valid(active_cache(), key, text, validate)
+    return text
+
+
+async def request_text_async(
+    client,
+    limiter: RateLimiter,
+    messages: List[Dict],
+    params: Dict,
+    kind: str,
+    validate: Optional[Callable[[str], object]] = None,
+    stream_text: Optional[Callable[[Dict], Awaitable[str]]] = None,
+) -> str:
+    """request_text 的异步版本（每次请求都经过限流器，命中缓存时不占用限流额度）"""
+    stream = stream_text is not None
+    key, cached = cached_text(client, messages, params, kind, stream)
+    if cached is not None:
+        return cached
+
+    with track_call(kind, *call_scope(client, stream)) as call:
+        if stream:
+            text = await stream_text(call)
+        else:
+            response = await create_response_async(client, limiter, messages, params, call)
+            text = response.choices[0].message.content or ""
+
+    if key is not None:
+        cache_if_valid(active_cache(), key, text, validate)
+    return text
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 本地 OpenAI 兼容桩服务（离线测试 / 吞吐量测量用）
+
+实现 POST /v1/chat/completions：
+- 章节请求：从提示词的“核心词汇 / 复习词汇”列表中取出单词，生成一篇用 {word|meaning} 标记这些单词的占位章节
+- 标题请求（提示词含“只输出标题”）：返回一个短标题
+- response_format 为 json_object 时返回 {"title", "content", "used_words"}（结构化输出）
+- stream=true 时以 SSE 分块返回（stream_options.include_usage 时最后附带 usage）；客户端中途断开时停止生成
+- 响应时间 = --latency 秒 + 输出 token 数 / --tokens-per-second，模拟真实接口的生成耗时
+- 缺词修补请求（提示词含“## 段落 N”）：在每个段落末尾补上指定单词
+- 单词详情请求（vocab_enricher.py，提示词含“单词：xxx”）：返回字段齐全的占位详情
+- --miss-rate 按比例随机漏掉核心词汇，用于测试覆盖率检查和缺词修补
+- --error-rate 按比例随机返回 500 错误，用于测试失败转移和熔断
+- usage 按 1 字符 ≈ 1 token 统计；server.stats 记录请求数、错误数、被取消的请求 / 流和输出 token 数
+
+用法：
+  cd tools
+  python3 llm_stub_server.py --port 8765 --latency 0.5 --tokens-per-second 400
+  OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python3 concurrent_generator.py --chapters 20
+
+离线为批处理请求文件生成结果文件（见 llm_batch.py），用来测试 --ingest 导入流程：
+  python3 llm_stub_server.py --batch-in requests.jsonl --batch-out results.jsonl --miss-rate 0.1 --error-rate 0.1
+
+代码中：
+  server, base_url = start_stub_server(latency=0.2)    # 后台线程运行，端口自动分配
+  ...
+  server.shutdown()
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+from llm_batch import read_batch_requests, write_batch_file
+
+VOCAB_SECTION_PATTERN = re.compile(r"^## (核心词汇|复习词汇)")
+REPAIR_SECTION_PATTERN = re.compile(r"^## 段落 (\d+)\n需要融入：([^\n]*)\n原文：\n(.*?)(?=\n\n## 段落 |\n\n只输出)", re.M | re.S)
+ENRICH_WORD_PATTERN = re.compile(r"^单词：(.+)$", re.M)
+FILLER = "夜色深沉，城市的灯火在雨幕中摇曳。她握紧手中的文件，心里清楚，这一次绝不能再输。"
+
+
+def extract_vocab(prompt: str) -> List[str]:
+    """从用户提示词的词汇列表（“- word” 行）中取出单词"""
+    words: List[str] = []
+    in_section = False
+    for line in prompt.splitlines():
+        if line.startswith("## "):
+            in_section = bool(VOCAB_SECTION_PATTERN.match(line))
+            continue
+        if in_section and line.startswith("- "):
+            words.append(line[2:].strip())
+    return words
+
+
+def fake_chapter(words: List[str], miss_rate: float = 0.0) -> str:
+    """每段嵌入两个单词的占位章节（按 miss_rate 随机漏掉单词）"""
+    words = [w for w in words if random.random() >= miss_rate]
+    paragraphs = []
+    for i in range(0, len(words), 2):
+        marked = "，".join(f"{{{w}|释义}}" for w in words[i : i + 2])
+        paragraphs.append(f"{FILLER}她想起了{marked}，嘴角微微上扬。")
+    return "\n\n".join(paragraphs or [FILLER])
+
+
+def fake_repair(prompt: str) -> str:
+    """缺词修补请求：在每个段落末尾补一句带指定单词的话，返回 {"paragraphs": [...]}"""
+    paragraphs = []
+    for number, words, text in REPAIR_SECTION_PATTERN.findall(prompt):
+        marked = "，".join(f"{{{w.strip()}|释义}}" for w in words.split(","))
+        paragraphs.append({"index": int(number), "text": f"{text}她忽然想到了{marked}。"})
+    return json.dumps({"paragraphs": paragraphs}, ensure_ascii=False)
+
+
+def fake_enrich(word: str) -> str:
+    """单词详情请求：返回字段齐全的占位详情"""
+    return json.dumps(
+        {
+            "word": word,
+            "meaning": "释义",
+            "phonetic": f"/{word}/",
+            "root": f"{word} -> 占位助记",
+            "example": f"This is an example of {word}.",
+            "exampleCn": "这是一个例句。",
+        },
+        ensure_ascii=False,
+    )
+
+
+def fake_completion(request: Dict, miss_rate: float = 0.0) -> Tuple[str, str]:
+    """按请求类型生成占位输出，返回 (content, finish_reason)"""
+    messages = request.get("messages", [])
+    prompt = messages[-1].get("content", "") if messages else ""
+    enrich_word = ENRICH_WORD_PATTERN.search(prompt)
+    if "只输出标题" in prompt:
+        content = "逆袭之夜"
+    elif "## 段落 " in prompt:
+        content = fake_repair(prompt)
+    elif enrich_word:
+        content = fake_enrich(enrich_word.group(1).strip())
+    elif (request.get("response_format") or {}).get("type") == "json_object":
+        words = extract_vocab(prompt)
+        content = json.dumps(
+            {"title": "逆袭之夜", "content": fake_chapter(words, miss_rate), "used_words": words}, ensure_ascii=False
+        )
+    else:
+        content = fake_chapter(extract_vocab(prompt), miss_rate)
+    max_tokens = request.get("max_tokens")
+    finish_reason = "stop"
+    if max_tokens and len(content) > max_tokens:
+        content, finish_reason = content[:max_tokens], "length"
+    return content, finish_reason
+
+
+def completion_body(request: Dict, content: str, finish_reason: str) -> Dict:
+    """非流式响应体（usage 按 1 字符 ≈ 1 token）"""
+    prompt_tokens = sum(len(m.get("content") or "") for m in request.get("messages", []))
+    completion_tokens = len(content)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "stub"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": finish_reason,
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def answer_batch_file(requests_file: str, results_file: str, miss_rate: float = 0.0, error_rate: float = 0.0) -> int:
+    """离线为批处理请求文件生成 OpenAI Batch API 格式的结果文件（按 error_rate 随机写入 500 错误），返回行数"""
+    results = []
+    for item in read_batch_requests(requests_file):
+        body = item.get("body") or {}
+        if random.random() < error_rate:
+            response = {"status_code": 500, "body": {"error": {"message": "stub injected error", "type": "server_error"}}}
+        else:
+            response = {"status_code": 200, "body": completion_body(body, *fake_completion(body, miss_rate))}
+        results.append({
+            "id": f"batch_req_{uuid.uuid4().hex}",
+            "custom_id": item.get("custom_id"),
+            "response": {"request_id": uuid.uuid4().hex, **response},
+            "error": None,
+        })
+    random.shuffle(results)  # 批处理接口不保证结果顺序
+    return write_batch_file(results_file, results)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 由 start_stub_server 设置
+    options: Dict = {}
+    stats: Dict = {}
+
+    def log_message(self, format, *args):
+        pass  # 不打印访问日志
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            self.stats["aborted_requests"] = self.stats.get("aborted_requests", 0) + 1  # 客户端已取消（如对冲落败）
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+
+        self.stats["requests"] = self.stats.get("requests", 0) + 1
+        if random.random() < self.options.get("error_rate", 0.0):
+            self.stats["errors"] = self.stats.get("errors", 0) + 1
+            time.sleep(self.options.get("latency", 0.0))
+            self._send_json(500, {"error": {"message": "stub injected error", "type": "server_error"}})
+            return
+
+        content, finish_reason = fake_completion(request, self.options.get("miss_rate", 0.0))
+        if request.get("stream"):
+            self._stream(request, content, finish_reason)
+            return
+
+        body = completion_body(request, content, finish_reason)
+        completion_tokens = body["usage"]["completion_tokens"]
+        time.sleep(self.options.get("latency", 0.0) + completion_tokens / self.options.get("tokens_per_second", 1e9))
+        self.stats["completion_tokens"] = self.stats.get("completion_tokens", 0) + completion_tokens
+        self._send_json(200, body)
+
+    def _stream(self, request: Dict, content: str, finish_reason: str, piece: int = 20):
+        """SSE 分块输出，每块 piece 个字符；客户端断开时停止"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        def event(delta: Dict, finish=None) -> bytes:
+            chunk = {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        tps = self.options.get("tokens_per_second", 1e9)
+        sent = 0
+        try:
+            time.sleep(self.options.get("latency", 0.0))
+            self.wfile.write(event({"role": "assistant", "content": ""}))
+            for i in range(0, len(content), piece):
+                time.sleep(piece / tps)
+                self.wfile.write(event({"content": content[i : i + piece]}))
+                self.wfile.flush()
+                sent += len(content[i : i + piece])
+            self.wfile.write(event({}, finish_reason))
+            if (request.get("stream_options") or {}).get("include_usage"):
+                prompt_tokens = sum(len(m.get("content") or "") for m in request.get("messages", []))
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": sent, "total_tokens": prompt_tokens + sent}
+                chunk = {
+                    "id": chunk_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [],
+                    "usage": usage,
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self.stats["aborted_streams"] = self.stats.get("aborted_streams", 0) + 1
+        finally:
+            self.stats["completion_tokens"] = self.stats.get("completion_tokens", 0) + sent
+
+
+def start_stub_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency: float = 0.0,
+    tokens_per_second: float = 1e9,
+    miss_rate: float = 0.0,
+    error_rate: float = 0.0,
+) -> Tuple[ThreadingHTTPServer, str]:
+    """在后台线程启动桩服务，返回 (server, base_url)；port=0 时自动分配端口"""
+    options = {"latency": latency, "tokens_per_second": tokens_per_second, "miss_rate": miss_rate, "error_rate": error_rate}
+    stats: Dict = {}
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"options": options, "stats": stats})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容桩服务")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="每个请求的固定延迟（秒，默认 0.5）")
+    parser.add_argument("--tokens-per-second", type=float, default=400, help="模拟的输出速度（默认 400 token/s）")
+    parser.add_argument("--miss-rate", type=float, default=0.0, help="随机漏掉核心词汇的比例（默认 0）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回 500 错误的比例（默认 0）")
+    parser.add_argument("--batch-in", type=str, default=None, help="不启动服务，离线为该批处理请求文件生成结果")
+    parser.add_argument("--batch-out", type=str, default=None, help="--batch-in 的结果文件（默认 <请求文件>.results.jsonl）")
+    args = parser.parse_args()
+
+    if args.batch_in:
+        results_file = args.batch_out or f"{os.path.splitext(args.batch_in)[0]}.results.jsonl"
+        count = answer_batch_file(args.batch_in, results_file, args.miss_rate, args.error_rate)
+        print(f"🧪 已生成 {count} 行批处理结果：{results_file}")
+        return
+
+    server, base_url = start_stub_server(
+        args.host, args.port, args.latency, args.tokens_per_second, args.miss_rate, args.error_rate
+    )
+    print(f"🧪 桩服务已启动：{base_url}（延迟 {args.latency}s + {args.tokens_per_second:g} token/s），Ctrl+C 退出")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
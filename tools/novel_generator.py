@@ -4,23 +4,32 @@ IELTS Novel Flow - 小说生成器
 使用 OpenAI/DeepSeek API 生成包含雅思词汇的爽文章节
 """
 
+import argparse
+import asyncio
+import contextvars
 import json
+import math
 import os
+import re
 import sys
-from typing import List, Dict, Optional
+import threading
+import time
+import uuid
+from typing import Callable, List, Dict, Optional, Tuple
 from datetime import datetime
-import openai
-from openai import OpenAI
-
-# 尝试加载 .env 文件（如果存在）
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    pass  # dotenv 是可选的
 
 # 导入课程管理器
-from curriculum_manager import CurriculumManager
+from curriculum_manager import CurriculumManager, get_progress_file_for_category
+from check_library_vocab_coverage import WORD_MARK_PATTERN
+# API 配置与共用客户端（同时加载 .env）
+from llm_client import API_KEY, BASE_URL, MODEL, RateLimiter, create_async_client, estimate_tokens, get_client
+from llm_cache import active_cache, enable_cache
+from llm_batch import batch_request, read_batch_results, write_batch_file
+from llm_endpoints import active_pool
+from llm_metrics import metrics_tags, record_batch_call, record_candidates, track_call
+import llm_request
+from llm_request import cached_text, call_scope, create_response_async
+from openai import BadRequestError
 
 # ==================== 路径配置 ====================
 # 获取脚本所在目录的绝对路径
@@ -35,10 +44,42 @@ STORY_CONFIG_FILE = os.path.join(BASE_DIR, "story_config.json")
 PROGRESS_FILE = os.path.join(BASE_DIR, "progress_tracker.json")
 
 # ==================== API 配置 ====================
-# API 配置（使用占位符，实际使用时请替换）
-API_KEY = os.getenv("OPENAI_API_KEY", "your-api-key-here")
-BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")  # DeepSeek: "https://api.deepseek.com/v1"
-MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")  # DeepSeek: "deepseek-chat"
+# API_KEY / BASE_URL / MODEL 见 llm_client.py（环境变量 OPENAI_API_KEY / OPENAI_BASE_URL / OPENAI_MODEL）
+
+# 请求参数
+TITLE_SYSTEM_PROMPT = "你是一个擅长起标题的编辑。"
+TITLE_PARAMS = {"temperature": 0.7, "max_tokens": 50}
+CHAPTER_PARAMS = {
+    "temperature": 0.8,  # 稍高的温度保证创意和爽感
+    "max_tokens": 4000,  # 足够生成2500字的内容
+}
+# 结构化输出：一次请求同时返回标题、正文和使用的单词（JSON 模式）
+STRUCTURED_PARAMS = {**CHAPTER_PARAMS, "response_format": {"type": "json_object"}}
+
+# 不指定标题时默认使用结构化输出（一次请求）；设为 0 则先请求标题、再请求正文
+STRUCTURED_OUTPUT = os.getenv("NOVEL_STRUCTURED_OUTPUT", "1") != "0"
+
+# 流式生成：边接收边统计核心词汇覆盖，输出接近长度预算时缺词仍然太多就提前中断并重新生成
+STREAM_OUTPUT = os.getenv("NOVEL_STREAM", "0") == "1"
+STREAM_LENGTH_BUDGET = 2500  # 章节长度上限（字符），与提示词中的长度要求一致
+STREAM_ABORT_PROGRESS = float(os.getenv("NOVEL_STREAM_ABORT_PROGRESS", "0.8"))  # 输出达到预算的该比例后开始检查
+STREAM_ABORT_MISSING = float(os.getenv("NOVEL_STREAM_ABORT_MISSING", "0.2"))  # 缺失核心词汇超过该比例则中断
+STREAM_RETRIES = int(os.getenv("NOVEL_STREAM_RETRIES", "1"))  # 中断后最多重新生成的次数（最后一次不中断）
+
+# 缺词修补：只把缺少核心词汇的几个段落交给模型改写后拼回原文，代替整章重新生成
+REPAIR_MISSING = os.getenv("NOVEL_REPAIR", "1") != "0"
+REPAIR_WORDS_PER_PARAGRAPH = 2  # 每段最多融入的缺失单词数（与“同一段落最多2-3个新单词”一致）
+REPAIR_SYSTEM_PROMPT = "你是一名网文编辑，擅长在不改变剧情、人物和文风的前提下，把指定的英文单词自然地融入段落。"
+REPAIR_PARAMS = {"temperature": 0.7, "response_format": {"type": "json_object"}}  # max_tokens 按段落长度计算
+
+# 多候选生成：同一提示词并发请求 k 个候选，按到达顺序检查，第一个通过的候选胜出，其余取消
+CANDIDATES = int(os.getenv("NOVEL_CANDIDATES", "1"))  # 1 表示不启用
+CANDIDATE_MIN_COVERAGE = float(os.getenv("NOVEL_CANDIDATE_MIN_COVERAGE", "0.9"))  # 剩余缺词交给缺词修补
+CANDIDATE_MIN_CHARS = int(os.getenv("NOVEL_CANDIDATE_MIN_CHARS", "1200"))  # 正文长度（去掉标记中的释义）
+CANDIDATE_MAX_CHARS = int(os.getenv("NOVEL_CANDIDATE_MAX_CHARS", str(STREAM_LENGTH_BUDGET + 500)))
+
+# 批处理接口（见 llm_batch.py）：批次最长 24 小时完成，租约留出下载和导入的时间
+BATCH_LEASE_SECONDS = float(os.getenv("NOVEL_BATCH_LEASE_SECONDS", str(72 * 3600)))
 
 
 # ==================== System Prompt ====================
@@ -162,11 +203,444 @@ def build_user_prompt(
     return "\n".join(prompt_parts)
 
 
+def build_title_messages(user_prompt: str) -> List[Dict]:
+    """生成章节标题的请求消息"""
+    title_prompt = f"""根据以下信息，生成一个吸引人的章节标题（不超过15字）：
+
+{user_prompt}
+
+只输出标题，不要其他内容。"""
+    return [
+        {"role": "system", "content": TITLE_SYSTEM_PROMPT},
+        {"role": "user", "content": title_prompt}
+    ]
+
+
+def build_chapter_messages(user_prompt: str) -> List[Dict]:
+    """生成章节正文的请求消息"""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+STRUCTURED_OUTPUT_PROMPT = """## 输出格式（代替上面“直接输出章节内容”的要求）
+只输出一个 JSON 对象，不要任何其他文字：
+{
+  "title": "章节标题（吸引人，不超过15字）",
+  "content": "章节正文（所有雅思单词使用 {word|meaning} 格式，段落之间用换行分隔）",
+  "used_words": ["正文中实际使用了的核心词汇"]
+}"""
+
+
+def build_structured_messages(user_prompt: str) -> List[Dict]:
+    """一次返回标题 + 正文 + 使用单词的请求消息"""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"{user_prompt}\n\n{STRUCTURED_OUTPUT_PROMPT}"}
+    ]
+
+
+def parse_structured_chapter(text: str) -> Dict:
+    """
+    解析并校验结构化输出
+
+    Returns:
+        {"title", "content", "used_words"}
+
+    Raises:
+        ValueError: 不是合法 JSON 或字段缺失 / 类型不对
+    """
+    # 只截取 JSON 对象部分（模型偶尔会加代码块标记）
+    first_brace = text.find("{")
+    last_brace = text.rfind("}")
+    if first_brace == -1 or last_brace <= first_brace:
+        raise ValueError("响应中没有 JSON 对象")
+    try:
+        data = json.loads(text[first_brace : last_brace + 1])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON 解析失败：{e}") from e
+    if not isinstance(data, dict):
+        raise ValueError("响应不是 JSON 对象")
+
+    for field in ("title", "content"):
+        if not isinstance(data.get(field), str) or not data[field].strip():
+            raise ValueError(f"字段缺失或无效：{field}")
+    used_words = data.get("used_words", [])
+    if not isinstance(used_words, list) or not all(isinstance(w, str) for w in used_words):
+        raise ValueError("字段无效：used_words 必须是字符串数组")
+
+    return {
+        "title": data["title"].strip(),
+        "content": data["content"].strip(),
+        "used_words": [w.strip() for w in used_words if w.strip()],
+    }
+
+
+def find_missing_words(content: str, target_vocab: List[str]) -> List[str]:
+    """返回没有在内容中出现的核心词汇"""
+    lowered = content.lower()
+    return [word for word in target_vocab if word.lower() not in lowered]
+
+
+class CoverageScanner:
+    """
+    流式输出的增量词汇覆盖统计
+
+    每收到一段文本就扫描其中完整的 {word|meaning} 标记；跨越两段的标记保留到下一段再扫描
+    """
+
+    def __init__(self, target_vocab: List[str], budget: int):
+        self.missing = {w.lower(): w for w in target_vocab}
+        self.total = len(self.missing)
+        self.budget = budget
+        self.length = 0
+        self._tail = ""
+
+    def feed(self, text: str):
+        self.length += len(text)
+        buffer = self._tail + text
+        end = 0
+        for m in WORD_MARK_PATTERN.finditer(buffer):
+            self.missing.pop(m.group(1).strip().lower(), None)
+            end = m.end()
+        # 最后一个未闭合的标记（标记都很短，过长的说明不是标记）
+        start = buffer.rfind("{", end)
+        self._tail = buffer[start:] if start != -1 and len(buffer) - start < 64 else ""
+
+    def should_abort(self) -> bool:
+        """输出已接近预算，而缺失的核心词汇仍超过允许比例"""
+        return (
+            self.length >= self.budget * STREAM_ABORT_PROGRESS
+            and len(self.missing) > self.total * STREAM_ABORT_MISSING
+        )
+
+
+class StreamAborted(Exception):
+    """流式生成因覆盖率不足被提前中断"""
+
+
+def _abort_message(scanner: CoverageScanner) -> str:
+    return f"已输出 {scanner.length} 字，仍缺 {len(scanner.missing)}/{scanner.total} 个核心词汇"
+
+
+def chapter_check(structured: bool) -> Callable[[str], bool]:
+    """
+    章节响应能否缓存：结构化输出能否解析、{word|meaning} 标记是否完整
+
+    覆盖率和长度不在这里把关：未达标的响应经缺词修补后照样使用，交给候选选择（见 score_candidate）
+    """
+    def check(text: str) -> bool:
+        content = parse_structured_chapter(text)["content"] if structured else text
+        return bool(content.strip()) and content.count("{") == len(WORD_MARK_PATTERN.findall(content))
+    return check
+
+
+def title_check(text: str) -> bool:
+    return bool(text.strip())
+
+
+def request_text(
+    client,
+    messages: List[Dict],
+    params: Dict,
+    target_vocab: List[str] = (),
+    stream: bool = False,
+    kind: str = "chapter",
+    validate: Optional[Callable[[str], object]] = None
+) -> str:
+    """
+    发送一次请求，返回模型输出的文本
+
+    stream=True 时流式接收并实时统计核心词汇覆盖，覆盖率明显不够时中断连接、重新生成
+    （最多 STREAM_RETRIES 次，最后一次不中断）。
+    启用响应缓存（--cache / LLM_CACHE=1）时，相同的请求直接返回缓存的文本；
+    提供 validate 时只缓存通过校验的响应（见 llm_request.cache_if_valid）。
+    每次调用记录一条统计（kind 为请求类型，见 llm_metrics.py）
+    """
+    stream_text = (lambda call: _stream_text(client, messages, params, target_vocab, call)) if stream else None
+    return llm_request.request_text(client, messages, params, kind, validate, stream_text)
+
+
+def _fill_stream_usage(call: Dict, messages: List[Dict], usage, text: str, aborted_lengths: List[int]):
+    """
+    流式请求的 token 数：优先用最后一块返回的 usage，没有时按 1 字符 ≈ 1 token 估计；
+    被中断的尝试同样消耗了提示词和已输出的部分，一并计入
+    """
+    prompt = usage.prompt_tokens if usage else sum(len(m.get("content") or "") for m in messages)
+    completion = usage.completion_tokens if usage else len(text)
+    call["prompt_tokens"] = prompt * (1 + len(aborted_lengths))
+    call["completion_tokens"] = completion + sum(aborted_lengths)
+    call["retries"] = len(aborted_lengths)
+    if usage is None:
+        call["estimated"] = True
+
+
+def _stream_text(client, messages: List[Dict], params: Dict, target_vocab: List[str], call: Dict) -> str:
+    """流式请求（覆盖率不足时提前中断并重新生成）"""
+    aborted_lengths: List[int] = []
+    for attempt in range(STREAM_RETRIES + 1):
+        scanner = CoverageScanner(target_vocab, min(params["max_tokens"], STREAM_LENGTH_BUDGET))
+        parts: List[str] = []
+        usage = None
+        started = time.monotonic()
+        response = client.chat.completions.create(
+            model=MODEL, messages=messages, stream=True, stream_options={"include_usage": True}, **params
+        )
+        try:
+            for chunk in response:
+                usage = chunk.usage or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if not parts:
+                    call["ttft"] = round(time.monotonic() - started, 3)
+                parts.append(delta)
+                scanner.feed(delta)
+                if attempt < STREAM_RETRIES and scanner.should_abort():
+                    raise StreamAborted(_abort_message(scanner))
+        except StreamAborted as e:
+            print(f"⏹️  提前中断：{e}，重新生成（第 {attempt + 2} 次）")
+            aborted_lengths.append(scanner.length)
+            continue
+        finally:
+            response.close()  # 中断时关闭连接，服务端随之停止生成
+        text = "".join(parts)
+        _fill_stream_usage(call, messages, usage, text, aborted_lengths)
+        return text
+
+
+PARAGRAPH_SEPARATOR_PATTERN = re.compile(r"(\n+)")
+
+
+def split_paragraphs(content: str) -> List[str]:
+    """按换行拆分段落；奇数下标是原样保留的换行，"".join 后与原文完全一致"""
+    return PARAGRAPH_SEPARATOR_PATTERN.split(content)
+
+
+def plan_repair(parts: List[str], missing_words: List[str]) -> Dict[int, List[str]]:
+    """
+    为缺失的单词挑选要改写的段落
+
+    优先选已有标记最少（其次最长）的段落，每段最多 REPAIR_WORDS_PER_PARAGRAPH 个单词
+
+    Returns:
+        {段落在 parts 中的下标: [要融入的单词]}
+    """
+    candidates = [i for i in range(0, len(parts), 2) if parts[i].strip()]
+    if not candidates:
+        return {}
+    per_paragraph = max(REPAIR_WORDS_PER_PARAGRAPH, math.ceil(len(missing_words) / len(candidates)))
+    needed = math.ceil(len(missing_words) / per_paragraph)
+    ranked = sorted(candidates, key=lambda i: (len(WORD_MARK_PATTERN.findall(parts[i])), -len(parts[i])))
+    chosen = sorted(ranked[:needed])
+    return {i: missing_words[n * per_paragraph : (n + 1) * per_paragraph] for n, i in enumerate(chosen)}
+
+
+def build_repair_messages(parts: List[str], plan: Dict[int, List[str]]) -> List[Dict]:
+    """只包含待改写段落和缺失单词的修补请求"""
+    sections = []
+    for i, words in plan.items():
+        sections.append(f"## 段落 {i // 2 + 1}\n需要融入：{', '.join(words)}\n原文：\n{parts[i].strip()}")
+    prompt = (
+        "以下段落来自一篇小说章节。请分别改写每个段落，把“需要融入”的英文单词自然地写进去，"
+        "使用 {word|meaning} 格式标记（meaning 为不超过8个字的中文释义）。\n"
+        "保持剧情、人物和语气不变，段落长度基本不变，原有的 {word|meaning} 标记必须原样保留。\n\n"
+        + "\n\n".join(sections)
+        + '\n\n只输出一个 JSON 对象，不要任何其他文字：{"paragraphs": [{"index": 段落编号, "text": "改写后的段落"}]}'
+    )
+    return [
+        {"role": "system", "content": REPAIR_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def repair_params(parts: List[str], plan: Dict[int, List[str]]) -> Dict:
+    """修补请求的参数：输出上限按待改写段落的长度估算，远小于整章的 max_tokens"""
+    length = sum(len(parts[i]) for i in plan)
+    words = sum(len(w) for w in plan.values())
+    return {**REPAIR_PARAMS, "max_tokens": min(CHAPTER_PARAMS["max_tokens"], int(length * 1.5) + 50 * words + 100)}
+
+
+def apply_repair(parts: List[str], plan: Dict[int, List[str]], text: str) -> str:
+    """
+    校验改写结果并拼回原文
+
+    丢掉原有标记、变成多段或长度异常的改写不采用（该段保持原文）
+
+    Raises:
+        ValueError: 响应不是合法 JSON 或格式不对
+    """
+    first_brace = text.find("{")
+    last_brace = text.rfind("}")
+    if first_brace == -1 or last_brace <= first_brace:
+        raise ValueError("响应中没有 JSON 对象")
+    try:
+        data = json.loads(text[first_brace : last_brace + 1])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON 解析失败：{e}") from e
+    items = data.get("paragraphs") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        raise ValueError("字段无效：paragraphs 必须是数组")
+
+    repaired = list(parts)
+    by_number = {i // 2 + 1: i for i in plan}
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get("text"), str):
+            continue
+        i = by_number.get(item.get("index"))
+        if i is None:
+            continue
+        new_text = item["text"].strip()
+        old_marks = {m.group(1).strip().lower() for m in WORD_MARK_PATTERN.finditer(parts[i])}
+        new_marks = {m.group(1).strip().lower() for m in WORD_MARK_PATTERN.finditer(new_text)}
+        if not new_text or "\n" in new_text or not old_marks <= new_marks or len(new_text) > len(parts[i]) * 2 + 200:
+            print(f"⚠️  段落 {i // 2 + 1} 的改写不符合要求，保留原文")
+            continue
+        # 保留原段落的首尾空白（缩进等）
+        leading = parts[i][: len(parts[i]) - len(parts[i].lstrip())]
+        trailing = parts[i][len(parts[i].rstrip()) :]
+        repaired[i] = f"{leading}{new_text}{trailing}"
+    return "".join(repaired)
+
+
+def _prepare_repair(content: str, target_vocab: List[str]):
+    """返回 (parts, plan)；没有缺词或未启用修补时返回 None"""
+    missing_words = find_missing_words(content, target_vocab)
+    if not missing_words or not REPAIR_MISSING:
+        return None
+    parts = split_paragraphs(content)
+    plan = plan_repair(parts, missing_words)
+    if not plan:
+        return None
+    rewritten = sum(len(parts[i]) for i in plan)
+    print(f"🩹 修补缺失词汇 {missing_words}：改写 {len(plan)} 段（{rewritten}/{len(content)} 字）")
+    return parts, plan
+
+
+def _finish_repair(content: str, parts: List[str], plan: Dict[int, List[str]], text: str, target_vocab: List[str]) -> str:
+    try:
+        repaired = apply_repair(parts, plan, text)
+    except ValueError as e:
+        print(f"⚠️  修补失败（{e}），保留原文")
+        return content
+    still_missing = find_missing_words(repaired, target_vocab)
+    if still_missing:
+        print(f"🩹 修补后仍缺失：{still_missing}")
+    else:
+        print("🩹 修补完成，核心词汇已全部覆盖")
+    return repaired
+
+
+def repair_missing_words(client, content: str, target_vocab: List[str]) -> str:
+    """
+    缺词修补：只改写少数段落把缺失的核心词汇补进去，返回修补后的内容
+
+    只发送待改写段落和缺失单词（不带整章和长 system prompt），成本远低于整章重新生成；
+    修补请求失败时返回原文，由 finish_chapter 照常报告缺失词汇
+    """
+    prepared = _prepare_repair(content, target_vocab)
+    if prepared is None:
+        return content
+    parts, plan = prepared
+    try:
+        text = request_text(
+            client, build_repair_messages(parts, plan), repair_params(parts, plan), kind="repair",
+            validate=lambda text: apply_repair(parts, plan, text)
+        )
+    except BadRequestError as e:
+        print(f"⚠️  修补失败（{e}），保留原文")
+        return content
+    return _finish_repair(content, parts, plan, text, target_vocab)
+
+
+def score_candidate(text: str, target_vocab: List[str], structured: bool) -> Dict:
+    """
+    检查一个候选：结构化输出能否解析、{word|meaning} 标记是否完整、核心词汇覆盖率、正文长度
+
+    Returns:
+        {"passed", "coverage", "length", "reason", "parsed"}；parsed 为 {"title", "content", "used_words"}，
+        结构化输出解析失败时为 None（非结构化时 title / used_words 为 None）
+    """
+    try:
+        if structured:
+            parsed = parse_structured_chapter(text)
+        else:
+            parsed = {"title": None, "content": text.strip(), "used_words": None}
+    except ValueError as e:
+        return {"passed": False, "coverage": 0.0, "length": 0, "reason": str(e), "parsed": None}
+
+    content = parsed["content"]
+    missing_words = find_missing_words(content, target_vocab)
+    coverage = 1 - len(missing_words) / len(target_vocab) if target_vocab else 1.0
+    length = len(WORD_MARK_PATTERN.sub(lambda m: m.group(1), content))
+    reasons = []
+    if content.count("{") != len(WORD_MARK_PATTERN.findall(content)):
+        reasons.append("标记格式不完整")
+    if coverage < CANDIDATE_MIN_COVERAGE:
+        reasons.append(f"覆盖率 {coverage:.0%}")
+    if not CANDIDATE_MIN_CHARS <= length <= CANDIDATE_MAX_CHARS:
+        reasons.append(f"长度 {length}")
+    return {"passed": not reasons, "coverage": round(coverage, 3), "length": length, "reason": "，".join(reasons), "parsed": parsed}
+
+
+def story_book(story_context: Optional[Dict]) -> Optional[str]:
+    """统计用的书名：故事配置的 book 字段，没有时用 genre"""
+    if not story_context:
+        return None
+    return story_context.get("book") or story_context.get("genre")
+
+
+def new_chapter_id() -> str:
+    """章节ID（时间戳 + 随机后缀，并发生成时不会重复）"""
+    return f"chapter-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def finish_chapter(
+    chapter_title: str,
+    content: str,
+    target_vocab: List[str],
+    used_words: Optional[List[str]] = None,
+    chapter_id: Optional[str] = None
+) -> Dict:
+    """
+    验证词汇覆盖并构建章节数据
+
+    Args:
+        used_words: 结构化输出中模型自报使用的单词（可选，与实际内容核对）
+        chapter_id: 章节ID（可选，默认新生成）
+    """
+    # 验证词汇覆盖（以实际内容为准）
+    missing_words = find_missing_words(content, target_vocab)
+
+    if missing_words:
+        print(f"⚠️  警告：以下词汇未在内容中出现：{missing_words}")
+        print("建议：手动补充或重新生成")
+
+    if used_words is not None:
+        missing_set = {w.lower() for w in missing_words}
+        claimed = [w for w in used_words if w.lower() in missing_set]
+        if claimed:
+            print(f"⚠️  模型自报已使用、但内容中找不到的词汇：{claimed}")
+
+    # 构建章节数据
+    chapter = {
+        "id": chapter_id or new_chapter_id(),
+        "title": chapter_title,
+        "content": content
+    }
+
+    return chapter
+
+
 def generate_chapter(
     target_vocab: List[str],
     review_vocab: Optional[List[str]] = None,
     story_context: Optional[Dict] = None,
-    chapter_title: Optional[str] = None
+    chapter_title: Optional[str] = None,
+    structured: bool = STRUCTURED_OUTPUT,
+    stream: bool = STREAM_OUTPUT,
+    candidates: int = CANDIDATES
 ) -> Dict:
     """
     生成章节内容
@@ -176,77 +650,318 @@ def generate_chapter(
         review_vocab: 复习词表（可选）
         story_context: 故事上下文
         chapter_title: 章节标题（可选，如果不提供则让AI生成）
+        structured: 不指定标题时是否一次请求同时生成标题和正文（默认 NOVEL_STRUCTURED_OUTPUT，开启）
+        stream: 是否流式生成并在覆盖率不足时提前中断重试（默认 NOVEL_STREAM，关闭）
+        candidates: 大于 1 时并发请求这么多个候选，第一个通过检查的胜出、其余取消（默认 NOVEL_CANDIDATES，
+            见 generate_candidates_async；启用时不使用流式）
     
     Returns:
         符合 Chapter 接口的字典
     """
-    # 初始化 OpenAI 客户端
-    client = OpenAI(
-        api_key=API_KEY,
-        base_url=BASE_URL
+    # 本章所有请求的统计都带上章节ID和书名（llm_metrics.py report 按章 / 按书汇总）
+    chapter_id = new_chapter_id()
+    with metrics_tags(chapter=chapter_id, book=story_book(story_context)):
+        # 共用客户端（进程内复用连接池）
+        client = get_client()
+
+        # 构建提示词
+        user_prompt = build_user_prompt(target_vocab, review_vocab, story_context)
+
+        # 不指定标题时，一次请求同时生成标题和正文；解析失败再走 标题 + 正文 两次请求
+        if not chapter_title and structured:
+            print(f"正在生成章节（标题 + 正文一次生成）...")
+            print(f"核心词汇数量：{len(target_vocab)}")
+            try:
+                if candidates > 1:
+                    parsed = generate_candidates(
+                        build_structured_messages(user_prompt), STRUCTURED_PARAMS, target_vocab, candidates, True, "structured"
+                    )["parsed"]
+                else:
+                    text = request_text(
+                        client, build_structured_messages(user_prompt), STRUCTURED_PARAMS, target_vocab, stream, kind="structured",
+                        validate=chapter_check(True)
+                    )
+                    parsed = parse_structured_chapter(text)
+            except (ValueError, BadRequestError) as e:
+                print(f"⚠️  结构化输出不可用（{e}），改为分别生成标题和正文")
+            else:
+                content = repair_missing_words(client, parsed["content"], target_vocab)
+                return finish_chapter(parsed["title"], content, target_vocab, parsed["used_words"], chapter_id)
+
+        # 如果需要生成标题，先让AI生成标题
+        if not chapter_title:
+            chapter_title = request_text(
+                client, build_title_messages(user_prompt), TITLE_PARAMS, kind="title", validate=title_check
+            ).strip()
+
+        # 生成章节内容
+        print(f"正在生成章节：{chapter_title}...")
+        print(f"核心词汇数量：{len(target_vocab)}")
+        if review_vocab:
+            print(f"复习词汇数量：{len(review_vocab)}")
+
+        if candidates > 1:
+            content = generate_candidates(
+                build_chapter_messages(user_prompt), CHAPTER_PARAMS, target_vocab, candidates, False, "chapter"
+            )["parsed"]["content"]
+        else:
+            content = request_text(
+                client, build_chapter_messages(user_prompt), CHAPTER_PARAMS, target_vocab, stream,
+                validate=chapter_check(False)
+            ).strip()
+        content = repair_missing_words(client, content, target_vocab)
+
+        return finish_chapter(chapter_title, content, target_vocab, chapter_id=chapter_id)
+
+
+async def request_text_async(
+    client,
+    limiter: RateLimiter,
+    messages: List[Dict],
+    params: Dict,
+    target_vocab: List[str] = (),
+    stream: bool = False,
+    kind: str = "chapter",
+    validate: Optional[Callable[[str], object]] = None
+) -> str:
+    """request_text 的异步版本（每次请求都经过限流器，命中缓存时不占用限流额度）"""
+    stream_text = (
+        (lambda call: _stream_text_async(client, limiter, messages, params, target_vocab, call)) if stream else None
     )
-    
-    # 构建提示词
-    user_prompt = build_user_prompt(target_vocab, review_vocab, story_context)
-    
-    # 如果需要生成标题，先让AI生成标题
-    if not chapter_title:
-        title_prompt = f"""根据以下信息，生成一个吸引人的章节标题（不超过15字）：
-        
-{user_prompt}
+    return await llm_request.request_text_async(client, limiter, messages, params, kind, validate, stream_text)
 
-只输出标题，不要其他内容。"""
-        
-        title_response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {"role": "system", "content": "你是一个擅长起标题的编辑。"},
-                {"role": "user", "content": title_prompt}
-            ],
-            temperature=0.7,
-            max_tokens=50
+
+async def _stream_text_async(
+    client, limiter: RateLimiter, messages: List[Dict], params: Dict, target_vocab: List[str], call: Dict
+) -> str:
+    """_stream_text 的异步版本"""
+    aborted_lengths: List[int] = []
+    call["queued"] = 0.0
+    for attempt in range(STREAM_RETRIES + 1):
+        scanner = CoverageScanner(target_vocab, min(params["max_tokens"], STREAM_LENGTH_BUDGET))
+        parts: List[str] = []
+        usage = None
+        async with limiter.limit(estimate_tokens(messages, params["max_tokens"])) as ticket:
+            call["queued"] += ticket["queued"]
+            started = time.monotonic()
+            response = await client.chat.completions.create(
+                model=MODEL, messages=messages, stream=True, stream_options={"include_usage": True}, **params
+            )
+            try:
+                async for chunk in response:
+                    usage = chunk.usage or usage
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if not delta:
+                        continue
+                    if not parts:
+                        call["ttft"] = round(time.monotonic() - started, 3)
+                    parts.append(delta)
+                    scanner.feed(delta)
+                    if attempt < STREAM_RETRIES and scanner.should_abort():
+                        raise StreamAborted(_abort_message(scanner))
+            except StreamAborted as e:
+                print(f"⏹️  提前中断：{e}，重新生成（第 {attempt + 2} 次）")
+                aborted_lengths.append(scanner.length)
+                continue
+            finally:
+                await response.close()
+        text = "".join(parts)
+        _fill_stream_usage(call, messages, usage, text, aborted_lengths)
+        return text
+
+
+async def repair_missing_words_async(client, limiter: RateLimiter, content: str, target_vocab: List[str]) -> str:
+    """repair_missing_words 的异步版本"""
+    prepared = _prepare_repair(content, target_vocab)
+    if prepared is None:
+        return content
+    parts, plan = prepared
+    try:
+        text = await request_text_async(
+            client, limiter, build_repair_messages(parts, plan), repair_params(parts, plan), kind="repair",
+            validate=lambda text: apply_repair(parts, plan, text)
         )
-        chapter_title = title_response.choices[0].message.content.strip()
+    except BadRequestError as e:
+        print(f"⚠️  修补失败（{e}），保留原文")
+        return content
+    return _finish_repair(content, parts, plan, text, target_vocab)
+
+
+async def _request_candidate(client, limiter: RateLimiter, messages: List[Dict], params: Dict, kind: str) -> str:
+    """一个候选请求（不读写缓存：k 个候选的缓存键相同，只缓存胜出的候选）"""
+    with track_call(kind, *call_scope(client)) as call:
+        response = await create_response_async(client, limiter, messages, params, call)
+        return response.choices[0].message.content or ""
+
+
+async def generate_candidates_async(
+    client,
+    limiter: RateLimiter,
+    messages: List[Dict],
+    params: Dict,
+    target_vocab: List[str],
+    k: int,
+    structured: bool,
+    kind: str = "chapter"
+) -> Dict:
+    """
+    并发请求 k 个候选，按到达顺序检查（score_candidate）：第一个通过的候选胜出，其余立即取消；
+    都没通过时取覆盖率最高的可用候选（之后由缺词修补补齐）。每次选择记录一条 candidates 统计
     
-    # 生成章节内容
-    print(f"正在生成章节：{chapter_title}...")
-    print(f"核心词汇数量：{len(target_vocab)}")
-    if review_vocab:
-        print(f"复习词汇数量：{len(review_vocab)}")
-    
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0.8,  # 稍高的温度保证创意和爽感
-        max_tokens=4000   # 足够生成2500字的内容
-    )
+    Returns:
+        胜出候选的 score_candidate 结果（另含原始文本 text）
     
-    content = response.choices[0].message.content.strip()
+    Raises:
+        没有可用候选时抛出最后一个请求错误，或 ValueError（结构化输出全部解析失败）
+    """
+    key, cached = cached_text(client, messages, params, kind)
+    if cached is not None:
+        return {**score_candidate(cached, target_vocab, structured), "text": cached}
     
-    # 验证词汇覆盖
-    missing_words = []
-    for word in target_vocab:
-        if word.lower() not in content.lower():
-            missing_words.append(word)
+    started = time.monotonic()
+    tasks = [asyncio.ensure_future(_request_candidate(client, limiter, messages, params, kind)) for _ in range(k)]
+    scores: List[Dict] = []
+    accepted = best = None
+    error: Optional[Exception] = None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                text = await next_done
+            except Exception as e:
+                error = e
+                scores.append({"passed": False, "coverage": None, "reason": f"请求失败：{e}"})
+                continue
+            score = {**score_candidate(text, target_vocab, structured), "text": text}
+            scores.append(score)
+            if score["passed"]:
+                accepted = score
+                break
+            if score["parsed"] is not None and (best is None or score["coverage"] > best["coverage"]):
+                best = score
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
     
-    if missing_words:
-        print(f"⚠️  警告：以下词汇未在内容中出现：{missing_words}")
-        print("建议：重新生成或手动检查内容")
+    wall_time = time.monotonic() - started
+    record_candidates(k, scores, accepted is not None, wall_time)
+    chosen = accepted or best
+    if chosen is None:
+        if error is not None and not any("text" in score for score in scores):
+            raise error
+        raise ValueError(f"{k} 个候选都无法使用：{scores[-1]['reason']}")
+    if accepted:
+        print(f"🏁 第 {len(scores)}/{k} 个到达的候选通过检查（覆盖率 {accepted['coverage']:.0%}，{wall_time:.1f}s），其余已取消")
+    else:
+        print(f"⚠️  {k} 个候选都没有通过检查，使用覆盖率最高的候选（{best['coverage']:.0%}，{best['reason']}）")
+    if key is not None and accepted:
+        active_cache().put(key, accepted["text"])  # 只缓存通过检查的候选
+    return chosen
+
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_client = None
+_background_lock = threading.Lock()
+
+
+def run_in_background_loop(coro):
+    """
+    在进程内共用的后台事件循环中运行协程并等待结果（同 EndpointPool.create）
+
+    事件循环和其中的异步客户端 / 端点池连接在多次调用间复用（常驻 worker 不必每章重新建立连接）；
+    调用方自己在事件循环中时也能调用（会阻塞该循环直到完成，异步代码应直接 await 协程）。
+    调用方的 contextvars（调用统计的章节ID / 书名等标签）会带入后台任务
+    """
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, daemon=True).start()
+    context = contextvars.copy_context()
     
-    # 生成章节ID
-    chapter_id = f"chapter-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    async def run():
+        for var, value in context.items():
+            var.set(value)
+        return await coro
     
-    # 构建章节数据
-    chapter = {
-        "id": chapter_id,
-        "title": chapter_title,
-        "content": content
-    }
+    return asyncio.run_coroutine_threadsafe(run(), _background_loop).result()
+
+
+def generate_candidates(messages: List[Dict], params: Dict, target_vocab: List[str], k: int, structured: bool, kind: str) -> Dict:
+    """generate_candidates_async 的同步入口（generate_chapter 使用）：在后台事件循环中并发请求"""
     
-    return chapter
+    async def run():
+        global _background_client
+        if _background_client is None:
+            _background_client = create_async_client()
+        return await generate_candidates_async(
+            _background_client, RateLimiter(k), messages, params, target_vocab, k, structured, kind
+        )
+
+    return run_in_background_loop(run())
+
+
+async def generate_chapter_async(
+    client,
+    limiter: RateLimiter,
+    target_vocab: List[str],
+    review_vocab: Optional[List[str]] = None,
+    story_context: Optional[Dict] = None,
+    chapter_title: Optional[str] = None,
+    structured: bool = STRUCTURED_OUTPUT,
+    stream: bool = STREAM_OUTPUT,
+    candidates: int = CANDIDATES
+) -> Dict:
+    """
+    generate_chapter 的异步版本（供并发批量生成使用）
+
+    Args:
+        client: 共用的 AsyncOpenAI 客户端
+        limiter: 共用的限流器（并发数 + RPM / TPM）
+        其余参数同 generate_chapter
+    """
+    chapter_id = new_chapter_id()
+    with metrics_tags(chapter=chapter_id, book=story_book(story_context)):
+        user_prompt = build_user_prompt(target_vocab, review_vocab, story_context)
+
+        if not chapter_title and structured:
+            try:
+                if candidates > 1:
+                    parsed = (await generate_candidates_async(
+                        client, limiter, build_structured_messages(user_prompt), STRUCTURED_PARAMS, target_vocab, candidates,
+                        True, "structured"
+                    ))["parsed"]
+                else:
+                    text = await request_text_async(
+                        client, limiter, build_structured_messages(user_prompt), STRUCTURED_PARAMS, target_vocab, stream,
+                        kind="structured", validate=chapter_check(True)
+                    )
+                    parsed = parse_structured_chapter(text)
+            except (ValueError, BadRequestError) as e:
+                print(f"⚠️  结构化输出不可用（{e}），改为分别生成标题和正文")
+            else:
+                content = await repair_missing_words_async(client, limiter, parsed["content"], target_vocab)
+                return finish_chapter(parsed["title"], content, target_vocab, parsed["used_words"], chapter_id)
+
+        if not chapter_title:
+            chapter_title = (
+                await request_text_async(
+                    client, limiter, build_title_messages(user_prompt), TITLE_PARAMS, kind="title", validate=title_check
+                )
+            ).strip()
+
+        if candidates > 1:
+            content = (await generate_candidates_async(
+                client, limiter, build_chapter_messages(user_prompt), CHAPTER_PARAMS, target_vocab, candidates, False
+            ))["parsed"]["content"]
+        else:
+            content = await request_text_async(
+                client, limiter, build_chapter_messages(user_prompt), CHAPTER_PARAMS, target_vocab, stream,
+                validate=chapter_check(False)
+            )
+        content = await repair_missing_words_async(client, limiter, content.strip(), target_vocab)
+
+        return finish_chapter(chapter_title, content, target_vocab, chapter_id=chapter_id)
 
 
 def save_chapter(chapter: Dict, output_dir: Optional[str] = None, filename: Optional[str] = None):
@@ -305,7 +1020,8 @@ def generate_chapter_with_curriculum(
     review_size: int = 5,
     chapter_title: Optional[str] = None,
     story_config_file: str = STORY_CONFIG_FILE,
-    progress_file: str = PROGRESS_FILE
+    progress_file: str = PROGRESS_FILE,
+    candidates: int = CANDIDATES
 ) -> Dict:
     """
     使用课程管理器自动生成章节
@@ -316,6 +1032,7 @@ def generate_chapter_with_curriculum(
         chapter_title: 章节标题（可选）
         story_config_file: 故事配置文件路径
         progress_file: 进度追踪文件路径
+        candidates: 并发请求的候选数（见 generate_chapter）
     
     Returns:
         生成的章节数据
@@ -335,24 +1052,30 @@ def generate_chapter_with_curriculum(
     print(f"新单词：{target_vocab}")
     
     # 获取复习单词
-    review_vocab = manager.get_review_batch(review_size)
+    review_vocab = manager.get_review_batch(review_size, batch_id=manager.last_batch_id)
     if review_vocab:
         print(f"\n🔄 获取复习单词（{len(review_vocab)}个）...")
         print(f"复习单词：{review_vocab}")
     
-    # 3. 加载故事配置
-    print(f"\n📝 加载故事配置...")
-    story_context = load_story_config(story_config_file)
-    print(f"流派：{story_context.get('genre', 'N/A')}")
-    
-    # 4. 生成章节
-    print(f"\n✨ 开始生成章节...")
-    chapter = generate_chapter(
-        target_vocab=target_vocab,
-        review_vocab=review_vocab if review_vocab else None,
-        story_context=story_context,
-        chapter_title=chapter_title
-    )
+    # 3. 加载故事配置 + 4. 生成章节
+    # 失败或中断时放弃批次：单词回到待学习队列最前面，重跑时取到同一批单词（提示词相同，可以命中响应缓存）
+    batch_id = manager.last_batch_id
+    try:
+        print(f"\n📝 加载故事配置...")
+        story_context = load_story_config(story_config_file)
+        print(f"流派：{story_context.get('genre', 'N/A')}")
+        
+        print(f"\n✨ 开始生成章节...")
+        chapter = generate_chapter(
+            target_vocab=target_vocab,
+            review_vocab=review_vocab if review_vocab else None,
+            story_context=story_context,
+            chapter_title=chapter_title,
+            candidates=candidates
+        )
+    except (Exception, KeyboardInterrupt):
+        manager.abort_batch(batch_id)
+        raise
     
     # 5. 标记单词为已学习
     print(f"\n✅ 标记单词为已学习...")
@@ -367,15 +1090,152 @@ def generate_chapter_with_curriculum(
     return chapter
 
 
+# ==================== 批处理接口 ====================
+
+def chapter_custom_id(category: str, batch_id: str) -> str:
+    """批处理请求的 custom_id：chapter:<分类>:<课程批次ID>（默认进度文件的分类为空）"""
+    return f"chapter:{category}:{batch_id}"
+
+
+def batch_chapter_id(batch_id: str) -> str:
+    """批处理导入的章节ID：由课程批次ID推导，重复导入同一批次时写回同一个章节文件"""
+    return f"chapter-{batch_id[len('batch-'):] if batch_id.startswith('batch-') else batch_id}"
+
+
+def parse_chapter_custom_id(custom_id: str) -> Optional[Tuple[str, str]]:
+    """解析 chapter_custom_id，不是章节请求时返回 None"""
+    kind, _, rest = custom_id.partition(":")
+    category, sep, batch_id = rest.partition(":")
+    if kind != "chapter" or not sep or not batch_id:
+        return None
+    return category, batch_id
+
+
+def export_chapter_requests(
+    output_file: str,
+    count: int,
+    batch_size: int = 20,
+    review_size: int = 5,
+    category: str = "",
+    story_config_file: str = STORY_CONFIG_FILE
+) -> int:
+    """
+    为接下来的 count 章各领取一个课程批次（租约 BATCH_LEASE_SECONDS），写出结构化输出请求的批处理文件
+
+    单词在导入结果（ingest_chapter_results）时才标记为已学习；结果没有按时导入的批次到期后自动回收
+
+    Returns:
+        写出的请求数（待学习单词用完时少于 count）
+    """
+    manager = CurriculumManager(get_progress_file_for_category(category))
+    story_context = load_story_config(story_config_file)
+    requests = []
+    for _ in range(count):
+        target_vocab = manager.get_next_batch(batch_size, lease_seconds=BATCH_LEASE_SECONDS)
+        if not target_vocab:
+            break
+        review_vocab = manager.get_review_batch(review_size, batch_id=manager.last_batch_id) if len(manager.scheduler) else []
+        user_prompt = build_user_prompt(target_vocab, review_vocab or None, story_context)
+        requests.append(batch_request(
+            chapter_custom_id(category, manager.last_batch_id), MODEL, build_structured_messages(user_prompt), STRUCTURED_PARAMS
+        ))
+    written = write_batch_file(output_file, requests)
+    print(f"📦 已写出 {written} 个章节请求：{output_file}")
+    return written
+
+
+def ingest_chapter_results(
+    results_file: str,
+    output_dir: Optional[str] = None,
+    story_config_file: str = STORY_CONFIG_FILE
+) -> Dict[str, int]:
+    """
+    导入批处理结果：每行按正常流程校验（parse_structured_chapter + finish_chapter）、保存，
+    然后提交课程批次（标记为已学习）并推进章节；失败或无法解析的结果放弃批次，单词回到待学习队列最前面
+
+    批次已提交或已过期回收的结果跳过，同一个结果文件重复导入不会产生重复章节；
+    章节ID由批次ID推导（batch_chapter_id），保存后、提交前中断的批次重新导入时覆盖同一个章节文件。
+    导入不再调用模型，缺失的单词只给出警告（不做段落修补）。
+
+    Returns:
+        {"saved", "failed", "skipped"} 计数
+    """
+    story_context = load_story_config(story_config_file) if os.path.exists(story_config_file) else None
+    managers: Dict[str, CurriculumManager] = {}
+    counts = {"saved": 0, "failed": 0, "skipped": 0}
+    for custom_id, text, usage, error in read_batch_results(results_file):
+        parsed_id = parse_chapter_custom_id(custom_id)
+        if parsed_id is None:
+            if error:
+                print(f"❌ {custom_id} 无法导入：{error}")
+                counts["failed"] += 1
+            else:
+                print(f"⚠️  跳过非章节请求的结果：{custom_id}")
+                counts["skipped"] += 1
+            continue
+        category, batch_id = parsed_id
+        if category not in managers:
+            managers[category] = CurriculumManager(get_progress_file_for_category(category))
+        manager = managers[category]
+        lease = manager.leases.get(batch_id)
+        if lease is None:
+            print(f"⚠️  跳过 {custom_id}：批次已提交或已过期回收")
+            counts["skipped"] += 1
+            continue
+
+        # 章节ID由批次ID推导：保存后、提交前崩溃时，重新导入覆盖同一个文件，不会多出一章
+        chapter_id = batch_chapter_id(batch_id)
+        with metrics_tags(chapter=chapter_id, book=story_book(story_context)):
+            record_batch_call("structured", MODEL, usage, error)
+            try:
+                if error:
+                    raise ValueError(error)
+                parsed = parse_structured_chapter(text)
+            except ValueError as e:
+                print(f"❌ {custom_id} 导入失败：{e}")
+                manager.abort_batch(batch_id)
+                counts["failed"] += 1
+                continue
+
+        chapter = finish_chapter(parsed["title"], parsed["content"], lease["words"], parsed["used_words"], chapter_id)
+        save_chapter(chapter, output_dir)
+        manager.commit_batch(batch_id)
+        manager.increment_chapter()
+        counts["saved"] += 1
+
+    print(f"\n📥 导入完成：保存 {counts['saved']} 章，失败 {counts['failed']}，跳过 {counts['skipped']}")
+    return counts
+
+
 def main():
     """主函数 - 使用课程管理器自动生成"""
+    parser = argparse.ArgumentParser(description="使用课程管理器自动生成一章")
+    parser.add_argument("--cache", action="store_true", help="启用 LLM 响应缓存：相同请求直接重放（见 llm_cache.py）")
+    batch_mode = parser.add_mutually_exclusive_group()
+    batch_mode.add_argument("--batch-out", type=str, metavar="FILE", help="不直接生成，写出批处理接口的请求文件（JSONL，见 llm_batch.py）")
+    batch_mode.add_argument("--ingest", type=str, metavar="FILE", help="导入批处理接口的结果文件（JSONL）")
+    parser.add_argument("--chapters", type=int, default=1, help="--batch-out 写出的章节数（默认 1）")
+    parser.add_argument("--category", type=str, default="", help="--batch-out 使用的分类进度文件（默认全局进度文件）")
+    parser.add_argument("--output-dir", type=str, default=None, help="--ingest 的章节输出目录（默认 src/data/generated）")
+    parser.add_argument("--candidates", type=int, default=CANDIDATES, help="并发请求的候选数，第一个通过检查的胜出（默认 NOVEL_CANDIDATES=1）")
+    args = parser.parse_args()
+    if args.cache:
+        enable_cache()
+
+    if args.batch_out:
+        export_chapter_requests(args.batch_out, args.chapters, batch_size=20, review_size=5, category=args.category)
+        return
+    if args.ingest:
+        counts = ingest_chapter_results(args.ingest, args.output_dir)
+        sys.exit(1 if counts["failed"] else 0)
     
     try:
         # 使用课程管理器生成章节
         chapter = generate_chapter_with_curriculum(
             batch_size=20,  # 每章20个新单词
             review_size=5,  # 每章5个复习单词
-            chapter_title=None  # 让AI自动生成
+            chapter_title=None,  # 让AI自动生成
+            candidates=args.candidates
         )
         
         # 保存章节
@@ -388,6 +1248,8 @@ def main():
         print(f"内容长度：{len(chapter['content'])} 字符")
         print(f"章节ID：{chapter['id']}")
         print("="*50)
+        if active_pool():
+            active_pool().print_metrics()
         
     except Exception as e:
         print(f"\n❌ 错误：{e}")
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 课程进度列式导出（分析用）
+
+把所有分类的单词状态导出为列式文件，分析笔记本可以直接按列加载，不必逐个解析 progress_tracker_*.json：
+  category / word / state / assigned_at / learned_chapter / review_count / due_chapter / interval / ease / export_seq
+
+- 首选 Parquet（需要 pyarrow），否则 NumPy .npz（需要 numpy）
+- 增量导出：导出目录下的 state.json 记录每个 (分类, 单词) 上次导出时的指纹，
+  每次只把发生变化的行写成一个新分片（part-00001.parquet ...），export_seq 为分片序号
+- 同一单词可能出现在多个分片中，取 export_seq 最大的一行即为最新状态（load_export 已处理）
+- --compact 把所有分片合并为一个
+
+state 编码：0 = pending，1 = assigned，2 = learned；缺失的数值为 NaN
+
+用法：
+  cd tools
+  python3 progress_export.py                    # 增量导出全部分类到 tools/progress_export/
+  python3 progress_export.py --format npz       # 新导出目录使用 npz
+  python3 progress_export.py --compact          # 合并分片
+
+笔记本中：
+  from progress_export import load_export
+  columns = load_export()        # {列名: numpy 数组}，每个 (分类, 单词) 一行
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from progress_store import (
+    DEFAULT_BACKEND,
+    REVIEW_FIELD,
+    SQLITE_DB_FILE,
+    STATE_FIELDS,
+    WORD_STATES,
+    JsonProgressStore,
+    SqliteProgressStore,
+    create_store,
+    write_json_atomic,
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXPORT_DIR = os.path.join(BASE_DIR, "progress_export")
+
+STATE_CODES = {state: code for code, state in enumerate(WORD_STATES)}
+# 列名 -> (numpy dtype, pyarrow 类型名)
+COLUMNS = {
+    "category": ("str", "string"),
+    "word": ("str", "string"),
+    "state": ("int8", "int8"),
+    "assigned_at": ("float64", "float64"),
+    "learned_chapter": ("float64", "float64"),
+    "review_count": ("int32", "int32"),
+    "due_chapter": ("float64", "float64"),
+    "interval": ("float64", "float64"),
+    "ease": ("float64", "float64"),
+    "export_seq": ("int32", "int32"),
+}
+FORMAT_EXTENSIONS = {"parquet": ".parquet", "npz": ".npz"}
+
+Row = Tuple
+
+
+def available_format() -> Optional[str]:
+    if pq is not None:
+        return "parquet"
+    if np is not None:
+        return "npz"
+    return None
+
+
+def category_of(progress_file: str) -> str:
+    """progress_tracker_reborn.json -> reborn；全局进度文件为空字符串"""
+    stem = os.path.splitext(os.path.basename(progress_file))[0]
+    return stem[len("progress_tracker_"):] if stem.startswith("progress_tracker_") else ""
+
+
+def discover_progress_files(backend: Optional[str] = None) -> List[str]:
+    """所有分类的进度文件（JSON 文件 + 当前后端中已有的分类）"""
+    files = set(glob.glob(os.path.join(BASE_DIR, "progress_tracker*.json")))
+    backend = (backend or DEFAULT_BACKEND).lower()
+    if backend == "sqlite" and os.path.exists(SQLITE_DB_FILE):
+        store = SqliteProgressStore(os.path.join(BASE_DIR, "progress_tracker.json"))
+        files |= {os.path.join(BASE_DIR, f"{scope}.json") for scope in store.list_scopes()}
+    elif backend == "shared":
+        from word_table import SHARED_PROGRESS_FILE, WordTable
+
+        table = WordTable.load(SHARED_PROGRESS_FILE)
+        files |= {os.path.join(BASE_DIR, f"{scope}.json") for scope in table.categories}
+    return sorted(files)
+
+
+def read_progress(progress_file: str, backend: Optional[str] = None) -> Optional[Dict]:
+    """
+    只读方式读取一个分类的进度（在存储锁内）：后端中还没有这个分类时直接读 JSON 进度文件，
+    不触发 sqlite / shared 后端的首次导入；都没有时返回 None
+    """
+    backend = (backend or DEFAULT_BACKEND).lower()
+    progress = None
+    # 数据库还不存在时不创建（SqliteProgressStore 初始化会建表）
+    if backend != "sqlite" or os.path.exists(SQLITE_DB_FILE):
+        store = create_store(progress_file, backend)
+        with store.lock:
+            progress = store.peek()
+    if progress is None:
+        store = JsonProgressStore(progress_file)
+        with store.lock:
+            progress = store.peek()
+    return progress
+
+
+def progress_rows(category: str, progress: Dict) -> Dict[str, Row]:
+    """把一个分类的进度转换为行：(分类\\t单词) -> (category, word, state, assigned_at, learned, reps, due, interval, ease)"""
+    assigned_at: Dict[str, float] = {}
+    for lease in (progress.get("leases") or {}).values():
+        for w in lease.get("words", []):
+            assigned_at[w.strip().lower()] = lease.get("assigned_at", math.nan)
+    reviews = progress.get(REVIEW_FIELD) or {}
+
+    rows: Dict[str, Row] = {}
+    for state, field in STATE_FIELDS.items():
+        for w in progress.get(field, []):
+            key = w.strip().lower()
+            if not key:
+                continue
+            review = reviews.get(key) if state == "learned" else None
+            rows[f"{category}\t{key}"] = (
+                category,
+                w.strip(),
+                STATE_CODES[state],
+                assigned_at.get(key, math.nan) if state == "assigned" else math.nan,
+                float(review[4]) if review and len(review) > 4 else math.nan,
+                int(review[3]) if review else 0,
+                float(review[2]) if review else math.nan,
+                float(review[0]) if review else math.nan,
+                float(review[1]) if review else math.nan,
+            )
+    return rows
+
+
+def fingerprint(row: Row) -> int:
+    return zlib.crc32(json.dumps(row, ensure_ascii=False).encode("utf-8"))
+
+
+def _write_part(path: str, fmt: str, columns: Dict[str, List]):
+    if fmt == "parquet":
+        arrays = {}
+        for name, values in columns.items():
+            array = pa.array(values, type=getattr(pa, COLUMNS[name][1])())
+            arrays[name] = array.dictionary_encode() if name == "category" else array
+        pq.write_table(pa.table(arrays), path, compression="zstd")
+    else:
+        np.savez_compressed(path, **{name: np.asarray(values, dtype=COLUMNS[name][0]) for name, values in columns.items()})
+
+
+def _read_part(path: str) -> Dict:
+    if path.endswith(".parquet"):
+        table = pq.read_table(path)
+        return {name: table.column(name).to_numpy(zero_copy_only=False).astype(COLUMNS[name][0]) for name in COLUMNS}
+    with np.load(path) as data:
+        return {name: data[name] for name in COLUMNS}
+
+
+def _load_state(export_dir: str) -> Dict:
+    path = os.path.join(export_dir, "state.json")
+    if not os.path.exists(path):
+        return {"format": None, "seq": 0, "fingerprints": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def export_progress(
+    export_dir: str = EXPORT_DIR, fmt: Optional[str] = None, backend: Optional[str] = None
+) -> Tuple[int, Optional[str]]:
+    """
+    增量导出所有分类，返回 (写入的行数, 分片路径)；没有变化时不写分片
+    """
+    state = _load_state(export_dir)
+    fmt = state["format"] or fmt or available_format()
+    if fmt is None:
+        raise RuntimeError("列式导出需要 pyarrow（Parquet）或 numpy（npz）：pip install pyarrow 或 pip install numpy")
+    if fmt == "parquet" and pq is None or fmt == "npz" and np is None:
+        raise RuntimeError(f"导出目录使用 {fmt} 格式，但当前环境缺少对应的库（{'pyarrow' if fmt == 'parquet' else 'numpy'}）")
+
+    changed: List[Row] = []
+    fingerprints: Dict[str, int] = state["fingerprints"]
+    for progress_file in discover_progress_files(backend):
+        progress = read_progress(progress_file, backend)
+        if progress is None:
+            continue
+        for key, row in progress_rows(category_of(progress_file), progress).items():
+            fp = fingerprint(row)
+            if fingerprints.get(key) != fp:
+                fingerprints[key] = fp
+                changed.append(row)
+    if not changed:
+        return 0, None
+
+    seq = state["seq"] + 1
+    columns: Dict[str, List] = {name: [] for name in COLUMNS}
+    names = list(COLUMNS)[:-1]
+    for row in changed:
+        for name, value in zip(names, row):
+            columns[name].append(value)
+    columns["export_seq"] = [seq] * len(changed)
+
+    os.makedirs(export_dir, exist_ok=True)
+    part = os.path.join(export_dir, f"part-{seq:05d}{FORMAT_EXTENSIONS[fmt]}")
+    _write_part(part, fmt, columns)
+    write_json_atomic(
+        os.path.join(export_dir, "state.json"),
+        {"format": fmt, "seq": seq, "fingerprints": fingerprints},
+        indent=None,
+    )
+    return len(changed), part
+
+
+def load_export(export_dir: str = EXPORT_DIR) -> Dict:
+    """读取全部分片，每个 (分类, 单词) 只保留 export_seq 最大的一行，返回 {列名: numpy 数组}"""
+    if np is None:
+        raise RuntimeError("读取导出文件需要 numpy：pip install numpy")
+    parts = sorted(glob.glob(os.path.join(export_dir, "part-*")))
+    if not parts:
+        return {name: np.asarray([], dtype=dtype) for name, (dtype, _) in COLUMNS.items()}
+    loaded = [_read_part(p) for p in parts]
+    merged = {name: np.concatenate([part[name] for part in loaded]) for name in COLUMNS}
+    # 按 export_seq 从新到旧稳定排序，每个 key 取第一次出现的行
+    order = np.argsort(-merged["export_seq"], kind="stable")
+    keys = np.char.add(np.char.add(merged["category"][order].astype(str), "\t"), np.char.lower(merged["word"][order].astype(str)))
+    _, first = np.unique(keys, return_index=True)
+    index = order[np.sort(first)]
+    return {name: column[index] for name, column in merged.items()}
+
+
+def compact_export(export_dir: str = EXPORT_DIR) -> int:
+    """把所有分片合并为一个（保留每个单词的最新一行），返回行数"""
+    state = _load_state(export_dir)
+    old_parts = sorted(glob.glob(os.path.join(export_dir, "part-*")))
+    if len(old_parts) <= 1:
+        return 0
+    columns = load_export(export_dir)
+    seq = state["seq"] + 1
+    part = os.path.join(export_dir, f"part-{seq:05d}{FORMAT_EXTENSIONS[state['format']]}")
+    _write_part(part, state["format"], {name: column.tolist() for name, column in columns.items()})
+    write_json_atomic(os.path.join(export_dir, "state.json"), {**state, "seq": seq}, indent=None)
+    for old in old_parts:
+        os.remove(old)
+    return len(columns["word"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="课程进度列式导出（Parquet / npz，增量）")
+    parser.add_argument("--dir", type=str, default=EXPORT_DIR, help="导出目录（默认 tools/progress_export）")
+    parser.add_argument("--format", choices=list(FORMAT_EXTENSIONS), default=None, help="新导出目录的格式（默认优先 Parquet）")
+    parser.add_argument("--backend", type=str, default=None, help="进度存储后端（默认 CURRICULUM_BACKEND）")
+    parser.add_argument("--compact", action="store_true", help="合并已有分片")
+    args = parser.parse_args()
+
+    try:
+        if args.compact:
+            rows = compact_export(args.dir)
+            print(f"✅ 已合并分片：{rows} 行" if rows else "⏭️  只有一个分片，无需合并")
+            return
+        rows, part = export_progress(args.dir, args.format, args.backend)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if part:
+        print(f"✅ 已导出 {rows} 行变化：{part}")
+    else:
+        print("⏭️  自上次导出以来没有变化")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 进度存储后端
+
+CurriculumManager 把每次状态变更描述为一组操作（ops），交给存储后端落盘：
+- ("move", state, words[, "front"])：把单词移动到某个状态（pending / assigned / learned），
+  带 "front" 时放到该状态的最前面（回收过期租约时使用）
+- ("set", key, value)：更新标量字段（如 current_book_chapter）
+- ("review", {word: state})：更新单词的复习调度状态（见 review_scheduler.py）
+
+可用后端：
+- json：整文件 JSON（默认，兼容旧版 progress_tracker_<category>.json）
+- journal：JSON 快照 + 追加写的变更日志（<进度文件>.journal），超过阈值后压缩回快照
+- shared：所有分类共用一个词表 + 分类位图文件（progress_shared.json，见 word_table.py）
+- sqlite：所有分类共用一个 SQLite 文件，按行更新、事务提交
+
+通过环境变量 CURRICULUM_BACKEND 或 CurriculumManager(backend=...) 选择后端。
+
+多进程安全：每个后端都提供 lock（跨进程文件锁）和 version()（数据版本号）。
+只读的调用方（如 progress_export.py）在锁内用 peek() 读取：分类还没有数据时返回 None，不会触发首次导入。
+CurriculumManager 在锁内先比较版本号，发现其他进程已修改就重新加载，再修改并提交，
+因此多个 step1 / 生成进程并发调用 get_next_batch 时，每个单词只会被分配一次。
+
+JSON 仍作为导入 / 导出格式：
+  python3 progress_store.py import reborn    # progress_tracker_reborn.json -> progress.db
+  python3 progress_store.py export reborn    # progress.db -> progress_tracker_reborn.json
+  python3 progress_store.py list             # 查看 progress.db 中的所有分类
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import argparse
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台（Windows）退化为无锁
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SQLITE_DB_FILE = os.path.join(BASE_DIR, "progress.db")
+DEFAULT_BACKEND = os.getenv("CURRICULUM_BACKEND", "json")
+# 变更日志超过该大小（字节）后压缩为快照
+JOURNAL_COMPACT_BYTES = int(os.getenv("CURRICULUM_JOURNAL_COMPACT_BYTES", str(256 * 1024)))
+
+# 单词状态 -> 进度字典中的列表字段
+WORD_STATES = ("pending", "assigned", "learned")
+STATE_FIELDS = {state: f"{state}_words" for state in WORD_STATES}
+REVIEW_FIELD = "review_state"
+
+Op = Tuple
+
+
+def write_json_atomic(path: str, data, indent: Optional[int] = 2):
+    """先写临时文件再原子替换，写到一半崩溃也不会留下损坏的进度文件"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def apply_ops(progress: Dict, ops: List[Op]) -> Dict:
+    """
+    把一组操作应用到进度字典上（用于日志回放）
+
+    单词状态先转成 小写 key -> 原始拼写 的有序字典，回放复杂度与操作涉及的单词数成正比
+    """
+    states = {
+        state: {w.strip().lower(): w.strip() for w in progress.get(field, []) if w.strip()}
+        for state, field in STATE_FIELDS.items()
+    }
+    for op in ops:
+        if op[0] == "move":
+            target = op[1]
+            if target not in states:
+                raise ValueError(f"未知的单词状态：{target}")
+            moved = {}
+            for w in op[2]:
+                key = w.strip().lower()
+                if not key:
+                    continue
+                for index in states.values():
+                    index.pop(key, None)
+                moved[key] = w.strip()
+            if len(op) > 3 and op[3] == "front":
+                states[target] = {**moved, **states[target]}
+            else:
+                states[target].update(moved)
+        elif op[0] == "set":
+            progress[op[1]] = op[2]
+        elif op[0] == "review":
+            progress.setdefault(REVIEW_FIELD, {}).update(op[1])
+        else:
+            raise ValueError(f"未知的进度操作：{op[0]}")
+    for state, field in STATE_FIELDS.items():
+        progress[field] = list(states[state].values())
+    progress["total_words"] = sum(len(index) for index in states.values())
+    return progress
+
+
+def file_version(path: str):
+    """文件版本号（原子替换会改变 inode，追加写会改变大小 / 修改时间）"""
+    try:
+        st = os.stat(path)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+
+class FileLock:
+    """
+    基于 flock 的跨进程排他锁（可重入）
+
+    用法：with store.lock: ...
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._depth = 0
+
+    def __enter__(self):
+        if self._depth == 0:
+            self._file = open(self.path, "a+")
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class JsonProgressStore:
+    """整文件 JSON 存储：每次提交都重写 progress_tracker_<category>.json"""
+
+    name = "json"
+
+    def __init__(self, progress_file: str):
+        self.progress_file = progress_file
+        self.lock = FileLock(f"{progress_file}.lock")
+
+    def exists(self) -> bool:
+        return os.path.exists(self.progress_file)
+
+    def version(self):
+        return file_version(self.progress_file)
+
+    def load(self) -> Dict:
+        with open(self.progress_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def peek(self) -> Optional[Dict]:
+        """只读加载：还没有进度时返回 None"""
+        return self.load() if self.exists() else None
+
+    def save(self, progress: Dict):
+        write_json_atomic(self.progress_file, progress)
+
+    def commit(self, ops: List[Op], snapshot: Callable[[], Dict]):
+        """JSON 无法按行更新，直接写入完整快照"""
+        self.save(snapshot())
+
+
+class JournalProgressStore(JsonProgressStore):
+    """
+    JSON 快照 + 追加写变更日志
+
+    - 每次提交只向 <进度文件>.journal 追加一行 {"ts": ..., "ops": [...]}，写入量与批次大小成正比
+    - 加载时读取快照并按顺序回放日志；最后一行若写到一半（崩溃），整条提交被忽略
+    - 日志超过 compact_bytes 后把当前状态原子写回快照并清空日志
+    """
+
+    name = "journal"
+
+    def __init__(self, progress_file: str, compact_bytes: int = JOURNAL_COMPACT_BYTES):
+        super().__init__(progress_file)
+        self.journal_file = f"{progress_file}.journal"
+        self.compact_bytes = compact_bytes
+
+    def exists(self) -> bool:
+        return os.path.exists(self.progress_file) or os.path.exists(self.journal_file)
+
+    def version(self):
+        return (file_version(self.progress_file), file_version(self.journal_file))
+
+    def load(self) -> Dict:
+        progress = super().load() if os.path.exists(self.progress_file) else {}
+        ops: List[Op] = []
+        if os.path.exists(self.journal_file):
+            good_offset = 0
+            with open(self.journal_file, "rb") as f:
+                for line_no, line in enumerate(f, 1):
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("记录不完整")
+                        record = json.loads(line.decode("utf-8")) if line.strip() else {}
+                    except ValueError:
+                        print(f"⚠️  警告：丢弃未写完整的日志记录（{self.journal_file} 第 {line_no} 行）")
+                        break
+                    ops.extend(tuple(op) for op in record.get("ops", []))
+                    good_offset += len(line)
+            # 截掉损坏的尾部，保证后续追加的记录从新行开始
+            if good_offset < os.path.getsize(self.journal_file):
+                with open(self.journal_file, "r+b") as f:
+                    f.truncate(good_offset)
+        return apply_ops(progress, ops) if ops else progress
+
+    def save(self, progress: Dict):
+        """写入完整快照并清空日志（快照已包含日志中的全部变更）"""
+        super().save(progress)
+        with open(self.journal_file, "w", encoding="utf-8"):
+            pass
+
+    def commit(self, ops: List[Op], snapshot: Callable[[], Dict]):
+        record = {"ts": time.time(), "ops": [list(op) for op in ops]}
+        with open(self.journal_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        if size >= self.compact_bytes:
+            self.compact(snapshot())
+
+    def compact(self, progress: Dict):
+        self.save(progress)
+        print(f"🗜️  进度日志已压缩为快照：{self.progress_file}")
+
+
+class SqliteProgressStore:
+    """
+    SQLite 存储：所有分类共用一个数据库文件，以进度文件名（不含扩展名）作为 scope
+
+    - words 表：每个单词一行（状态 + 顺序号），状态迁移只更新涉及的行
+    - meta 表：标量字段（章节计数等），JSON 编码
+    - reviews 表：每个已学习单词的复习调度状态
+    - scope 首次加载时，若同名 JSON 进度文件存在则自动导入
+    """
+
+    name = "sqlite"
+
+    def __init__(self, progress_file: str, db_file: Optional[str] = None):
+        self.progress_file = progress_file
+        self.db_file = db_file or os.path.join(os.path.dirname(progress_file) or ".", "progress.db")
+        self.scope = os.path.splitext(os.path.basename(progress_file))[0]
+        # timeout：step1 / step2 同时运行时等待对方事务结束，而不是直接报错
+        self.conn = sqlite3.connect(self.db_file, timeout=30)
+        self.lock = FileLock(f"{self.db_file}.lock")
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.conn:
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS words (
+                    scope TEXT NOT NULL,
+                    word TEXT NOT NULL,
+                    spelling TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    PRIMARY KEY (scope, word)
+                )"""
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_words_state ON words (scope, state, seq)"
+            )
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS reviews (
+                    scope TEXT NOT NULL,
+                    word TEXT NOT NULL,
+                    interval REAL NOT NULL,
+                    ease REAL NOT NULL,
+                    due REAL NOT NULL,
+                    reps INTEGER NOT NULL,
+                    learned REAL,
+                    PRIMARY KEY (scope, word)
+                )"""
+            )
+            # 旧数据库补齐 learned 列（学会时的章节号）
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(reviews)")]
+            if "learned" not in columns:
+                self.conn.execute("ALTER TABLE reviews ADD COLUMN learned REAL")
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS meta (
+                    scope TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (scope, key)
+                )"""
+            )
+
+    def _has_scope(self) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM meta WHERE scope = ? LIMIT 1", (self.scope,)
+        ).fetchone()
+        return row is not None
+
+    def exists(self) -> bool:
+        return self._has_scope() or os.path.exists(self.progress_file)
+
+    def version(self):
+        """data_version 只在其他连接提交后变化"""
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def load(self) -> Dict:
+        progress = self.peek()
+        if progress is None:
+            # 首次使用：从 JSON 进度文件导入
+            progress = JsonProgressStore(self.progress_file).load()
+            self.save(progress)
+            print(f"📥 已将 {self.progress_file} 导入 {self.db_file}（scope={self.scope}）")
+        return progress
+
+    def peek(self) -> Optional[Dict]:
+        """只读加载：数据库中还没有这个 scope 时返回 None（不从 JSON 导入）"""
+        if not self._has_scope():
+            return None
+
+        progress: Dict = {}
+        for key, value in self.conn.execute(
+            "SELECT key, value FROM meta WHERE scope = ?", (self.scope,)
+        ):
+            progress[key] = json.loads(value)
+
+        for state, field in STATE_FIELDS.items():
+            progress[field] = [
+                row[0]
+                for row in self.conn.execute(
+                    "SELECT spelling FROM words WHERE scope = ? AND state = ? ORDER BY seq",
+                    (self.scope, state),
+                )
+            ]
+        progress["total_words"] = sum(len(progress[f]) for f in STATE_FIELDS.values())
+        progress[REVIEW_FIELD] = {
+            row[0]: list(row[1:]) if row[5] is not None else list(row[1:5])
+            for row in self.conn.execute(
+                "SELECT word, interval, ease, due, reps, learned FROM reviews WHERE scope = ?", (self.scope,)
+            )
+        }
+        return progress
+
+    def save(self, progress: Dict):
+        """整体写入（用于初始化与 JSON 导入）"""
+        with self.conn:
+            self.conn.execute("DELETE FROM words WHERE scope = ?", (self.scope,))
+            self.conn.execute("DELETE FROM meta WHERE scope = ?", (self.scope,))
+            self.conn.execute("DELETE FROM reviews WHERE scope = ?", (self.scope,))
+            for state, field in STATE_FIELDS.items():
+                self._move(state, progress.get(field, []))
+            self._review(progress.get(REVIEW_FIELD, {}))
+            for key, value in progress.items():
+                if key in STATE_FIELDS.values() or key in ("total_words", REVIEW_FIELD):
+                    continue
+                self._set(key, value)
+
+    def commit(self, ops: List[Op], snapshot: Callable[[], Dict]):
+        """在一个事务中按行应用所有操作"""
+        with self.conn:
+            for op in ops:
+                if op[0] == "move":
+                    self._move(op[1], op[2], front=len(op) > 3 and op[3] == "front")
+                elif op[0] == "set":
+                    self._set(op[1], op[2])
+                elif op[0] == "review":
+                    self._review(op[1])
+                else:
+                    raise ValueError(f"未知的进度操作：{op[0]}")
+
+    def _move(self, state: str, words: List[str], front: bool = False):
+        if state not in STATE_FIELDS:
+            raise ValueError(f"未知的单词状态：{state}")
+        if front:
+            row = self.conn.execute(
+                "SELECT MIN(seq) FROM words WHERE scope = ? AND state = ?", (self.scope, state)
+            ).fetchone()
+            next_seq = (row[0] if row[0] is not None else 0) - len(words)
+        else:
+            row = self.conn.execute(
+                "SELECT MAX(seq) FROM words WHERE scope = ? AND state = ?", (self.scope, state)
+            ).fetchone()
+            next_seq = (row[0] + 1) if row[0] is not None else 0
+        rows = []
+        for w in words:
+            spelling = w.strip()
+            if not spelling:
+                continue
+            rows.append((self.scope, spelling.lower(), spelling, state, next_seq))
+            next_seq += 1
+        self.conn.executemany(
+            """INSERT INTO words (scope, word, spelling, state, seq) VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (scope, word) DO UPDATE SET
+                   spelling = excluded.spelling, state = excluded.state, seq = excluded.seq""",
+            rows,
+        )
+
+    def _review(self, states: Dict[str, List]):
+        self.conn.executemany(
+            """INSERT INTO reviews (scope, word, interval, ease, due, reps, learned) VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (scope, word) DO UPDATE SET
+                   interval = excluded.interval, ease = excluded.ease,
+                   due = excluded.due, reps = excluded.reps, learned = excluded.learned""",
+            [(self.scope, word, *state[:4], state[4] if len(state) > 4 else None) for word, state in states.items()],
+        )
+
+    def _set(self, key: str, value):
+        self.conn.execute(
+            """INSERT INTO meta (scope, key, value) VALUES (?, ?, ?)
+               ON CONFLICT (scope, key) DO UPDATE SET value = excluded.value""",
+            (self.scope, key, json.dumps(value, ensure_ascii=False)),
+        )
+
+    def export_json(self, path: Optional[str] = None) -> str:
+        """导出为旧版 JSON 进度文件格式"""
+        path = path or self.progress_file
+        JsonProgressStore(path).save(self.load())
+        return path
+
+    def list_scopes(self) -> List[str]:
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT scope FROM meta ORDER BY scope")]
+
+
+def create_store(progress_file: str, backend: Optional[str] = None):
+    """
+    根据后端名称创建存储实例
+
+    Args:
+        progress_file: 进度文件路径（sqlite 后端用它推导 scope 与数据库位置）
+        backend: "json" / "journal" / "sqlite" / "shared"，默认读取环境变量 CURRICULUM_BACKEND
+    """
+    backend = (backend or DEFAULT_BACKEND).lower()
+    if backend == "json":
+        return JsonProgressStore(progress_file)
+    if backend == "journal":
+        return JournalProgressStore(progress_file)
+    if backend == "sqlite":
+        return SqliteProgressStore(progress_file)
+    if backend == "shared":
+        from word_table import SharedProgressStore
+        return SharedProgressStore(progress_file)
+    raise ValueError(f"未知的进度存储后端：{backend}（可选：json, journal, sqlite, shared）")
+
+
+def main():
+    from curriculum_manager import get_progress_file_for_category
+
+    parser = argparse.ArgumentParser(description="进度存储：JSON <-> SQLite 导入导出")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (
+        ("import", "把 JSON 进度文件导入 SQLite（覆盖该分类已有数据）"),
+        ("export", "把 SQLite 中的进度导出为 JSON 进度文件"),
+    ):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("category", nargs="?", default="", help="分类ID（留空表示全局进度文件）")
+        p.add_argument("--db", type=str, default=SQLITE_DB_FILE, help="SQLite 文件路径")
+    p = sub.add_parser("list", help="列出 SQLite 中的所有分类")
+    p.add_argument("--db", type=str, default=SQLITE_DB_FILE, help="SQLite 文件路径")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        store = SqliteProgressStore(os.path.join(BASE_DIR, "progress_tracker.json"), args.db)
+        for scope in store.list_scopes():
+            print(scope)
+        return
+
+    progress_file = get_progress_file_for_category(args.category)
+    store = SqliteProgressStore(progress_file, args.db)
+    try:
+        if args.command == "import":
+            store.save(JsonProgressStore(progress_file).load())
+            print(f"✅ 已导入：{progress_file} -> {store.db_file}（scope={store.scope}）")
+        else:
+            path = store.export_json()
+            print(f"✅ 已导出：{store.db_file}（scope={store.scope}） -> {path}")
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"❌ 错误：{e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
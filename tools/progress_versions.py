@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 进度版本（增量快照）
+
+每个版本只保存相对父版本的差异：
+  {"id", "parent", "time", "label",
+   "words":   {单词: [之前状态, 之后状态]},      # pending / assigned / learned，null 表示之前不存在
+   "fields":  {字段: [之前的值, 之后的值]},      # current_book_chapter、plan_cursor 等
+   "leases":  {批次 ID: [之前的租约, 之后的租约]},
+   "reviews": {单词: [之前的复习状态, 之后的复习状态]}}
+
+版本记录追加写入 <进度文件>.versions（每行一条 JSON），切换版本时追加一行 {"head": 版本号}。
+版本 0 是开始记录之前的状态。回滚 / 前进时沿版本树上的路径逐个应用差异，复杂度与差异大小成正比。
+
+step2 每次入库自动生成一个版本；入库了有问题的章节时直接回滚即可，不需要手工编辑进度文件。
+
+用法：
+  cd tools
+  python3 progress_versions.py list [--category reborn]
+  python3 progress_versions.py diff 3 [5] [--category reborn]    # 版本 3 -> 5（默认当前版本）的差异
+  python3 progress_versions.py restore 3 [--category reborn]
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+DELTA_PARTS = ("words", "fields", "leases", "reviews")
+ROOT_VERSION = {"id": 0, "parent": None, "time": "", "label": "开始记录前", **{part: {} for part in DELTA_PARTS}}
+
+
+def empty_delta() -> Dict:
+    return {part: {} for part in DELTA_PARTS}
+
+
+def invert_delta(delta: Dict) -> Dict:
+    """反向差异（之前 <-> 之后）"""
+    return {
+        part: {key: [values[1], values[0]] for key, values in delta.get(part, {}).items()}
+        for part in DELTA_PARTS
+    }
+
+
+def compose_deltas(deltas: List[Dict]) -> Dict:
+    """把按顺序发生的多个差异合并为一个（每个 key 取最早的之前值和最晚的之后值，抵消掉的 key 删除）"""
+    result = empty_delta()
+    for delta in deltas:
+        for part in DELTA_PARTS:
+            merged = result[part]
+            for key, (before, after) in delta.get(part, {}).items():
+                merged[key] = [merged[key][0] if key in merged else before, after]
+    for part in DELTA_PARTS:
+        result[part] = {k: v for k, v in result[part].items() if v[0] != v[1]}
+    return result
+
+
+def delta_size(delta: Dict) -> int:
+    return sum(len(delta.get(part, {})) for part in DELTA_PARTS)
+
+
+class VersionLog:
+    """某个进度文件的版本树（只追加写）"""
+
+    def __init__(self, progress_file: str):
+        self.path = f"{progress_file}.versions"
+        self.versions: Dict[int, Dict] = {0: ROOT_VERSION}
+        self.head = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # 写到一半的最后一行
+                    if "id" in record:
+                        self.versions[record["id"]] = record
+                        self.head = record["id"]
+                    elif "head" in record:
+                        self.head = record["head"]
+
+    def _append(self, record: Dict):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, delta: Dict, label: str) -> int:
+        """在当前版本下追加一个新版本，返回版本号"""
+        version = {
+            "id": max(self.versions) + 1,
+            "parent": self.head,
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "label": label,
+            **delta,
+        }
+        self._append(version)
+        self.versions[version["id"]] = version
+        self.head = version["id"]
+        return version["id"]
+
+    def set_head(self, version_id: int):
+        self._append({"head": version_id, "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+        self.head = version_id
+
+    def lineage(self, version_id: int) -> List[int]:
+        """从 version_id 到版本 0 的路径"""
+        if version_id not in self.versions:
+            raise KeyError(f"版本 {version_id} 不存在")
+        path = [version_id]
+        while self.versions[path[-1]]["parent"] is not None:
+            path.append(self.versions[path[-1]]["parent"])
+        return path
+
+    def path_between(self, src: int, dst: int) -> Tuple[List[int], List[int]]:
+        """
+        从 src 切换到 dst 需要 撤销的版本（由新到旧）和 重做的版本（由旧到新）
+        """
+        src_path = self.lineage(src)
+        dst_path = self.lineage(dst)
+        common = set(src_path) & set(dst_path)
+        undo = [v for v in src_path if v not in common]
+        redo = [v for v in reversed(dst_path) if v not in common]
+        return undo, redo
+
+    def delta_between(self, src: int, dst: int) -> Dict:
+        undo, redo = self.path_between(src, dst)
+        return compose_deltas(
+            [invert_delta(self.versions[v]) for v in undo] + [self.versions[v] for v in redo]
+        )
+
+
+def describe_delta(delta: Dict) -> str:
+    transitions = Counter(f"{b or '无'}→{a or '无'}" for b, a in delta.get("words", {}).values())
+    parts = [f"{t} {n}" for t, n in transitions.most_common()]
+    if delta.get("fields"):
+        parts.append("字段 " + ",".join(delta["fields"]))
+    if delta.get("leases"):
+        parts.append(f"租约 {len(delta['leases'])}")
+    if delta.get("reviews"):
+        parts.append(f"复习状态 {len(delta['reviews'])}")
+    return "；".join(parts) or "无变化"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="进度版本：列出 / 对比 / 回滚")
+    parser.add_argument("command", choices=["list", "diff", "restore"])
+    parser.add_argument("versions", nargs="*", type=int, help="diff：起始版本 [目标版本]；restore：目标版本")
+    parser.add_argument("--category", type=str, default=None, help="分类 ID（默认全局进度文件）")
+    args = parser.parse_args()
+
+    # 延迟导入，避免 curriculum_manager <-> progress_versions 循环导入
+    from curriculum_manager import CurriculumManager, get_progress_file_for_category
+
+    progress_file = get_progress_file_for_category(args.category)
+    log = VersionLog(progress_file)
+
+    if args.command == "list":
+        if len(log.versions) == 1:
+            print(f"⚠️  {progress_file} 还没有任何版本（step2 入库时自动生成）")
+            return
+        current = set(log.lineage(log.head))
+        for vid in sorted(log.versions):
+            v = log.versions[vid]
+            marker = "👉" if vid == log.head else ("  " if vid in current else "↪ ")
+            parent = "" if v["parent"] is None else f"(父 {v['parent']})"
+            print(f"{marker} v{vid:<4}{parent:<8} {v['time']:<20} {v['label']}")
+            if vid:
+                print(f"        {describe_delta(v)}")
+    elif args.command == "diff":
+        if not args.versions:
+            parser.error("diff 需要至少一个版本号")
+        src = args.versions[0]
+        dst = args.versions[1] if len(args.versions) > 1 else log.head
+        delta = log.delta_between(src, dst)
+        print(f"v{src} -> v{dst}：{describe_delta(delta)}")
+        for word, (before, after) in sorted(delta["words"].items()):
+            print(f"   {word:<24} {before or '无'} -> {after or '无'}")
+        for key, (before, after) in delta["fields"].items():
+            print(f"   [{key}] {json.dumps(before, ensure_ascii=False)[:60]} -> {json.dumps(after, ensure_ascii=False)[:60]}")
+    elif args.command == "restore":
+        if len(args.versions) != 1:
+            parser.error("restore 需要一个版本号")
+        manager = CurriculumManager(progress_file)
+        try:
+            manager.restore_version(args.versions[0])
+        except KeyError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        manager.print_statistics()
+
+
+if __name__ == "__main__":
+    main()
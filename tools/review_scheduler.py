@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 复习调度器（间隔重复）
+
+按“章节”作为时间单位，为每个已学习单词记录复习状态：
+  [interval, ease, due, reps, learned]
+  - interval: 当前复习间隔（章节数）
+  - ease: 难度系数（SM-2 使用；Leitner 固定为 1.0）
+  - due: 下次应复习的章节号
+  - reps: 已复习次数
+  - learned: 学会时的章节号（旧进度中的状态没有这一项）
+
+调度器用最小堆（按 due 排序）保存所有单词，取 k 个复习词的复杂度为 O(k log n)。
+状态通过进度存储的 ("review", {word: state}) 操作持久化。
+"""
+
+import heapq
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+DEFAULT_POLICY = os.getenv("CURRICULUM_REVIEW_POLICY", "sm2")
+
+ReviewState = List[float]
+
+
+class SM2Policy:
+    """SuperMemo-2：间隔 1 -> 6 -> interval × ease，ease 随回忆质量调整"""
+
+    name = "sm2"
+    initial_ease = 2.5
+    min_ease = 1.3
+
+    def initial(self, chapter: int) -> ReviewState:
+        return [1, self.initial_ease, chapter + 1, 0, chapter]
+
+    def review(self, state: ReviewState, chapter: int, quality: int = 4) -> ReviewState:
+        interval, ease, _, reps = state[:4]
+        if quality < 3:
+            # 回忆失败：从头开始
+            reps = 0
+            interval = 1
+        else:
+            reps += 1
+            if reps == 1:
+                interval = 1
+            elif reps == 2:
+                interval = 6
+            else:
+                interval = max(1, round(interval * ease))
+        ease = max(self.min_ease, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        return [interval, round(ease, 4), chapter + interval, reps, *state[4:]]
+
+
+class LeitnerPolicy:
+    """Leitner 盒子：每次复习升一个盒子，盒子对应固定间隔；回忆失败回到第一个盒子"""
+
+    name = "leitner"
+    intervals = (1, 2, 4, 8, 16, 32)
+
+    def initial(self, chapter: int) -> ReviewState:
+        return [self.intervals[0], 1.0, chapter + self.intervals[0], 0, chapter]
+
+    def review(self, state: ReviewState, chapter: int, quality: int = 4) -> ReviewState:
+        reps = state[3] + 1 if quality >= 3 else 0
+        interval = self.intervals[min(reps, len(self.intervals) - 1)]
+        return [interval, 1.0, chapter + interval, reps, *state[4:]]
+
+
+REVIEW_POLICIES = {
+    SM2Policy.name: SM2Policy,
+    LeitnerPolicy.name: LeitnerPolicy,
+}
+
+
+def create_policy(name: Optional[str] = None):
+    name = (name or DEFAULT_POLICY).lower()
+    if name not in REVIEW_POLICIES:
+        raise ValueError(f"未知的复习策略：{name}（可选：{', '.join(REVIEW_POLICIES)}）")
+    return REVIEW_POLICIES[name]()
+
+
+class ReviewScheduler:
+    """
+    复习调度器
+
+    - states: 单词 -> 复习状态（持久化数据）
+    - _heap: (due, seq, word) 最小堆；状态更新时压入新条目，旧条目在弹出时按 due 校验后丢弃
+    """
+
+    def __init__(self, states: Optional[Dict[str, ReviewState]] = None, policy: Optional[str] = None):
+        self.policy = create_policy(policy)
+        self.states: Dict[str, ReviewState] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = 0
+        for word, state in (states or {}).items():
+            self.states[word] = list(state)
+            self._push(word)
+        heapq.heapify(self._heap)
+
+    def _push(self, word: str):
+        self._seq += 1
+        heapq.heappush(self._heap, (self.states[word][2], self._seq, word))
+        # 过期条目过多时重建堆，避免无限增长
+        if len(self._heap) > 2 * len(self.states) + 64:
+            self._heap = [(state[2], i, w) for i, (w, state) in enumerate(self.states.items())]
+            heapq.heapify(self._heap)
+            self._seq = len(self._heap)
+
+    def __contains__(self, word: object) -> bool:
+        return word in self.states
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def add(self, words: Iterable[str], chapter: int) -> Dict[str, ReviewState]:
+        """新学会的单词进入调度（已在调度中的单词保持原状态），返回新增的状态"""
+        changed: Dict[str, ReviewState] = {}
+        for word in words:
+            if word in self.states:
+                continue
+            self.states[word] = self.policy.initial(chapter)
+            self._push(word)
+            changed[word] = self.states[word]
+        return changed
+
+    def set_state(self, word: str, state: ReviewState):
+        """直接设置复习状态（回滚进度版本时使用）"""
+        self.states[word] = list(state)
+        self._push(word)
+
+    def discard(self, word: str):
+        """移出调度（堆中的旧条目在弹出时自动跳过）"""
+        self.states.pop(word, None)
+
+    def next_batch(
+        self,
+        k: int,
+        chapter: Optional[int] = None,
+        priority: Optional[Callable[[str], float]] = None,
+        skip: Set[str] = frozenset(),
+    ) -> List[str]:
+        """
+        取出 due 最小的 k 个单词（不改变状态），跳过 skip 中的单词
+
+        给定 chapter 与 priority 时，先在已到期（due <= chapter）的单词中按 (priority, due) 从小到大选，
+        不足 k 个再按 due 顺序补齐。只弹出已到期的条目，复杂度 O((到期数 + k) · log n)
+        """
+        if chapter is None or priority is None:
+            return self._earliest(k, skip)
+        due_entries: List[Tuple[float, int, str]] = []
+        seen = set()
+        while self._heap and self._heap[0][0] <= chapter:
+            entry = heapq.heappop(self._heap)
+            due, _, word = entry
+            state = self.states.get(word)
+            if state is None or state[2] != due or word in seen:
+                continue
+            seen.add(word)
+            due_entries.append(entry)
+        for entry in due_entries:
+            heapq.heappush(self._heap, entry)
+        candidates = [e for e in due_entries if e[2] not in skip]
+        chosen = [w for _, _, w in heapq.nsmallest(k, candidates, key=lambda e: (priority(e[2]), e[0], e[1]))]
+        if len(chosen) < k:
+            chosen += [w for w in self._earliest(k, skip) if w not in seen][: k - len(chosen)]
+        return chosen
+
+    def _earliest(self, k: int, skip: Set[str] = frozenset()) -> List[str]:
+        batch: List[Tuple[float, int, str]] = []
+        skipped: List[Tuple[float, int, str]] = []
+        seen = set()
+        while self._heap and len(batch) < k:
+            entry = heapq.heappop(self._heap)
+            due, _, word = entry
+            state = self.states.get(word)
+            # 过期条目：单词已移除、状态已更新或已在本批次中
+            if state is None or state[2] != due or word in seen:
+                continue
+            seen.add(word)
+            (skipped if word in skip else batch).append(entry)
+        for entry in batch + skipped:
+            heapq.heappush(self._heap, entry)
+        return [word for _, _, word in batch]
+
+    def record_review(
+        self, words: Iterable[str], chapter: int, quality: int = 4
+    ) -> Dict[str, ReviewState]:
+        """记录一次复习（单词出现在第 chapter 章），返回更新后的状态"""
+        changed: Dict[str, ReviewState] = {}
+        for word in words:
+            state = self.states.get(word)
+            if state is None:
+                continue
+            self.states[word] = self.policy.review(state, chapter, quality)
+            self._push(word)
+            changed[word] = self.states[word]
+        return changed
+
+    def due_count(self, chapter: int) -> int:
+        """已到期（due <= chapter）的单词数"""
+        return sum(1 for state in self.states.values() if state[2] <= chapter)
+
+    def to_dict(self) -> Dict[str, ReviewState]:
+        return self.states
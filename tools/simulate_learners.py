@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 学习者模拟：比较 batch_size / review_size / 复习策略
+
+step1 每章 60 新词 + 20 复习词、novel_generator 每章 20 + 5，这两组数字都没有依据。
+本脚本用遗忘曲线模型模拟成千上万个学习者读完整套课程，输出每种配置的预期记忆保持率。
+
+1. 课程回放：对每种配置，用真实的 CurriculumManager（只在内存中修改状态）按 step1 / step2 的流程逐章执行
+   get_next_batch -> get_review_batch -> mark_as_learned -> increment_chapter，得到每章的新词和复习词
+   （选词逻辑与线上完全一致，不是重新实现）
+2. 遗忘曲线：学习者 × 单词矩阵用 NumPy 向量化计算
+   - 单词在第一次出现时学会，记忆稳定度 S0 = 基础稳定度 × 学习者能力 / 单词难度（均为对数正态分布）
+   - 再次出现时回忆概率 p = exp(-间隔天数 / S)：回忆成功则 S *= 1 + growth × (1 - p)（越接近遗忘时复习收益越大），
+     回忆失败则重新学习（S 回到 S0）
+   - 保持率 = 每个单词学会 horizon 天后的回忆概率的平均值（测量点相对于学会的时间固定，
+     不随课程总长度变化，每章新词多、课程短的配置不会因为“课程结束得早”而占便宜）
+   模型参数只是经验值，绝对数值仅供参考，用于比较不同配置的相对高低
+
+用法：
+  cd tools
+  pip install numpy
+  python3 simulate_learners.py                                   # 4000 词 × 2000 个学习者，默认配置网格
+  python3 simulate_learners.py --batch-sizes 20,40,60 --review-sizes 5,10,20 --policies sm2,leitner
+  python3 simulate_learners.py --learners 5000 --days-per-chapter 2 --horizon 30
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from typing import List, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from curriculum_memory import InMemoryCurriculumManager
+from curriculum_manager import normalize_word
+from review_scheduler import REVIEW_POLICIES
+
+# 每章的 (新词 ID 列表, 复习词 ID 列表)
+Schedule = List[Tuple[List[int], List[int]]]
+
+
+def replay_curriculum(words: List[str], batch_size: int, review_size: int, policy: str) -> Schedule:
+    """用真实的选词逻辑逐章回放课程，返回每章的新词和复习词（单词 ID 为 words 中的下标）"""
+    ids = {normalize_word(w): i for i, w in enumerate(words)}
+    schedule: Schedule = []
+    with tempfile.TemporaryDirectory() as tmp:
+        progress_file = os.path.join(tmp, "progress_tracker_sim.json")
+        with open(progress_file, "w", encoding="utf-8") as f:
+            json.dump({"pending_words": words, "assigned_words": [], "learned_words": [], "current_book_chapter": 1}, f)
+        missing = os.path.join(tmp, "missing.txt")
+        with redirect_stdout(io.StringIO()):
+            manager = InMemoryCurriculumManager(
+                progress_file,
+                backend="json",
+                review_policy=policy,
+                rank_file=missing,
+                band_file=missing,
+                exposure_file=missing,
+            )
+            while len(manager.pending):
+                new_words = manager.get_next_batch(batch_size)
+                review_words = manager.get_review_batch(review_size) if len(manager.scheduler) else []
+                manager.mark_as_learned(new_words)
+                manager.increment_chapter()
+                schedule.append(([ids[normalize_word(w)] for w in new_words], [ids[normalize_word(w)] for w in review_words]))
+    return schedule
+
+
+def simulate_retention(
+    schedule: Schedule,
+    word_count: int,
+    learners: int,
+    days_per_chapter: float = 1.0,
+    base_stability: float = 5.0,
+    growth: float = 3.0,
+    spread: float = 0.4,
+    horizon: float = 7.0,
+    seed: int = 0,
+) -> "np.ndarray":
+    """
+    按课程表模拟 learners 个学习者，返回每个学习者的平均保持率（每个单词在学会 horizon 天后测量）
+
+    所有学习者共用同一份课程表（课程不依赖学习者），每章只更新出现的单词列。
+    第 c 章学会的单词在第 c + ceil(horizon / days_per_chapter) 章的复习之前测量（此时的状态只包含测量时间点之前的复习），
+    测量点在课程结束之后的单词用课程结束时的状态测量
+    """
+    rng = np.random.default_rng(seed)
+    ability = rng.lognormal(0.0, spread, size=(learners, 1)).astype(np.float32)
+    difficulty = rng.lognormal(0.0, spread, size=(1, word_count)).astype(np.float32)
+    initial = base_stability * ability / difficulty  # S0：学习者 × 单词
+
+    stability = initial.copy()
+    last_seen = np.zeros((learners, word_count), dtype=np.float32)
+    retained = np.zeros(learners, dtype=np.float64)
+    measured = 0
+    offset = max(1, math.ceil(horizon / days_per_chapter))
+
+    def measure(learned_chapter: int):
+        nonlocal measured
+        ids = schedule[learned_chapter][0]
+        if not ids:
+            return
+        cols = np.asarray(ids)
+        at = learned_chapter * days_per_chapter + horizon
+        retained[:] += np.exp(-(at - last_seen[:, cols]) / stability[:, cols]).sum(axis=1)
+        measured += len(ids)
+
+    for chapter, (new_ids, review_ids) in enumerate(schedule):
+        now = chapter * days_per_chapter
+        if chapter >= offset:
+            measure(chapter - offset)
+        if review_ids:
+            cols = np.asarray(review_ids)
+            s = stability[:, cols]
+            recall = np.exp(-(now - last_seen[:, cols]) / s)
+            recalled = rng.random(recall.shape, dtype=np.float32) < recall
+            stability[:, cols] = np.where(recalled, s * (1.0 + growth * (1.0 - recall)), initial[:, cols])
+            last_seen[:, cols] = now
+        if new_ids:
+            last_seen[:, np.asarray(new_ids)] = now
+
+    for learned_chapter in range(max(0, len(schedule) - offset), len(schedule)):
+        measure(learned_chapter)
+    return retained / max(measured, 1)
+
+
+def parse_ints(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="学习者模拟：比较每章新词数 / 复习词数 / 复习策略")
+    parser.add_argument("--words", type=int, default=4000, help="课程单词数（默认 4000）")
+    parser.add_argument("--learners", type=int, default=2000, help="模拟学习者数（默认 2000）")
+    parser.add_argument("--batch-sizes", type=str, default="20,40,60,80", help="每章新词数，逗号分隔")
+    parser.add_argument("--review-sizes", type=str, default="5,10,20", help="每章复习词数，逗号分隔")
+    parser.add_argument("--policies", type=str, default=",".join(REVIEW_POLICIES), help="复习策略，逗号分隔")
+    parser.add_argument("--days-per-chapter", type=float, default=1.0, help="读一章间隔的天数（默认 1）")
+    parser.add_argument("--horizon", type=float, default=7.0, help="单词学会后多少天测量保持率（默认 7）")
+    parser.add_argument("--base-stability", type=float, default=5.0, help="第一次学会时的平均记忆稳定度（天，默认 5）")
+    parser.add_argument("--growth", type=float, default=3.0, help="复习成功后稳定度增长系数（默认 3）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if np is None:
+        print("❌ 学习者模拟需要 numpy：pip install numpy")
+        sys.exit(1)
+
+    words = [f"simword{i:05d}" for i in range(args.words)]
+    configs = [
+        (batch, review, policy)
+        for policy in args.policies.split(",")
+        for batch in parse_ints(args.batch_sizes)
+        for review in parse_ints(args.review_sizes)
+    ]
+    print(f"🧪 学习者模拟：{args.words} 词 × {args.learners} 个学习者，{len(configs)} 种配置")
+    print(f"   每章 {args.days_per_chapter:g} 天，每个单词学会 {args.horizon:g} 天后测量保持率")
+    print("=" * 84)
+    print(f"{'策略':<10}{'新词':>6}{'复习':>6}{'章数':>6}{'天数':>8}{'平均保持率':>12}{'P10':>8}{'P90':>8}{'用时(s)':>10}")
+
+    results = []
+    for batch, review, policy in configs:
+        started = time.perf_counter()
+        schedule = replay_curriculum(words, batch, review, policy)
+        retention = simulate_retention(
+            schedule,
+            len(words),
+            args.learners,
+            days_per_chapter=args.days_per_chapter,
+            base_stability=args.base_stability,
+            growth=args.growth,
+            horizon=args.horizon,
+            seed=args.seed,
+        )
+        elapsed = time.perf_counter() - started
+        p10, p90 = np.percentile(retention, [10, 90])
+        days = len(schedule) * args.days_per_chapter
+        results.append((retention.mean(), policy, batch, review, len(schedule), days))
+        print(
+            f"{policy:<10}{batch:>6}{review:>6}{len(schedule):>6}{days:>8g}{retention.mean():>12.1%}{p10:>8.1%}{p90:>8.1%}"
+            f"{elapsed:>10.2f}"
+        )
+
+    best = max(results)
+    print("=" * 84)
+    print(f"🏆 保持率最高：{best[1]} 每章 {best[2]} 新词 + {best[3]} 复习词（{best[4]} 章 / {best[5]:g} 天，{best[0]:.1%}）")
+
+
+if __name__ == "__main__":
+    main()
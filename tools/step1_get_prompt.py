@@ -14,6 +14,8 @@ from typing import Dict, List
 
 # 导入课程管理器
 from curriculum_manager import CurriculumManager
+from curriculum_plan import load_or_build_plan
+from word_rank import parse_mix
 
 # ==================== 路径配置 ====================
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -22,8 +24,13 @@ PROJECT_ROOT = os.path.dirname(BASE_DIR)
 STORY_CONFIG_FILE = os.path.join(BASE_DIR, "story_config.json")
 PROGRESS_FILE = os.path.join(BASE_DIR, "progress_tracker.json")
 PROMPT_OUTPUT_FILE = os.path.join(BASE_DIR, "current_prompt.txt")
+BATCH_OUTPUT_FILE = os.path.join(BASE_DIR, "current_batch.json")
 MISSING_POOL_FILE = os.path.join(BASE_DIR, "missing_ielts_words.txt")
 
+# 每篇词量（目标：覆盖4000词/50篇 = 80词/篇）
+BATCH_SIZE = 60  # 新词
+REVIEW_SIZE = 20  # 复习词
+
 # System Prompt（用于 ChatGPT）
 SYSTEM_PROMPT = """你是晋江文学城金牌写手，同时也是一名深谙"二语习得理论"的雅思名师。
 
@@ -111,13 +118,13 @@ def load_story_config() -> Dict:
         return json.load(f)
 
 
-def build_full_prompt(
+def build_story_prompt(
     target_vocab: List[str],
     review_vocab: List[str],
     story_context: Dict
 ) -> str:
     """
-    构建完整的 Prompt（包含 System Prompt 和 User Prompt）
+    构建 User Prompt（book_pipeline.py 直接调用接口时与 SYSTEM_PROMPT 一起发送）
     
     Args:
         target_vocab: 核心词表
@@ -125,21 +132,10 @@ def build_full_prompt(
         story_context: 故事上下文
     
     Returns:
-        完整的 Prompt 文本
+        User Prompt 文本
     """
     prompt_parts = []
     
-    # System Prompt
-    prompt_parts.append("=== System Prompt ===")
-    prompt_parts.append(SYSTEM_PROMPT)
-    prompt_parts.append("")
-    prompt_parts.append("=" * 60)
-    prompt_parts.append("")
-    
-    # User Prompt
-    prompt_parts.append("=== User Prompt ===")
-    prompt_parts.append("")
-    
     # 1. 故事上下文
     prompt_parts.append("## 故事背景")
     if story_context.get("genre"):
@@ -179,6 +175,39 @@ def build_full_prompt(
     return "\n".join(prompt_parts)
 
 
+def build_full_prompt(
+    target_vocab: List[str],
+    review_vocab: List[str],
+    story_context: Dict
+) -> str:
+    """
+    构建完整的 Prompt（包含 System Prompt 和 User Prompt）
+
+    Args:
+        target_vocab: 核心词表
+        review_vocab: 复习词表
+        story_context: 故事上下文
+
+    Returns:
+        完整的 Prompt 文本
+    """
+    prompt_parts = []
+
+    # System Prompt
+    prompt_parts.append("=== System Prompt ===")
+    prompt_parts.append(SYSTEM_PROMPT)
+    prompt_parts.append("")
+    prompt_parts.append("=" * 60)
+    prompt_parts.append("")
+
+    # User Prompt
+    prompt_parts.append("=== User Prompt ===")
+    prompt_parts.append("")
+    prompt_parts.append(build_story_prompt(target_vocab, review_vocab, story_context))
+
+    return "\n".join(prompt_parts)
+
+
 def main():
     """主函数"""
     print("=" * 60)
@@ -199,6 +228,23 @@ def main():
             default=MISSING_POOL_FILE,
             help="补漏词池文件路径（默认 tools/missing_ielts_words.txt）",
         )
+        parser.add_argument(
+            "--lease-hours",
+            type=float,
+            default=None,
+            help="本批单词的分配租约时长（小时），超时未入库会被回收（默认 24 小时）",
+        )
+        parser.add_argument(
+            "--mix",
+            type=str,
+            default=None,
+            help="按难度分级比例选新词，如 6:0.3,7:0.5,8:0.2（需要 tools/word_bands.txt）",
+        )
+        parser.add_argument(
+            "--plan",
+            action="store_true",
+            help="按预先计算的课程规划取批次（规划文件不存在时自动生成，词源新增时增量更新）",
+        )
         args = parser.parse_args()
 
         # 1. 初始化课程管理器
@@ -207,29 +253,52 @@ def main():
         manager.print_statistics()
         
         # 2. 获取单词批次
-        # 目标：覆盖4000词/50篇 = 80词/篇
-        # 配置：60新词 + 20复习词 = 80词/篇
-        batch_size = 60  # 新词
-        review_size = 20  # 复习词
+        batch_size = BATCH_SIZE
+        review_size = REVIEW_SIZE
         
         print(f"\n📖 获取新单词批次（{batch_size}个）...")
+        lease_seconds = args.lease_hours * 3600 if args.lease_hours is not None else None
         prefer_pool: List[str] = []
-        if args.prefer_missing and os.path.exists(args.missing_file):
+        if args.plan:
+            if args.prefer_missing:
+                print("⚠️  规划模式下忽略 --prefer-missing（批次内容已预先确定）")
+            plan = load_or_build_plan(manager, batch_size=batch_size, review_size=review_size)
+            target_vocab, planned_review = manager.get_planned_batch(plan, lease_seconds=lease_seconds)
+        elif args.prefer_missing and os.path.exists(args.missing_file):
             with open(args.missing_file, "r", encoding="utf-8") as f:
                 prefer_pool = [line.strip() for line in f.readlines() if line.strip()]
             print(f"🎯 补漏模式开启：优先词池 {len(prefer_pool)} 个（来自 {args.missing_file}）")
         elif args.prefer_missing:
             print(f"⚠️  补漏模式开启，但找不到词池文件：{args.missing_file}（将退化为正常顺序选词）")
 
-        target_vocab = manager.get_next_batch(batch_size, prefer_pool=prefer_pool)
+        if not args.plan:
+            mix = parse_mix(args.mix) if args.mix else None
+            if mix:
+                print(f"🎚️  分级比例：{mix}")
+            target_vocab = manager.get_next_batch(
+                batch_size, prefer_pool=prefer_pool, lease_seconds=lease_seconds, mix=mix
+            )
         
         if not target_vocab:
             raise ValueError("没有可用的新单词，请检查进度追踪文件")
         
+        # 记录本批次（step2 入库时据此提交租约）
+        with open(BATCH_OUTPUT_FILE, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "batch_id": manager.last_batch_id,
+                    "progress_file": manager.progress_file,
+                    "words": target_vocab,
+                },
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
         print(f"新单词：{target_vocab}")
         
         # 获取复习单词
-        review_vocab = manager.get_review_batch(review_size)
+        review_vocab = planned_review if args.plan else manager.get_review_batch(review_size, batch_id=manager.last_batch_id)
         if review_vocab:
             print(f"\n🔄 获取复习单词（{len(review_vocab)}个）...")
             print(f"复习单词：{review_vocab}")
@@ -251,6 +320,7 @@ def main():
             f.write(full_prompt)
         
         print(f"\n✅ Prompt 已保存到：{PROMPT_OUTPUT_FILE}")
+        print(f"🧾 批次信息已保存到：{BATCH_OUTPUT_FILE}（批次 {manager.last_batch_id}）")
         print()
         print("=" * 60)
         print("📋 生成的 Prompt（可直接复制到 ChatGPT）：")
@@ -266,6 +336,7 @@ def main():
         print("3. 运行 python tools/step2_save_chapter.py 完成入库")
         print()
         print("⚠️  注意：此时尚未更新学习进度，需等待步骤2完成")
+        print("   本批单词处于“已分配”租约中，超时未入库会自动回收到待学习队列")
         
     except Exception as e:
         print(f"\n❌ 错误：{e}")
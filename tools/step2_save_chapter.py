@@ -14,7 +14,9 @@ from datetime import datetime
 import uuid
 
 # 导入课程管理器
-from curriculum_manager import CurriculumManager
+from curriculum_manager import CurriculumManager, get_progress_file_for_category
+from exposure_index import record_published_book
+from progress_versions import VersionLog
 
 # ==================== 路径配置 ====================
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -22,6 +24,7 @@ PROJECT_ROOT = os.path.dirname(BASE_DIR)
 
 PROGRESS_FILE = os.path.join(BASE_DIR, "progress_tracker.json")
 RAW_STORY_FILE = os.path.join(BASE_DIR, "raw_story.txt")
+BATCH_FILE = os.path.join(BASE_DIR, "current_batch.json")
 OUTPUT_DIR = os.path.join(PROJECT_ROOT, "src", "data", "generated")
 LIBRARY_FILE = os.path.join(PROJECT_ROOT, "src", "data", "library.ts")
 NOVEL_SERVICE_FILE = os.path.join(PROJECT_ROOT, "src", "services", "novelService.ts")
@@ -81,6 +84,26 @@ def validate_content_format(content: str) -> Tuple[bool, List[str]]:
     return True, words
 
 
+# 字数范围（估算中文字数 = 去掉空格和换行后的字符数 / 2）
+MIN_CHARS = 1400
+MAX_CHARS = 2000
+
+
+def check_length(content: str) -> Tuple[int, Optional[str]]:
+    """
+    检查字数（要求 1500 字左右）
+
+    Returns:
+        (去掉空格和换行后的字符数, 警告信息；符合要求时为 None)
+    """
+    word_count = len(content.replace(" ", "").replace("\n", ""))  # 粗略计算中文字数
+    if word_count < MIN_CHARS:
+        return word_count, "字数可能过少（建议 1400-1600 字）"
+    if word_count > MAX_CHARS:
+        return word_count, "字数可能过多（建议 1400-1600 字）"
+    return word_count, None
+
+
 def read_raw_story() -> str:
     """
     读取 raw_story.txt 文件
@@ -141,6 +164,62 @@ def extract_target_words_from_prompt() -> Optional[List[str]]:
     return None
 
 
+def load_current_batch() -> Optional[Dict]:
+    """
+    读取 step1 记录的批次信息（current_batch.json）
+
+    Returns:
+        {"batch_id", "progress_file", "words"}，不存在或无法解析时返回 None
+    """
+    if not os.path.exists(BATCH_FILE):
+        return None
+    try:
+        with open(BATCH_FILE, "r", encoding="utf-8") as f:
+            batch = json.load(f)
+        if isinstance(batch, dict) and batch.get("batch_id"):
+            return batch
+    except Exception as e:
+        print(f"⚠️  警告：无法读取批次信息文件：{e}")
+    return None
+
+
+def is_same_progress_file(manager: CurriculumManager, batch: Dict) -> bool:
+    """step1 的批次是否记录在该管理器的进度文件中"""
+    progress_file = batch.get("progress_file") or manager.progress_file
+    return os.path.abspath(progress_file) == os.path.abspath(manager.progress_file)
+
+
+def commit_step1_batch(manager: CurriculumManager, batch: Optional[Dict]):
+    """
+    提交 step1 的分配租约
+
+    step1 分配单词时使用的进度文件可能与本分类的进度文件不同，此时在 step1 的进度文件上提交。
+    这种情况不能在 manager.snapshot 内调用：sqlite / shared 后端的所有进度文件共用一把锁，
+    快照持有锁时再打开另一个管理器会一直等待
+    """
+    if not batch:
+        return
+    if is_same_progress_file(manager, batch):
+        batch_manager = manager
+    else:
+        batch_manager = CurriculumManager(batch["progress_file"])
+    if batch["batch_id"] not in batch_manager.leases:
+        return  # 单词已全部标记为已学习时租约已随之结束
+    words = batch_manager.commit_batch(batch["batch_id"])
+    if words:
+        print(f"✅ 已提交批次 {batch['batch_id']}（{len(words)} 个单词）")
+
+
+def new_book_id(output_dir: str = OUTPUT_DIR) -> str:
+    """生成唯一的 book_id（同一秒内入库多本书时追加序号）"""
+    base = f"book-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    book_id, n = base, 1
+    while os.path.exists(os.path.join(output_dir, f"{book_id}.json")):
+        n += 1
+        book_id = f"{base}-{n}"
+    return book_id
+
+
 def save_chapter(chapter: Dict, output_dir: str = OUTPUT_DIR, book_id: Optional[str] = None) -> str:
     """
     保存章节到JSON文件（每本书只有一个章节，文件名使用book_id）
@@ -360,6 +439,102 @@ def update_novel_service(book_id: str):
         traceback.print_exc()
 
 
+def publish_chapter(
+    content: str,
+    category_id: str,
+    book_id: str,
+    book_title: str,
+    target_words: List[str],
+    batch: Optional[Dict] = None,
+    manager: Optional[CurriculumManager] = None,
+) -> Tuple[str, CurriculumManager]:
+    """
+    章节入库（不需要交互，book_pipeline.py 也调用）：保存章节，标记单词为已学习、提交 step1 的批次、
+    增加章节计数（进度修改记录为一个版本），再更新曝光索引和 novelService.ts
+
+    新书在本函数返回后再加入 library.ts（add_book_to_library），入库失败时书库里不会留下空书；
+    进度更新失败时撤销章节文件（新书删除、已有的书恢复原内容）并抛出异常（此时还没有改动 novelService.ts，批次可以安全回退）。
+    manager 为该分类进度文件的课程管理器（可选，默认新建）
+
+    Returns:
+        (章节文件路径, 分类的课程管理器)
+    """
+    category_progress_file = get_progress_file_for_category(category_id)
+
+    # 构建章节数据（每本书只有一个章节，所以是 chapter-1，标题使用书名）
+    chapter = {
+        "id": f"{book_id}-chapter-1",
+        "title": book_title,
+        "content": content,
+        "chapter_num": 1,
+        "book_id": book_id,
+    }
+
+    # 初始化课程管理器（使用分类对应的进度文件，不影响其他分类）
+    if manager is None:
+        manager = CurriculumManager(category_progress_file)
+    version_before = manager.last_version_id
+
+    # 保存章节（使用 book_id 作为文件名；已有的书会覆盖原章节，先留一份用于失败时恢复）
+    previous = None
+    existing_file = os.path.join(OUTPUT_DIR, f"{book_id}.json")
+    if os.path.exists(existing_file):
+        with open(existing_file, "rb") as f:
+            previous = f.read()
+    filepath = save_chapter(chapter, OUTPUT_DIR, book_id)
+
+    try:
+        # 进度修改记录为一个版本（只保存差异），入库有误时可回滚
+        with manager.snapshot(f"入库 {book_id}《{book_title}》"):
+            # 标记单词为已学习
+            if target_words:
+                manager.mark_as_learned(target_words)
+            else:
+                print("⚠️  警告：无法确定目标单词，跳过进度更新")
+                print("   建议：确保运行了 step1_get_prompt.py 并保留了 current_prompt.txt")
+
+            # 结束 step1 的分配租约（批次在本分类的进度文件中时一并记入版本）
+            if batch and is_same_progress_file(manager, batch):
+                commit_step1_batch(manager, batch)
+
+            # 增加章节计数（虽然每本书只有一个章节，但仍需要更新计数）
+            manager.increment_chapter()
+    except BaseException:
+        # 块内已完成的修改也会记为版本：切回上一个版本，批次保持未提交
+        if manager.last_version_id not in (None, version_before):
+            manager.restore_version(VersionLog(manager.progress_file).versions[manager.last_version_id]["parent"])
+        # 撤销章节文件，不留下没有入库的章节
+        if previous is not None:
+            with open(filepath, "wb") as f:
+                f.write(previous)
+            print(f"↩️  进度更新失败，已恢复原章节文件：{filepath}")
+        elif os.path.exists(filepath):
+            os.remove(filepath)
+            print(f"🗑️  进度更新失败，已删除章节文件：{filepath}")
+        raise
+
+    # 以下步骤在单词提交之后：失败时只提示手动补救，不再回退批次
+    if batch and not is_same_progress_file(manager, batch):
+        # 批次在其他进度文件中（如 step1 使用全局进度文件）：在快照之外提交，不在本次版本中，回滚时不会撤销
+        commit_step1_batch(manager, batch)
+        print(f"   提示：{batch['progress_file']} 上的批次提交不在本次进度版本中，回滚入库时需要另行处理")
+    if manager.last_version_id is not None:
+        parent = VersionLog(manager.progress_file).versions[manager.last_version_id]["parent"]
+        print(f"   如需撤销本次入库：python3 progress_versions.py restore {parent} --category {category_id}")
+
+    # 更新单词曝光索引（复习选词用，不需要重新扫描书库）
+    try:
+        exposure = record_published_book(book_id, content)
+        print(f"📈 曝光索引已更新：本书 {len(exposure)} 个单词，共 {sum(exposure.values())} 次标记")
+    except Exception as e:
+        print(f"⚠️  曝光索引更新失败：{e}（稍后运行 python3 exposure_index.py sync 补录）")
+
+    # 自动更新 novelService.ts
+    update_novel_service(book_id)
+
+    return filepath, manager
+
+
 def main():
     """主函数"""
     print("=" * 60)
@@ -388,18 +563,12 @@ def main():
         # 3. 验证字数（1500字左右）
         print("\n📏 验证字数...")
         char_count = len(raw_content)
-        word_count = len(raw_content.replace(" ", "").replace("\n", ""))  # 粗略计算中文字数
+        word_count, length_warning = check_length(raw_content)
         print(f"字符数：{char_count}")
         print(f"估算字数：约 {word_count // 2} 字（中文）")
         
-        if word_count < 1400:
-            print(f"⚠️  警告：字数可能过少（建议 1400-1600 字）")
-            confirm = input("是否继续？(y/N): ").strip().lower()
-            if confirm != "y":
-                print("已取消")
-                sys.exit(0)
-        elif word_count > 2000:
-            print(f"⚠️  警告：字数可能过多（建议 1400-1600 字）")
+        if length_warning:
+            print(f"⚠️  警告：{length_warning}")
             confirm = input("是否继续？(y/N): ").strip().lower()
             if confirm != "y":
                 print("已取消")
@@ -428,12 +597,12 @@ def main():
                 print("❌ 请输入数字")
         
         # 根据选择的分类，使用对应的进度文件
-        from curriculum_manager import get_progress_file_for_category
         category_progress_file = get_progress_file_for_category(selected_category["id"])
         print(f"📁 使用进度文件：{category_progress_file}")
         
         # 5. 选择或创建书籍
         print("\n📖 选择或创建书籍...")
+        is_new_book = False
         existing_books = load_existing_books()
         
         # 筛选当前分类下的书籍
@@ -468,12 +637,10 @@ def main():
                         if not book_author:
                             book_author = "佚名"
                         
-                        # 生成唯一的 book_id
-                        book_id = f"book-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+                        # 生成唯一的 book_id（章节入库成功后再添加到 library.ts）
+                        book_id = new_book_id()
                         book_color = selected_category["color"]
-                        
-                        # 添加到 library.ts
-                        add_book_to_library(book_id, book_title, book_author, selected_category["id"], book_color)
+                        is_new_book = True
                         break
                     else:
                         print(f"❌ 无效的选择，请输入 1-{len(same_category_books) + 1}")
@@ -491,27 +658,17 @@ def main():
             if not book_author:
                 book_author = "佚名"
             
-            # 生成唯一的 book_id
-            book_id = f"book-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            # 生成唯一的 book_id（章节入库成功后再添加到 library.ts）
+            book_id = new_book_id()
             book_color = selected_category["color"]
-            
-            # 添加到 library.ts
-            add_book_to_library(book_id, book_title, book_author, selected_category["id"], book_color)
+            is_new_book = True
         
         # 6. 提取章节标题（用于章节数据）
         print("\n📝 提取章节标题...")
         chapter_title = book_title  # 使用书名作为章节标题（因为每本书只有一个章节）
         print(f"✅ 章节标题：{chapter_title}")
         
-        # 7. 初始化课程管理器（使用分类对应的进度文件）
-        print("\n📚 初始化课程管理器...")
-        print(f"   使用分类进度文件：{category_progress_file}")
-        manager = CurriculumManager(category_progress_file)
-        current_chapter = manager.get_current_chapter()
-        print(f"当前章节号：{current_chapter}")
-        print(f"   分类：{selected_category['name']} - 此分类使用独立的词库进度，不影响其他分类")
-        
-        # 8. 尝试从 Prompt 文件提取目标单词
+        # 7. 尝试从 Prompt 文件提取目标单词
         print("\n🔍 提取目标单词列表...")
         target_words = extract_target_words_from_prompt()
         
@@ -524,42 +681,23 @@ def main():
             # 使用内容中发现的单词（去重）
             target_words = list(set([w.lower() for w in found_words]))
         
-        # 9. 构建章节数据
-        print("\n📦 构建章节数据...")
-        chapter_id = f"{book_id}-chapter-1"  # 每本书只有一个章节，所以是 chapter-1
-        
-        chapter = {
-            "id": chapter_id,
-            "title": chapter_title,
-            "content": raw_content
-        }
-        
-        # 10. 保存章节（使用 book_id 作为文件名）
-        print("\n💾 保存章节...")
-        chapter["chapter_num"] = 1  # 每本书只有一个章节
-        chapter["book_id"] = book_id  # 添加 book_id 到章节数据中
-        filepath = save_chapter(chapter, OUTPUT_DIR, book_id)
-        
-        # 10.5. 自动更新 novelService.ts
-        print("\n🔄 自动更新 novelService.ts...")
-        update_novel_service(book_id)
-        
-        # 11. 标记单词为已学习
-        print("\n✅ 更新学习进度...")
-        if target_words:
-            manager.mark_as_learned(target_words)
-        else:
-            print("⚠️  警告：无法确定目标单词，跳过进度更新")
-            print("   建议：确保运行了 step1_get_prompt.py 并保留了 current_prompt.txt")
-        
-        # 12. 增加章节计数（虽然每本书只有一个章节，但仍需要更新计数）
-        manager.increment_chapter()
+        # 8. 入库：保存章节、更新 novelService.ts 和学习进度（使用分类对应的进度文件）
+        print("\n💾 保存章节并更新学习进度...")
+        print(f"   使用分类进度文件：{category_progress_file}")
+        print(f"   分类：{selected_category['name']} - 此分类使用独立的词库进度，不影响其他分类")
+        filepath, manager = publish_chapter(
+            raw_content, selected_category["id"], book_id, book_title, target_words, load_current_batch()
+        )
+        if is_new_book:
+            add_book_to_library(book_id, book_title, book_author, selected_category["id"], book_color)
+        if os.path.exists(BATCH_FILE):
+            os.remove(BATCH_FILE)
         
-        # 13. 打印更新后的统计
+        # 9. 打印更新后的统计
         print("\n📊 更新后的学习进度：")
         manager.print_statistics()
         
-        # 14. 清空 raw_story.txt（可选）
+        # 10. 清空 raw_story.txt（可选）
         print("\n🧹 清理临时文件...")
         clear_raw = input("是否清空 raw_story.txt？(y/N): ").strip().lower()
         if clear_raw == "y":
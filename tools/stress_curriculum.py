@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 课程管理器并发分配压力测试
+
+多个进程同时对同一个进度文件调用 get_next_batch，检查：
+- 没有任何单词被分配给两个批次
+- 最终进度中的已分配单词 = 所有进程拿到的单词之和
+- 待学习 + 已分配 = 词表总数（没有单词丢失）
+
+用法：
+  cd tools
+  python3 stress_curriculum.py [--backend json|journal|sqlite|shared|all] [--workers 8] [--rounds 20]
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import redirect_stdout
+from typing import List
+
+from curriculum_manager import CurriculumManager
+from progress_store import create_store
+
+BACKENDS = ["json", "journal", "sqlite", "shared"]
+
+
+def worker(args) -> List[List[str]]:
+    """子进程：反复领取批次"""
+    progress_file, backend, rounds, batch_size = args
+    batches: List[List[str]] = []
+    with redirect_stdout(io.StringIO()):
+        manager = CurriculumManager(progress_file, backend=backend)
+        for _ in range(rounds):
+            batches.append(manager.get_next_batch(batch_size))
+    return batches
+
+
+def run(backend: str, workers: int, rounds: int, batch_size: int) -> bool:
+    word_count = workers * rounds * batch_size + batch_size * 10
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        progress_file = os.path.join(tmp_dir, "progress_tracker_stress.json")
+        with open(progress_file, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "total_words": word_count,
+                    "learned_words": [],
+                    "pending_words": [f"word{i:06d}" for i in range(word_count)],
+                    "assigned_words": [],
+                    "current_book_chapter": 1,
+                },
+                f,
+            )
+
+        start = time.perf_counter()
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(worker, [(progress_file, backend, rounds, batch_size)] * workers)
+        elapsed = time.perf_counter() - start
+
+        allocated = [w for batches in results for batch in batches for w in batch]
+        duplicates = [w for w, n in Counter(allocated).items() if n > 1]
+
+        final = create_store(progress_file, backend).load()
+        assigned = set(final.get("assigned_words", []))
+        pending = set(final.get("pending_words", []))
+
+    ok = True
+    print(f"\n[{backend}] {workers} 进程 × {rounds} 批 × {batch_size} 词，用时 {elapsed:.2f}s")
+    print(f"   已分配单词：{len(allocated)}（期望 {workers * rounds * batch_size}）")
+    if duplicates:
+        ok = False
+        print(f"❌ 有 {len(duplicates)} 个单词被重复分配，例如：{duplicates[:5]}")
+    if assigned != set(allocated):
+        ok = False
+        print(f"❌ 进度文件中的已分配单词（{len(assigned)}）与各进程拿到的单词（{len(set(allocated))}）不一致")
+    if len(pending) + len(assigned) != word_count:
+        ok = False
+        print(f"❌ 待学习 + 已分配 = {len(pending) + len(assigned)}，与词表总数 {word_count} 不一致")
+    if ok:
+        print("✅ 每个单词恰好分配给一个批次")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="课程管理器并发分配压力测试")
+    parser.add_argument("--backend", type=str, default="all", help="进度存储后端（默认 all：逐个测试全部后端）")
+    parser.add_argument("--workers", type=int, default=8, help="并发进程数（默认 8）")
+    parser.add_argument("--rounds", type=int, default=20, help="每个进程领取的批次数（默认 20）")
+    parser.add_argument("--batch", type=int, default=60, help="每批单词数（默认 60）")
+    args = parser.parse_args()
+
+    backends = BACKENDS if args.backend == "all" else [args.backend]
+    print("=" * 60)
+    print("🔒 并发分配压力测试")
+    print("=" * 60)
+
+    results = [run(backend, args.workers, args.rounds, args.batch) for backend in backends]
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,8 +12,13 @@ Vocabulary 接口字段：
 - root: 词根助记 (如 "ambi(周围) + it(走) -> 野心勃勃")
 - example: 简短英文例句
 - exampleCn: 例句中文翻译
+
+大批量补充时可以改用服务商的批处理接口（更便宜、不受每分钟请求数限制，见 llm_batch.py）：
+  python3 vocab_enricher.py --batch-out vocab_requests.jsonl   # 写出待生成单词的请求文件
+  python3 vocab_enricher.py --ingest vocab_results.jsonl       # 导入结果文件：逐行校验后写入 vocab_db.json
 """
 
+import argparse
 import json
 import os
 import sys
@@ -29,6 +34,12 @@ except ImportError:
 
 from openai import OpenAI
 
+from llm_batch import batch_request, read_batch_results, write_batch_file
+from llm_cache import enable_cache
+from llm_endpoints import active_pool
+from llm_metrics import record_batch_call
+from llm_request import request_text
+
 # ============== 配置 ==============
 
 API_KEY = os.getenv("OPENAI_API_KEY", "your-api-key-here")
@@ -41,6 +52,9 @@ MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")  # DeepSeek: "deepseek-chat"
 SOURCE_PATH = os.getenv("IELTS_SOURCE_PATH", "ielts_source.json")
 DB_PATH = os.getenv("VOCAB_DB_PATH", os.path.join("..", "src", "data", "generated", "vocab_db.json"))
 
+ENRICH_PARAMS = {"temperature": 0.4, "max_tokens": 400}
+REQUIRED_FIELDS = ["word", "meaning", "phonetic", "root", "example", "exampleCn"]
+
 
 SYSTEM_PROMPT = """你是一名专业的英语词汇学专家和雅思教师，擅长用简洁、准确的方式解释单词，同时懂得如何设计适合中国学生的例句和词根助记。
 
@@ -130,24 +144,16 @@ def build_enrich_prompt(word: str) -> str:
 请按照 System Prompt 中的字段要求，只返回一个 JSON 对象。"""
 
 
-def enrich_single_word(client: OpenAI, word: str) -> Dict[str, Any]:
-    """调用 LLM，为单个单词生成 Vocabulary 详情。
+def build_enrich_messages(word: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_enrich_prompt(word)},
+    ]
 
-    返回的 dict 必须包含：word, meaning, phonetic, root, example, exampleCn
-    """
-    user_prompt = build_enrich_prompt(word)
-
-    resp = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
-        ],
-        temperature=0.4,
-        max_tokens=400,
-    )
 
-    content = resp.choices[0].message.content.strip()
+def parse_enriched_word(content: str) -> Dict[str, Any]:
+    """解析并校验 LLM 返回的单词详情（字段见 REQUIRED_FIELDS），不合法时抛出 ValueError"""
+    content = content.strip()
 
     # 为了安全，尝试只截取 JSON 对象部分
     first_brace = content.find("{")
@@ -159,20 +165,94 @@ def enrich_single_word(client: OpenAI, word: str) -> Dict[str, Any]:
         data = json.loads(content)
     except json.JSONDecodeError as e:
         raise ValueError(f"LLM 返回的内容不是合法 JSON: {content}") from e
+    if not isinstance(data, dict):
+        raise ValueError(f"LLM 返回的内容不是 JSON 对象: {content}")
 
     # 基本字段校验
-    required_fields = ["word", "meaning", "phonetic", "root", "example", "exampleCn"]
-    for field in required_fields:
+    for field in REQUIRED_FIELDS:
         if field not in data or not isinstance(data[field], str) or not data[field].strip():
             raise ValueError(f"字段缺失或无效: {field} in {data}")
 
     # 规范化 word
     data["word"] = data["word"].strip()
-
     return data
 
 
+def enrich_single_word(client: OpenAI, word: str) -> Dict[str, Any]:
+    """调用 LLM，为单个单词生成 Vocabulary 详情。
+
+    返回的 dict 必须包含：word, meaning, phonetic, root, example, exampleCn
+    """
+    # 启用响应缓存（--cache / LLM_CACHE=1）时相同请求直接重放，只缓存校验通过的响应；
+    # 配置了多个端点（llm_endpoints.json）时经端点池发送（见 llm_request.py）
+    content = request_text(client, build_enrich_messages(word), ENRICH_PARAMS, "enrich", validate=parse_enriched_word)
+    return parse_enriched_word(content)
+
+
+def find_words_to_enrich(source_words: List[str], vocab_db: Dict[str, Any]) -> List[str]:
+    """词源中还没有详情的单词（按小写去重，保持词源顺序）"""
+    missing_words: List[str] = []
+    seen = set()
+    for w in source_words:
+        key = w.lower()
+        if key not in vocab_db and key not in seen:
+            seen.add(key)
+            missing_words.append(w)
+    return missing_words
+
+
+def export_enrich_requests(words: List[str], output_file: str) -> int:
+    """写出批处理接口的请求文件，custom_id 为 vocab:<单词>"""
+    written = write_batch_file(
+        output_file,
+        (batch_request(f"vocab:{word}", MODEL, build_enrich_messages(word), ENRICH_PARAMS) for word in words),
+    )
+    print(f"📦 已写出 {written} 个单词请求：{output_file}")
+    return written
+
+
+def ingest_enrich_results(results_file: str, vocab_db: Dict[str, Any]) -> Dict[str, int]:
+    """
+    导入批处理结果：逐行校验（同 enrich_single_word），合法的写入 vocab_db（调用方负责保存）
+
+    Returns:
+        {"saved", "failed", "skipped"} 计数
+    """
+    counts = {"saved": 0, "failed": 0, "skipped": 0}
+    for custom_id, content, usage, error in read_batch_results(results_file):
+        kind, _, word = custom_id.partition(":")
+        if kind != "vocab" or not word:
+            if error:
+                print(f"❌ {custom_id} 无法导入: {error}", file=sys.stderr)
+                counts["failed"] += 1
+            else:
+                print(f"⚠️  跳过非单词请求的结果：{custom_id}", file=sys.stderr)
+                counts["skipped"] += 1
+            continue
+        record_batch_call("enrich", MODEL, usage, error)
+        try:
+            if error:
+                raise ValueError(error)
+            vocab = parse_enriched_word(content)
+        except ValueError as e:
+            counts["failed"] += 1
+            print(f"❌ {word} 导入失败: {e}", file=sys.stderr)
+            continue
+        vocab_db[word.lower()] = vocab
+        counts["saved"] += 1
+    return counts
+
+
 def main() -> None:
+    parser = argparse.ArgumentParser(description="为词源中的新单词生成词汇详情")
+    parser.add_argument("--cache", action="store_true", help="启用 LLM 响应缓存：相同请求直接重放（见 llm_cache.py）")
+    batch_mode = parser.add_mutually_exclusive_group()
+    batch_mode.add_argument("--batch-out", type=str, metavar="FILE", help="不直接生成，写出批处理接口的请求文件（JSONL，见 llm_batch.py）")
+    batch_mode.add_argument("--ingest", type=str, metavar="FILE", help="导入批处理接口的结果文件（JSONL）")
+    args = parser.parse_args()
+    if args.cache:
+        enable_cache()
+
     print("=" * 60)
     print("IELTS Novel Flow - 词汇详情生成器")
     print("=" * 60)
@@ -187,13 +267,15 @@ def main() -> None:
     # 加载已有数据库
     vocab_db = load_vocab_db(DB_PATH)
 
+    if args.ingest:
+        counts = ingest_enrich_results(args.ingest, vocab_db)
+        save_vocab_db(vocab_db, DB_PATH)
+        print(f"导入完成：成功 {counts['saved']} 个，失败 {counts['failed']} 个，跳过 {counts['skipped']} 个")
+        print(f"仍待生成: {len(find_words_to_enrich(source_words, vocab_db))} 个")
+        return
+
     # 计算需要补充的单词（按小写去重）
-    missing_words: List[str] = []
-    for w in source_words:
-        key = w.lower()
-        if key not in vocab_db:
-            if key not in missing_words:
-                missing_words.append(w)
+    missing_words = find_words_to_enrich(source_words, vocab_db)
 
     print(f"总词数: {len(source_words)}，已存在: {len(vocab_db)}，待生成: {len(missing_words)}")
 
@@ -201,6 +283,10 @@ def main() -> None:
         print("✅ 没有需要补充的新单词，vocab_db.json 已是最新。")
         return
 
+    if args.batch_out:
+        export_enrich_requests(missing_words, args.batch_out)
+        return
+
     # 初始化客户端
     client = OpenAI(api_key=API_KEY, base_url=BASE_URL)
 
@@ -234,6 +320,8 @@ def main() -> None:
     print("=" * 60)
     print("任务完成")
     print(f"成功: {success_count} 个，失败: {fail_count} 个")
+    if active_pool():
+        active_pool().print_metrics()
     print(f"数据库位置: {DB_PATH}")
 
 
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 词频排名表 + 难度分级表
+
+排名文件 word_ranks.txt：每行一个单词，行号即排名（越靠前越常用 / 越简单，越先学）。
+CurriculumManager 加载后让待学习队列保持排名顺序，选词仍然只是从队头顺序取词，复杂度 O(batch)。
+
+分级文件 word_bands.txt：每行“单词 分级”（如 abandon 6）。CurriculumManager 为每个分级维护有序队列，
+get_next_batch(mix={"6": 0.3, "7": 0.5, "8": 0.2}) 按比例从各分级队列取词。
+
+- 两张表在每个进程内只加载一次（按文件路径 + 修改时间缓存），查询 O(1)
+- 不在排名表中的单词排在最后，保持原有相对顺序；不在分级表中的单词不属于任何分级
+
+用法：
+  cd tools
+  python3 word_rank.py build freq.txt              # 由“单词 频次”格式的词频表生成 word_ranks.txt
+  python3 word_rank.py apply [--category reborn]   # 按排名重排已有进度的待学习队列
+  python3 word_rank.py show abandon ubiquitous     # 查看单词排名与分级
+"""
+
+import argparse
+import functools
+import hashlib
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RANK_FILE = os.getenv("CURRICULUM_RANK_FILE", os.path.join(BASE_DIR, "word_ranks.txt"))
+BAND_FILE = os.getenv("CURRICULUM_BAND_FILE", os.path.join(BASE_DIR, "word_bands.txt"))
+
+
+class RankTable:
+    """单词排名表（只读）"""
+
+    def __init__(self, words: Iterable[str], signature: str = ""):
+        self._ranks: Dict[str, int] = {}
+        for w in words:
+            key = w.strip().lower()
+            if key and key not in self._ranks:
+                self._ranks[key] = len(self._ranks)
+        self.unranked = len(self._ranks)
+        self.signature = signature
+
+    @classmethod
+    def from_file(cls, path: str) -> "RankTable":
+        with open(path, "rb") as f:
+            data = f.read()
+        lines = data.decode("utf-8").splitlines()
+        # 每行第一列为单词，之后的列（如频次）忽略；# 开头为注释
+        words = (re.split(r"[\s,]+", line.strip(), maxsplit=1)[0] for line in lines if line.strip() and not line.startswith("#"))
+        return cls(words, hashlib.sha1(data).hexdigest()[:12])
+
+    def __len__(self) -> int:
+        return len(self._ranks)
+
+    def __contains__(self, word: object) -> bool:
+        return isinstance(word, str) and word.strip().lower() in self._ranks
+
+    def rank(self, word: str) -> int:
+        """单词排名（不在表中返回 self.unranked）"""
+        return self._ranks.get(word.strip().lower(), self.unranked)
+
+    def sort(self, words: List[str]) -> List[str]:
+        """按排名排序（稳定排序：同排名 / 不在表中的单词保持原顺序）"""
+        return sorted(words, key=self.rank)
+
+    def merge(self, ordered: List[str], new_words: List[str]) -> List[str]:
+        """
+        把新单词按排名插入已排好序的队列，已有单词的相对顺序不变
+
+        队列前部可能有回收的租约单词（不按排名），新单词只会排在第一个排名比它大的已有单词之前
+        """
+        new_sorted = self.sort(new_words)
+        result: List[str] = []
+        i = 0
+        for w in ordered:
+            r = self.rank(w)
+            while i < len(new_sorted) and self.rank(new_sorted[i]) < r:
+                result.append(new_sorted[i])
+                i += 1
+            result.append(w)
+        result.extend(new_sorted[i:])
+        return result
+
+
+@functools.lru_cache(maxsize=8)
+def _load_cached(path: str, mtime: float, size: int) -> RankTable:
+    return RankTable.from_file(path)
+
+
+def load_rank_table(path: Optional[str] = None) -> Optional[RankTable]:
+    """加载排名表（文件不存在返回 None）；同一进程内文件未变化时直接复用"""
+    path = path or RANK_FILE
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return _load_cached(os.path.abspath(path), stat.st_mtime, stat.st_size)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_bands_cached(path: str, mtime: float, size: int) -> Dict[str, str]:
+    bands: Dict[str, str] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = re.split(r"[\s,]+", line.strip())
+            if len(parts) < 2 or line.startswith("#"):
+                continue
+            bands.setdefault(parts[0].lower(), parts[1])
+    return bands
+
+
+def load_band_table(path: Optional[str] = None) -> Optional[Dict[str, str]]:
+    """加载难度分级表（小写单词 -> 分级），文件不存在返回 None"""
+    path = path or BAND_FILE
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return _load_bands_cached(os.path.abspath(path), stat.st_mtime, stat.st_size)
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """解析分级比例：'6:0.3,7:0.5,8:0.2' 或 '6:30,7:50,8:20'（按相对权重）"""
+    mix: Dict[str, float] = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        band, sep, weight = part.partition(":")
+        if not sep:
+            raise ValueError(f"分级比例格式错误：{part}（应为 分级:比例）")
+        mix[band.strip()] = float(weight)
+    return mix
+
+
+def allocate_mix(mix: Dict[str, float], count: int, available: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """
+    按比例把 count 个名额分给各分级（最大余数法，名额之和恰好为 count）
+
+    给定 available 时每个分级最多分到可用数量，不足的差额按比例分给其余分级；所有分级都不够时总数小于 count
+    """
+    quotas = {band: 0 for band in mix}
+    active = {b: w for b, w in mix.items() if w > 0 and (available is None or available.get(b, 0) > 0)}
+    remaining = count
+    while remaining > 0 and active:
+        total = sum(active.values())
+        shares = {b: remaining * w / total for b, w in active.items()}
+        alloc = {b: int(v) for b, v in shares.items()}
+        for b in sorted(active, key=lambda b: shares[b] - alloc[b], reverse=True)[: remaining - sum(alloc.values())]:
+            alloc[b] += 1
+        remaining = 0
+        for b, n in alloc.items():
+            take = n if available is None else min(n, available[b] - quotas[b])
+            quotas[b] += take
+            remaining += n - take
+            if available is not None and quotas[b] >= available[b]:
+                del active[b]
+    return quotas
+
+
+def build_rank_file(freq_file: str, output_file: str = RANK_FILE) -> int:
+    """
+    由词频表生成排名文件
+
+    词频表每行“单词 频次”（空格 / 制表符 / 逗号分隔），按频次从高到低排序；
+    没有频次列时保持原顺序。返回写入的单词数
+    """
+    entries = []
+    with open(freq_file, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            parts = re.split(r"[\s,]+", line.strip())
+            if not parts[0] or line.startswith("#") or not re.match(r"^[A-Za-z][A-Za-z'\-]*$", parts[0]):
+                continue
+            try:
+                count = float(parts[1]) if len(parts) > 1 else 0.0
+            except ValueError:
+                continue  # 表头等非数据行
+            entries.append((-count, line_no, parts[0].lower()))
+    entries.sort()
+    words = list(dict.fromkeys(w for _, _, w in entries))
+    tmp_file = f"{output_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write(f"# 由 {os.path.basename(freq_file)} 生成，行号即排名\n")
+        f.write("\n".join(words) + "\n")
+    os.replace(tmp_file, output_file)
+    return len(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="词频排名表：生成 / 应用 / 查询")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="由词频表生成排名文件")
+    build.add_argument("freq_file", help="词频表（每行：单词 频次）")
+    build.add_argument("--output", default=RANK_FILE, help="排名文件路径（默认 tools/word_ranks.txt）")
+
+    apply = sub.add_parser("apply", help="按排名重排已有进度的待学习队列")
+    apply.add_argument("--category", type=str, default=None, help="分类 ID（默认全局进度文件）")
+
+    show = sub.add_parser("show", help="查看单词排名")
+    show.add_argument("words", nargs="+")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_rank_file(args.freq_file, args.output)
+        print(f"✅ 已生成排名文件 {args.output}，共 {count} 个单词")
+        return
+
+    table = load_rank_table()
+    if table is None:
+        print(f"❌ 排名文件 {RANK_FILE} 不存在，请先运行 build（或设置 CURRICULUM_RANK_FILE）")
+        return
+
+    if args.command == "apply":
+        # 延迟导入，避免 curriculum_manager <-> word_rank 循环导入
+        from curriculum_manager import CurriculumManager, get_progress_file_for_category
+
+        manager = CurriculumManager(get_progress_file_for_category(args.category))
+        head = manager.pending.to_list()[:10]
+        print(f"✅ 待学习队列已按排名排列（{len(manager.pending)} 个），队头：{head}")
+    elif args.command == "show":
+        bands = load_band_table() or {}
+        for w in args.words:
+            r = table.rank(w)
+            print(f"{w:<20} {'未收录' if r == table.unranked else f'#{r + 1}':<10} 分级 {bands.get(w.lower(), '-')}")
+
+
+if __name__ == "__main__":
+    main()
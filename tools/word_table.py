@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+IELTS Novel Flow - 共享词表 + 分类位图
+
+所有分类共用一个文件 progress_shared.json：
+- words：全局词表（单词只存一次，下标即单词 ID）
+- categories：每个分类三张位图（pending / assigned / learned，bit i 表示单词 ID i），
+  以及待学习顺序（仅当顺序与 ID 顺序不一致时才保存）、标量字段和复习状态
+
+一次读取即可加载全部分类；分类统计与跨分类查询（如“任一分类已学习”）都是整数位运算。
+
+用法：
+  cd tools
+  python3 word_table.py stats     # 各分类统计 + 跨分类汇总
+"""
+
+import argparse
+import base64
+import json
+import os
+from array import array
+from typing import Dict, List, Optional
+
+from progress_store import (
+    Op,
+    REVIEW_FIELD,
+    STATE_FIELDS,
+    WORD_STATES,
+    FileLock,
+    file_version,
+    write_json_atomic,
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SHARED_PROGRESS_FILE = os.path.join(BASE_DIR, "progress_shared.json")
+
+
+def encode_bits(bits: int) -> str:
+    return base64.b64encode(bits.to_bytes((bits.bit_length() + 7) // 8, "little")).decode("ascii")
+
+
+def decode_bits(text: str) -> int:
+    return int.from_bytes(base64.b64decode(text), "little") if text else 0
+
+
+def encode_ids(ids: List[int]) -> str:
+    typecode = "H" if not ids or max(ids) < 65536 else "I"
+    return typecode + base64.b64encode(array(typecode, ids).tobytes()).decode("ascii")
+
+
+def decode_ids(text: str) -> List[int]:
+    values = array(text[0])
+    values.frombytes(base64.b64decode(text[1:]))
+    return values.tolist()
+
+
+def popcount(bits: int) -> int:
+    """位图中置位的个数（int.bit_count() 需要 Python 3.10）"""
+    return bin(bits).count("1")
+
+
+def iter_bits(bits: int):
+    """按 ID 从小到大遍历位图中置位的下标（先转成字节，整体 O(位图长度)）"""
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for byte_index, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            yield byte_index * 8 + low.bit_length() - 1
+            byte ^= low
+
+
+def bits_from_ids(ids: List[int]) -> int:
+    """由 ID 列表批量构建位图（避免逐位修改大整数）"""
+    if not ids:
+        return 0
+    buf = bytearray(max(ids) // 8 + 1)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+class CategoryState:
+    """单个分类的状态：三张位图 + 待学习顺序 + 其他字段"""
+
+    def __init__(self):
+        self.bits: Dict[str, int] = {state: 0 for state in WORD_STATES}
+        self.pending_order: List[int] = []
+        self.meta: Dict = {}
+        self.review_state: Dict[int, List] = {}
+
+    def move(self, word_ids: List[int], state: str):
+        """把一批单词移动到某个状态；移回待学习时排到队列末尾（去掉顺序列表中的旧位置）"""
+        for word_id in word_ids:
+            mask = 1 << word_id
+            for s in WORD_STATES:
+                self.bits[s] &= ~mask
+            self.bits[state] |= mask
+        if state == "pending":
+            moved = set(word_ids)
+            self.pending_order = [i for i in self.pending_order if i not in moved]
+            self.pending_order.extend(dict.fromkeys(word_ids))
+
+    def move_front(self, word_ids: List[int]):
+        """把一批单词放回待学习队列最前面（保持批次内顺序）"""
+        for word_id in word_ids:
+            mask = 1 << word_id
+            for s in WORD_STATES:
+                self.bits[s] &= ~mask
+            self.bits["pending"] |= mask
+        moved = set(word_ids)
+        self.pending_order = list(dict.fromkeys(word_ids)) + [i for i in self.pending_order if i not in moved]
+
+    def ordered_pending(self) -> List[int]:
+        """待学习 ID（按顺序，过滤掉已离开 pending 的条目）"""
+        pending = set(iter_bits(self.bits["pending"]))
+        ids: List[int] = []
+        for word_id in self.pending_order:
+            if word_id in pending:
+                pending.discard(word_id)
+                ids.append(word_id)
+        # 顺序列表之外的待学习单词（理论上不会出现）按 ID 顺序补在后面
+        ids.extend(sorted(pending))
+        return ids
+
+
+class WordTable:
+    """全局共享词表（单词 -> ID）+ 各分类状态"""
+
+    def __init__(self):
+        self.words: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.categories: Dict[str, CategoryState] = {}
+
+    def intern(self, word: str) -> int:
+        spelling = word.strip()
+        key = spelling.lower()
+        word_id = self.ids.get(key)
+        if word_id is None:
+            word_id = len(self.words)
+            self.words.append(spelling)
+            self.ids[key] = word_id
+        return word_id
+
+    # ---------- 读写 ----------
+
+    @classmethod
+    def load(cls, path: str) -> "WordTable":
+        table = cls()
+        if not os.path.exists(path):
+            return table
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        table.words = data.get("words", [])
+        table.ids = {w.lower(): i for i, w in enumerate(table.words)}
+        for scope, raw in data.get("categories", {}).items():
+            cat = CategoryState()
+            cat.bits = {state: decode_bits(raw.get(state, "")) for state in WORD_STATES}
+            cat.pending_order = (
+                decode_ids(raw["pending_order"]) if raw.get("pending_order") else list(iter_bits(cat.bits["pending"]))
+            )
+            cat.meta = raw.get("meta", {})
+            cat.review_state = {int(k): v for k, v in raw.get("review_state", {}).items()}
+            table.categories[scope] = cat
+        return table
+
+    def save(self, path: str):
+        categories = {}
+        for scope, cat in self.categories.items():
+            raw = {state: encode_bits(cat.bits[state]) for state in WORD_STATES}
+            order = cat.ordered_pending()
+            cat.pending_order = order
+            # 顺序与 ID 顺序一致时不必保存
+            if any(order[i] > order[i + 1] for i in range(len(order) - 1)):
+                raw["pending_order"] = encode_ids(order)
+            raw["meta"] = cat.meta
+            raw["review_state"] = {str(k): v for k, v in cat.review_state.items()}
+            categories[scope] = raw
+        write_json_atomic(path, {"version": 1, "words": self.words, "categories": categories}, indent=None)
+
+    # ---------- 分类 <-> 进度字典 ----------
+
+    def import_progress(self, scope: str, progress: Dict):
+        cat = CategoryState()
+        # 同一单词出现在多个列表时以后出现的状态为准（与逐条 move 语义一致）
+        word_states: Dict[int, str] = {}
+        for state, field in STATE_FIELDS.items():
+            for w in progress.get(field, []):
+                if w.strip():
+                    word_id = self.intern(w)
+                    word_states.pop(word_id, None)
+                    word_states[word_id] = state
+        for state in WORD_STATES:
+            ids = [i for i, s in word_states.items() if s == state]
+            cat.bits[state] = bits_from_ids(ids)
+            if state == "pending":
+                cat.pending_order = ids
+        for key, value in progress.items():
+            if key in STATE_FIELDS.values() or key in ("total_words", REVIEW_FIELD):
+                continue
+            cat.meta[key] = value
+        cat.review_state = {self.intern(w): state for w, state in progress.get(REVIEW_FIELD, {}).items()}
+        self.categories[scope] = cat
+
+    def export_progress(self, scope: str) -> Dict:
+        cat = self.categories[scope]
+        progress = dict(cat.meta)
+        progress["pending_words"] = [self.words[i] for i in cat.ordered_pending()]
+        for state in ("assigned", "learned"):
+            progress[STATE_FIELDS[state]] = [self.words[i] for i in iter_bits(cat.bits[state])]
+        progress["total_words"] = sum(popcount(cat.bits[s]) for s in WORD_STATES)
+        progress[REVIEW_FIELD] = {self.words[i].lower(): state for i, state in cat.review_state.items()}
+        return progress
+
+    def apply(self, scope: str, ops: List[Op]):
+        cat = self.categories.setdefault(scope, CategoryState())
+        for op in ops:
+            if op[0] == "move":
+                if op[1] not in STATE_FIELDS:
+                    raise ValueError(f"未知的单词状态：{op[1]}")
+                if len(op) > 3 and op[3] == "front" and op[1] == "pending":
+                    cat.move_front([self.intern(w) for w in op[2] if w.strip()])
+                    continue
+                cat.move([self.intern(w) for w in op[2] if w.strip()], op[1])
+            elif op[0] == "set":
+                cat.meta[op[1]] = op[2]
+            elif op[0] == "review":
+                for w, state in op[1].items():
+                    cat.review_state[self.intern(w)] = state
+            else:
+                raise ValueError(f"未知的进度操作：{op[0]}")
+
+    # ---------- 统计与跨分类查询 ----------
+
+    def bitset(self, scope: str, state: str) -> int:
+        return self.categories[scope].bits[state]
+
+    def union(self, state: str, scopes: Optional[List[str]] = None) -> int:
+        bits = 0
+        for scope in scopes or self.categories:
+            bits |= self.categories[scope].bits[state]
+        return bits
+
+    def intersection(self, state: str, scopes: Optional[List[str]] = None) -> int:
+        scopes = scopes or list(self.categories)
+        if not scopes:
+            return 0
+        bits = self.categories[scopes[0]].bits[state]
+        for scope in scopes[1:]:
+            bits &= self.categories[scope].bits[state]
+        return bits
+
+    def words_of(self, bits: int) -> List[str]:
+        return [self.words[i] for i in iter_bits(bits)]
+
+    def category_stats(self, scope: str) -> Dict[str, int]:
+        return {state: popcount(self.categories[scope].bits[state]) for state in WORD_STATES}
+
+
+class SharedProgressStore:
+    """
+    共享词表存储：以进度文件名（不含扩展名）作为分类 scope，所有分类写入同一个 progress_shared.json
+
+    - scope 首次加载时，若同名 JSON 进度文件存在则自动导入
+    - 提交前若文件已被其他进程更新，先重新读取再合并本分类，避免覆盖其他分类的进度
+    """
+
+    name = "shared"
+
+    def __init__(self, progress_file: str, table_file: Optional[str] = None):
+        self.progress_file = progress_file
+        self.table_file = table_file or os.path.join(
+            os.path.dirname(progress_file) or ".", os.path.basename(SHARED_PROGRESS_FILE)
+        )
+        self.scope = os.path.splitext(os.path.basename(progress_file))[0]
+        self.lock = FileLock(f"{self.table_file}.lock")
+        self._read_table()
+
+    def version(self):
+        return file_version(self.table_file)
+
+    def _read_table(self):
+        self.table = WordTable.load(self.table_file)
+        self._version = self.version()
+
+    def _write_table(self):
+        if self.version() != self._version:
+            mine = self.table.export_progress(self.scope) if self.scope in self.table.categories else None
+            self._read_table()
+            if mine is not None:
+                self.table.import_progress(self.scope, mine)
+        self.table.save(self.table_file)
+        self._version = self.version()
+
+    def exists(self) -> bool:
+        return self.scope in self.table.categories or os.path.exists(self.progress_file)
+
+    def load(self) -> Dict:
+        progress = self.peek()
+        if progress is None:
+            with open(self.progress_file, "r", encoding="utf-8") as f:
+                progress = json.load(f)
+            self.save(progress)
+            print(f"📥 已将 {self.progress_file} 导入 {self.table_file}（scope={self.scope}）")
+            progress = self.table.export_progress(self.scope)
+        return progress
+
+    def peek(self) -> Optional[Dict]:
+        """只读加载：共享词表中还没有这个 scope 时返回 None（不从 JSON 导入）"""
+        if self.version() != self._version:
+            self._read_table()
+        if self.scope not in self.table.categories:
+            return None
+        return self.table.export_progress(self.scope)
+
+    def save(self, progress: Dict):
+        self.table.import_progress(self.scope, progress)
+        self._write_table()
+
+    def commit(self, ops: List[Op], snapshot):
+        self.table.apply(self.scope, ops)
+        self._write_table()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="共享词表：分类统计与跨分类查询")
+    parser.add_argument("command", choices=["stats"], help="stats：各分类统计 + 跨分类汇总")
+    parser.add_argument("--file", type=str, default=SHARED_PROGRESS_FILE, help="共享进度文件路径")
+    args = parser.parse_args()
+
+    table = WordTable.load(args.file)
+    if not table.categories:
+        print(f"⚠️  {args.file} 中还没有任何分类（设置 CURRICULUM_BACKEND=shared 后运行一次即可导入）")
+        return
+
+    print("=" * 60)
+    print(f"📊 共享词表：{len(table.words)} 个单词，{len(table.categories)} 个分类")
+    print("=" * 60)
+    for scope in sorted(table.categories):
+        stats = table.category_stats(scope)
+        print(f"{scope:<36} 待学习 {stats['pending']:>6}  已分配 {stats['assigned']:>6}  已学习 {stats['learned']:>6}")
+    print("-" * 60)
+    print(f"任一分类已学习：{popcount(table.union('learned'))} 个")
+    print(f"所有分类均已学习：{popcount(table.intersection('learned'))} 个")
+    print(f"所有分类均未学习：{popcount(table.intersection('pending'))} 个")
+
+
+if __name__ == "__main__":
+    main()